@@ -0,0 +1,157 @@
+"""Benchmark mixed check-in writes and dashboard reads under each engine profile.
+
+For every profile a throwaway SQLite database is seeded, then writer threads
+insert attendance records (the check-in write path) while reader threads poll
+session rosters and student histories through read-only requests. Reports
+throughput, latency percentiles and "database is locked" errors per profile.
+Run from the gps-attendance-api directory:
+
+    python bench/bench_engine_profiles.py [--writers 4] [--readers 16] [--seconds 10]
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, g
+from sqlalchemy.exc import OperationalError
+from src.models.user import AttendanceRecord, User, db
+from src.migrations import run_migrations
+from src.services.attendance_counters import record_attendance
+from src.services.engine_profiles import PROFILES, configure_database
+
+STUDENTS = 2000
+SESSIONS = 500
+COURSES = 10
+
+def seed(app):
+    with app.app_context():
+        db.create_all()
+        run_migrations(db.engine)
+        with db.engine.begin() as connection:
+            raw = connection.connection.driver_connection
+            raw.execute(
+                "INSERT INTO user (id, username, email, password_hash, role, first_name, last_name, is_active) "
+                "VALUES (1, 'instructor', 'instructor@bench', '-', 'instructor', 'Bench', 'Instructor', 1)"
+            )
+            raw.executemany(
+                "INSERT INTO user (id, username, email, password_hash, role, first_name, last_name, is_active) "
+                "VALUES (?, ?, ?, '-', 'student', 'Bench', 'Student', 1)",
+                ((i, f'student{i}', f'student{i}@bench') for i in range(2, STUDENTS + 2))
+            )
+            raw.executemany(
+                "INSERT INTO course (id, course_name, course_code, instructor_id, is_active) VALUES (?, ?, ?, 1, 1)",
+                ((i, f'Course {i}', f'C{i}') for i in range(1, COURSES + 1))
+            )
+            raw.executemany(
+                "INSERT INTO class_session (id, course_id, instructor_id, session_date, start_time, end_time, "
+                "location_name, latitude, longitude, attendance_radius, is_active) "
+                "VALUES (?, ?, 1, ?, '00:00:00.000000', '23:59:00.000000', 'Room', 40.0, -74.0, 50, 1)",
+                ((i, (i - 1) % COURSES + 1, date.today().isoformat()) for i in range(1, SESSIONS + 1))
+            )
+        db.session.remove()
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))] * 1000
+
+def run_profile(name, directory, writers, readers, seconds):
+    app = Flask(name)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    configure_database(app, db, name=name, database_url=f"sqlite:///{os.path.join(directory, name + '.db')}")
+    seed(app)
+
+    # Every (session, student) pair is checked in at most once
+    pairs = itertools.product(range(1, SESSIONS + 1), range(2, STUDENTS + 2))
+    pairs_lock = threading.Lock()
+    stop = threading.Event()
+    results = {'write': [], 'read': [], 'write_errors': 0, 'read_errors': 0}
+    results_lock = threading.Lock()
+
+    def write_one():
+        with pairs_lock:
+            session_id, student_id = next(pairs)
+        now = datetime.utcnow()
+        db.session.add(AttendanceRecord(
+            session_id=session_id, student_id=student_id, check_in_time=now,
+            latitude=40.0, longitude=-74.0, status='present'
+        ))
+        record_attendance([(student_id, (session_id - 1) % COURSES + 1, 'present')])
+        db.session.commit()
+
+    def read_one(rng):
+        g.read_only_session = True
+        if rng.random() < 0.5:
+            session_id = rng.randint(1, SESSIONS)
+            db.session.query(AttendanceRecord, User).join(User, User.id == AttendanceRecord.student_id).filter(
+                AttendanceRecord.session_id == session_id
+            ).all()
+        else:
+            student_id = rng.randint(2, STUDENTS + 1)
+            AttendanceRecord.query.filter_by(student_id=student_id).order_by(
+                AttendanceRecord.created_at.desc(), AttendanceRecord.id.desc()
+            ).limit(50).all()
+
+    def worker(kind, seed_value):
+        rng = random.Random(seed_value)
+        latencies = []
+        errors = 0
+        while not stop.is_set():
+            with app.app_context():
+                started = time.perf_counter()
+                try:
+                    write_one() if kind == 'write' else read_one(rng)
+                    latencies.append(time.perf_counter() - started)
+                except OperationalError:
+                    db.session.rollback()
+                    errors += 1
+                finally:
+                    db.session.remove()
+        with results_lock:
+            results[kind].extend(latencies)
+            results[kind + '_errors'] += errors
+
+    threads = [threading.Thread(target=worker, args=('write', i)) for i in range(writers)]
+    threads += [threading.Thread(target=worker, args=('read', 1000 + i)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    return results
+
+def run(writers, readers, seconds, profiles):
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{writers} writer / {readers} reader threads, {seconds}s per profile\n")
+        print(f"{'profile':<12} {'kind':<6} {'ops/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'locked':>7}")
+        for name in profiles:
+            results = run_profile(name, directory, writers, readers, seconds)
+            for kind in ('write', 'read'):
+                samples = results[kind]
+                print(f"{name:<12} {kind:<6} {len(samples) / seconds:>9.0f} "
+                      f"{percentile(samples, 0.50):>8.2f} {percentile(samples, 0.95):>8.2f} "
+                      f"{percentile(samples, 0.99):>8.2f} {results[kind + '_errors']:>7}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=4, help='number of check-in writer threads')
+    parser.add_argument('--readers', type=int, default=16, help='number of dashboard reader threads')
+    parser.add_argument('--seconds', type=float, default=10, help='duration of each profile run')
+    parser.add_argument('--profiles', nargs='+', default=['development', 'sqlite-wal'],
+                        choices=list(PROFILES), help='profiles to compare')
+    args = parser.parse_args()
+    run(args.writers, args.readers, args.seconds, args.profiles)
@@ -0,0 +1,49 @@
+"""Micro-benchmark: scalar calculate_distance loop vs vectorized haversine_distances.
+
+The scalar path is the wrapper check-ins use for a single point; the
+vectorized one is what rosters and batch uploads use. Both run the same
+kernel, so their results must be identical.
+
+Run from the gps-attendance-api directory:
+
+    python bench/bench_haversine.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from src.services.geo import calculate_distance, haversine_distances
+
+SIZES = [10, 1000, 100000]
+SESSION_LAT, SESSION_LON = 40.7128, -74.0060
+
+def make_points(n, seed=42):
+    rng = np.random.default_rng(seed)
+    lats = SESSION_LAT + rng.uniform(-0.01, 0.01, n)
+    lons = SESSION_LON + rng.uniform(-0.01, 0.01, n)
+    return lats, lons
+
+def run():
+    print(f"{'points':>8} {'scalar (ms)':>12} {'vectorized (ms)':>16} {'speedup':>8}")
+    for n in SIZES:
+        lats, lons = make_points(n)
+        lat_list, lon_list = lats.tolist(), lons.tolist()
+
+        def scalar():
+            return [calculate_distance(lat, lon, SESSION_LAT, SESSION_LON) for lat, lon in zip(lat_list, lon_list)]
+
+        def vectorized():
+            return haversine_distances(lats, lons, SESSION_LAT, SESSION_LON)
+
+        assert np.array_equal(scalar(), vectorized())
+
+        repeat = max(1, 10000 // n)
+        scalar_ms = min(timeit.repeat(scalar, number=repeat, repeat=3)) / repeat * 1000
+        vector_ms = min(timeit.repeat(vectorized, number=repeat, repeat=3)) / repeat * 1000
+        print(f"{n:>8} {scalar_ms:>12.3f} {vector_ms:>16.3f} {scalar_ms / vector_ms:>7.1f}x")
+
+if __name__ == '__main__':
+    run()
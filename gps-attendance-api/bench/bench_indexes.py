@@ -0,0 +1,158 @@
+"""Benchmark the attendance/enrollment queries before and after migration 1.
+
+Builds a throwaway SQLite database with the pre-migration schema, fills it with
+1M attendance rows, times the hot queries, applies the schema migrations and
+times them again. Run from the gps-attendance-api directory:
+
+    python bench/bench_indexes.py [--rows 1000000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from src.models.user import db
+from src.migrations import run_migrations
+
+STUDENTS_PER_SESSION = 50
+SESSIONS_PER_COURSE = 40
+STUDENTS = 10000
+REPEAT = 20
+
+QUERIES = {
+    'duplicate check': (
+        "SELECT id FROM attendance_record WHERE session_id = :session_id AND student_id = :student_id LIMIT 1"
+    ),
+    'student history': (
+        "SELECT * FROM attendance_record WHERE student_id = :student_id ORDER BY created_at DESC LIMIT 50"
+    ),
+    'course history': (
+        "SELECT attendance_record.* FROM attendance_record JOIN class_session "
+        "ON class_session.id = attendance_record.session_id "
+        "WHERE attendance_record.student_id = :student_id AND class_session.course_id = :course_id "
+        "ORDER BY attendance_record.created_at DESC LIMIT 50"
+    ),
+    'session roster': (
+        "SELECT * FROM attendance_record WHERE session_id = :session_id"
+    ),
+    'course summary': (
+        "SELECT attendance_record.status, COUNT(*) FROM attendance_record JOIN class_session "
+        "ON class_session.id = attendance_record.session_id "
+        "WHERE class_session.course_id = :course_id GROUP BY attendance_record.status"
+    ),
+    'enrollment check': (
+        "SELECT id FROM course_enrollment WHERE course_id = :course_id AND student_id = :student_id LIMIT 1"
+    ),
+}
+
+def create_baseline_schema(engine):
+    """Create the current tables, then drop every secondary index to get the pre-migration schema"""
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        names = connection.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+        )).scalars().all()
+        for name in names:
+            connection.execute(text(f"DROP INDEX {name}"))
+
+def seed(engine, rows):
+    sessions = rows // STUDENTS_PER_SESSION
+    courses = max(1, sessions // SESSIONS_PER_COURSE)
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    start = date.today() - timedelta(days=SESSIONS_PER_COURSE)
+
+    with engine.begin() as connection:
+        raw = connection.connection.driver_connection
+        raw.execute(
+            "INSERT INTO user (id, username, email, password_hash, role, first_name, last_name, is_active) "
+            "VALUES (1, 'instructor', 'instructor@bench', '-', 'instructor', 'Bench', 'Instructor', 1)"
+        )
+        raw.executemany(
+            "INSERT INTO user (id, username, email, password_hash, role, first_name, last_name, is_active) "
+            "VALUES (?, ?, ?, '-', 'student', 'Bench', 'Student', 1)",
+            ((i, f'student{i}', f'student{i}@bench') for i in range(2, STUDENTS + 2))
+        )
+        raw.executemany(
+            "INSERT INTO course (id, course_name, course_code, instructor_id, is_active) VALUES (?, ?, ?, 1, 1)",
+            ((i, f'Course {i}', f'C{i}') for i in range(1, courses + 1))
+        )
+
+        rosters = {}
+        enrollments = []
+        for course_id in range(1, courses + 1):
+            roster = rng.sample(range(2, STUDENTS + 2), STUDENTS_PER_SESSION)
+            rosters[course_id] = roster
+            enrollments.extend((course_id, student_id) for student_id in roster)
+        raw.executemany("INSERT INTO course_enrollment (course_id, student_id) VALUES (?, ?)", enrollments)
+
+        raw.executemany(
+            "INSERT INTO class_session (id, course_id, instructor_id, session_date, start_time, end_time, "
+            "location_name, latitude, longitude, attendance_radius, is_active) "
+            "VALUES (?, ?, 1, ?, '09:00:00.000000', '10:30:00.000000', 'Room', 40.0, -74.0, 50, 1)",
+            ((i, (i - 1) % courses + 1, (start + timedelta(days=(i - 1) // courses)).isoformat())
+             for i in range(1, sessions + 1))
+        )
+
+        def attendance():
+            for session_id in range(1, sessions + 1):
+                for student_id in rosters[(session_id - 1) % courses + 1]:
+                    yield (session_id, student_id, now, rng.choice(('present', 'present', 'present', 'late')), now)
+
+        raw.executemany(
+            "INSERT INTO attendance_record (session_id, student_id, check_in_time, latitude, longitude, status, created_at) "
+            "VALUES (?, ?, ?, 40.0, -74.0, ?, ?)",
+            attendance()
+        )
+    return sessions, courses, rosters
+
+def time_queries(engine, sessions, courses, rosters):
+    rng = random.Random(7)
+    results = {}
+    with engine.connect() as connection:
+        for name, sql in QUERIES.items():
+            statement = text(sql)
+            started = time.perf_counter()
+            for _ in range(REPEAT):
+                course_id = rng.randint(1, courses)
+                student_id = rng.choice(rosters[course_id])
+                session_id = rng.randrange(course_id, sessions + 1, courses)
+                connection.execute(statement, {
+                    'course_id': course_id, 'student_id': student_id, 'session_id': session_id
+                }).fetchall()
+            results[name] = (time.perf_counter() - started) / REPEAT * 1000
+    return results
+
+def run(rows):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        create_baseline_schema(engine)
+
+        started = time.perf_counter()
+        sessions, courses, rosters = seed(engine, rows)
+        print(f"Seeded {rows:,} attendance rows ({sessions:,} sessions, {courses:,} courses) "
+              f"in {time.perf_counter() - started:.1f}s")
+
+        before = time_queries(engine, sessions, courses, rosters)
+
+        started = time.perf_counter()
+        run_migrations(engine)
+        print(f"Applied migrations in {time.perf_counter() - started:.1f}s\n")
+
+        after = time_queries(engine, sessions, courses, rosters)
+        engine.dispose()
+
+    print(f"{'query':<18} {'before (ms)':>12} {'after (ms)':>12} {'speedup':>9}")
+    for name in QUERIES:
+        print(f"{name:<18} {before[name]:>12.3f} {after[name]:>12.3f} {before[name] / after[name]:>8.0f}x")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000, help='number of attendance rows to seed')
+    run(parser.parse_args().rows)
@@ -0,0 +1,207 @@
+"""Benchmark 10k-row list responses: ORM instances + to_dict() + jsonify vs column projection + json_response.
+
+A throwaway SQLite database is seeded with 10k courses, 10k users, a course
+with 10k sessions, a student with 10k attendance records and a course with
+10k feedback entries. Each listing is built the old way and through the
+projection serializers, the bodies are checked to be byte-identical, and
+the build time is reported with orjson and with the standard library encoder.
+Run from the gps-attendance-api directory:
+
+    python bench/bench_serializers.py [--rows 10000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from src.models.user import AttendanceRecord, ClassSession, Course, Feedback, User, db
+from src.migrations import run_migrations
+from src.services import serializers
+from src.services.aggregates import enrollment_counts_subquery
+from src.services.engine_profiles import configure_database
+from src.services.seeding import seed_database
+from src.services.serializers import (
+    ATTENDANCE_FIELDS, COURSE_FIELDS, FEEDBACK_FIELDS, SESSION_FIELDS, USER_FIELDS, columns, json_response, records
+)
+
+def seed(rows):
+    db.create_all()
+    run_migrations(db.engine)
+    listing_course = seed_database(students=rows, courses=rows, sessions=0, enrollments_per_student=1,
+                                   feedback_rate=0, seed=1)
+    history = seed_database(students=2, courses=1, sessions=rows, attendance_rate=1.0, feedback_rate=0, seed=2)
+    feedback = seed_database(students=rows, courses=1, sessions=1, enrollments_per_student=1, feedback_rate=1.0, seed=3)
+    course_ids = sorted(listing_course['rosters'])
+    return {
+        'session_course': next(iter(history['rosters'])),
+        'history_student': history['student_ids'][0],
+        'feedback_course': next(iter(feedback['rosters'])),
+        'courses': len(course_ids)
+    }
+
+def orm_courses(ids):
+    counts = enrollment_counts_subquery()
+    rows = db.session.query(Course, func.coalesce(counts.c.student_count, 0)).outerjoin(
+        counts, counts.c.course_id == Course.id
+    ).options(joinedload(Course.instructor)).order_by(Course.id).all()
+    return jsonify([course.to_dict(student_count) for course, student_count in rows])
+
+def projected_courses(ids):
+    counts = enrollment_counts_subquery()
+    rows = db.session.query(
+        *columns(Course, COURSE_FIELDS), User.id.label('instructor_user_id'), User.first_name, User.last_name,
+        func.coalesce(counts.c.student_count, 0)
+    ).outerjoin(User, User.id == Course.instructor_id).outerjoin(
+        counts, counts.c.course_id == Course.id
+    ).order_by(Course.id).all()
+    courses = []
+    for row in rows:
+        course = dict(zip(COURSE_FIELDS, row))
+        instructor_id, first_name, last_name, student_count = row[-4:]
+        course['instructor_name'] = f"{first_name} {last_name}" if instructor_id is not None else None
+        course['student_count'] = student_count
+        courses.append(course)
+    return json_response(courses)
+
+def orm_users(ids):
+    return jsonify([user.to_dict() for user in User.query.all()])
+
+def projected_users(ids):
+    return json_response(records(USER_FIELDS, db.session.query(*columns(User, USER_FIELDS)).all()))
+
+def orm_sessions(ids):
+    sessions = ClassSession.query.filter_by(course_id=ids['session_course']).order_by(
+        ClassSession.session_date.desc(), ClassSession.start_time.desc()
+    ).all()
+    return jsonify([session.to_dict() for session in sessions])
+
+def projected_sessions(ids):
+    sessions = db.session.query(*columns(ClassSession, SESSION_FIELDS)).filter(
+        ClassSession.course_id == ids['session_course']
+    ).order_by(ClassSession.session_date.desc(), ClassSession.start_time.desc()).all()
+    return json_response(records(SESSION_FIELDS, sessions))
+
+def orm_history(ids):
+    query = AttendanceRecord.query.filter_by(student_id=ids['history_student']).order_by(
+        AttendanceRecord.created_at.desc(), AttendanceRecord.id.desc()
+    ).options(joinedload(AttendanceRecord.session).joinedload(ClassSession.course))
+    result = []
+    for record in query.all():
+        session = record.session
+        record_dict = record.to_dict()
+        record_dict['course_name'] = session.course.course_name
+        record_dict['course_code'] = session.course.course_code
+        record_dict['session_date'] = session.session_date.isoformat()
+        record_dict['session_time'] = f"{session.start_time} - {session.end_time}"
+        result.append(record_dict)
+    return jsonify({'attendance_records': result})
+
+def projected_history(ids):
+    rows = db.session.query(
+        *columns(AttendanceRecord, ATTENDANCE_FIELDS), Course.course_name, Course.course_code,
+        ClassSession.session_date, ClassSession.start_time, ClassSession.end_time
+    ).join(ClassSession, ClassSession.id == AttendanceRecord.session_id).join(
+        Course, Course.id == ClassSession.course_id
+    ).filter(AttendanceRecord.student_id == ids['history_student']).order_by(
+        AttendanceRecord.created_at.desc(), AttendanceRecord.id.desc()
+    ).all()
+    result = []
+    for row in rows:
+        record_dict = dict(zip(ATTENDANCE_FIELDS, row))
+        course_name, course_code, session_date, start_time, end_time = row[-5:]
+        record_dict['course_name'] = course_name
+        record_dict['course_code'] = course_code
+        record_dict['session_date'] = session_date
+        record_dict['session_time'] = f"{start_time} - {end_time}"
+        result.append(record_dict)
+    return json_response({'attendance_records': result})
+
+def orm_feedback(ids):
+    query = Feedback.query.filter_by(course_id=ids['feedback_course']).order_by(
+        Feedback.created_at.desc(), Feedback.id.desc()
+    ).options(joinedload(Feedback.student))
+    result = []
+    for feedback in query.all():
+        feedback_dict = feedback.to_dict()
+        if not feedback.is_anonymous and feedback.student:
+            feedback_dict['student_name'] = f"{feedback.student.first_name} {feedback.student.last_name}"
+        else:
+            feedback_dict['student_name'] = 'Anonymous'
+        result.append(feedback_dict)
+    return jsonify({'feedback': result})
+
+def projected_feedback(ids):
+    rows = db.session.query(
+        *columns(Feedback, FEEDBACK_FIELDS), User.id.label('author_id'), User.first_name, User.last_name
+    ).outerjoin(User, User.id == Feedback.student_id).filter(
+        Feedback.course_id == ids['feedback_course']
+    ).order_by(Feedback.created_at.desc(), Feedback.id.desc()).all()
+    result = []
+    for row in rows:
+        feedback_dict = dict(zip(FEEDBACK_FIELDS, row))
+        author_id, first_name, last_name = row[-3:]
+        if feedback_dict['is_anonymous']:
+            feedback_dict['student_id'] = None
+        if not feedback_dict['is_anonymous'] and author_id is not None:
+            feedback_dict['student_name'] = f"{first_name} {last_name}"
+        else:
+            feedback_dict['student_name'] = 'Anonymous'
+        result.append(feedback_dict)
+    return json_response({'feedback': result})
+
+LISTINGS = [
+    ('GET /courses (admin)', orm_courses, projected_courses),
+    ('GET /users', orm_users, projected_users),
+    ('GET /courses/<id>/sessions', orm_sessions, projected_sessions),
+    ('GET /history', orm_history, projected_history),
+    ('GET /courses/<id>/feedback', orm_feedback, projected_feedback),
+]
+
+def timed(fn, ids):
+    def call():
+        body = fn(ids).get_data()
+        # Drop the identity map so every run hydrates or selects from scratch
+        db.session.remove()
+        return body
+    return min(timeit.repeat(call, number=1, repeat=5)) * 1000
+
+def run(rows):
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    configure_database(app, db, name='development', database_url=f'sqlite:///{path}')
+
+    with app.app_context():
+        ids = seed(rows)
+        orjson = serializers.orjson
+        print(f"orjson: {'available' if orjson else 'not installed'}")
+        print(f"{'listing':<28} {'rows':>6} {'ORM (ms)':>9} {'stdlib (ms)':>12} {'orjson (ms)':>12} {'speedup':>8}")
+        for name, orm_listing, projected_listing in LISTINGS:
+            expected = orm_listing(ids).get_data()
+            db.session.remove()
+            count = expected.count(b'"id":')
+
+            serializers.orjson = None
+            assert projected_listing(ids).get_data() == expected, f'{name}: stdlib output differs'
+            db.session.remove()
+            stdlib_ms = timed(projected_listing, ids)
+
+            serializers.orjson = orjson
+            assert projected_listing(ids).get_data() == expected, f'{name}: orjson output differs'
+            db.session.remove()
+            fast_ms = timed(projected_listing, ids) if orjson else float('nan')
+
+            orm_ms = timed(orm_listing, ids)
+            best = fast_ms if orjson else stdlib_ms
+            print(f"{name:<28} {count:>6} {orm_ms:>9.1f} {stdlib_ms:>12.1f} {fast_ms:>12.1f} {orm_ms / best:>7.1f}x")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000, help='Rows per listing')
+    run(parser.parse_args().rows)
@@ -0,0 +1,335 @@
+"""Load test replaying a lecture-start check-in storm against the API.
+
+Seeds a university (students, instructors, courses, enrollments, past sessions
+with attendance history and a set of sessions starting now), then replays the
+traffic seen at the start of a lecture block: a burst of /api/checkin calls for
+every enrolled student, instructors polling their session rosters and students
+reading their history. Reports throughput, p50/p95/p99 latency and SQL
+statements per request for each endpoint, and saves the results as JSON.
+
+Requests go through the Flask test client by default. With --url they are sent
+over HTTP to a running server, which must use the same database (SQL counts are
+only available in-process). Run from the gps-attendance-api directory:
+
+    python bench/load_test.py --students 50000 --courses 2000 --sessions 20000
+    python bench/load_test.py --database /tmp/load.db --seed-only
+    DATABASE_URL=sqlite:////tmp/load.db gunicorn -w 4 -b 127.0.0.1:8000 src.main:app &
+    python bench/load_test.py --database /tmp/load.db --no-seed --url http://127.0.0.1:8000
+"""
+import argparse
+import http.client
+import json
+import os
+import queue
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+PERCENTILES = (('p50', 0.50), ('p95', 0.95), ('p99', 0.99))
+
+def seed_university(app, db, args):
+    """Bulk insert the university and return what the traffic generators need"""
+    from src.services.seeding import seed_database
+
+    with app.app_context():
+        result = seed_database(
+            students=args.students, courses=args.courses, sessions=args.sessions,
+            today_sessions=args.storm_sessions, enrollments_per_student=args.enrollments_per_student,
+            attendance_rate=args.history_rate, feedback_rate=0, seed=args.seed
+        )
+        db.session.remove()
+    return {
+        'counts': result['counts'],
+        'student_ids': result['student_ids'],
+        'storm_sessions': result['today_sessions'],
+        'rosters': result['rosters']
+    }
+
+def load_university(app, db):
+    """Rebuild the traffic inputs from an already seeded database"""
+    from sqlalchemy import func
+    from src.models.user import ClassSession, CourseEnrollment, User, session_now
+
+    with app.app_context():
+        today_sessions = [
+            {'id': s.id, 'course_id': s.course_id, 'instructor_id': s.instructor_id,
+             'latitude': s.latitude, 'longitude': s.longitude}
+            for s in ClassSession.query.filter_by(session_date=session_now().date(), is_active=True)
+        ]
+        rosters = {}
+        course_ids = {session['course_id'] for session in today_sessions}
+        for course_id, student_id in db.session.query(CourseEnrollment.course_id, CourseEnrollment.student_id).filter(
+            CourseEnrollment.course_id.in_(course_ids)
+        ):
+            rosters.setdefault(course_id, []).append(student_id)
+        student_ids = [row[0] for row in db.session.query(User.id).filter_by(role='student')]
+        counts = {'users': db.session.query(func.count(User.id)).scalar()}
+        db.session.remove()
+    return {'counts': counts, 'student_ids': student_ids, 'storm_sessions': today_sessions, 'rosters': rosters}
+
+def make_token(user_id, role):
+    import jwt
+    from src.routes.auth import JWT_ALGORITHM, JWT_EXPIRATION_DELTA, JWT_SECRET
+
+    return jwt.encode({
+        'user_id': user_id, 'username': f'seed_{role}{user_id}', 'role': role,
+        'exp': datetime.utcnow() + JWT_EXPIRATION_DELTA
+    }, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+class TestClientTransport:
+    """Sends requests through the Flask test client and counts the SQL each one runs"""
+
+    counts_sql = True
+
+    def __init__(self, app, db):
+        from sqlalchemy import event
+
+        self.app = app
+        self._local = threading.local()
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute', self._count_statement)
+
+    def _count_statement(self, *args):
+        self._local.statements = getattr(self._local, 'statements', 0) + 1
+
+    def request(self, method, path, token, body=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        self._local.statements = 0
+        response = client.open(path, method=method, json=body, headers={'Authorization': f'Bearer {token}'})
+        response.close()
+        return response.status_code, self._local.statements
+
+class HttpTransport:
+    """Sends requests to a running server over keep-alive HTTP connections"""
+
+    counts_sql = False
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.prefix = parts.path.rstrip('/')
+        self._local = threading.local()
+
+    def request(self, method, path, token, body=None):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self.connection_class(self.host, self.port, timeout=60)
+        headers = {'Authorization': f'Bearer {token}'}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        try:
+            connection.request(method, self.prefix + path, body=payload, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            self._local.connection = None
+            return 0, None
+        return response.status, None
+
+class Recorder:
+    """Collects latency, status and SQL count samples per endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+
+    def add(self, endpoint, seconds, status, statements):
+        with self._lock:
+            entry = self.samples.setdefault(endpoint, {'latencies': [], 'statuses': {}, 'statements': []})
+            entry['latencies'].append(seconds)
+            entry['statuses'][status] = entry['statuses'].get(status, 0) + 1
+            if statements is not None:
+                entry['statements'].append(statements)
+
+    def summary(self, elapsed):
+        report = {}
+        for endpoint, entry in sorted(self.samples.items()):
+            latencies = sorted(entry['latencies'])
+            statements = entry['statements']
+            report[endpoint] = {
+                'requests': len(latencies),
+                'throughput_rps': round(len(latencies) / elapsed, 1),
+                'errors': sum(count for status, count in entry['statuses'].items() if not 200 <= status < 300),
+                'statuses': {str(status): count for status, count in sorted(entry['statuses'].items())},
+                'latency_ms': {
+                    name: round(latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000, 2)
+                    for name, fraction in PERCENTILES
+                },
+                'sql_per_request': {
+                    'mean': round(sum(statements) / len(statements), 2),
+                    'max': max(statements)
+                } if statements else None
+            }
+        return report
+
+def timed(transport, recorder, endpoint, method, path, token, body=None):
+    started = time.perf_counter()
+    status, statements = transport.request(method, path, token, body)
+    recorder.add(endpoint, time.perf_counter() - started, status, statements)
+
+def replay(transport, university, args, rng):
+    """Run the check-in storm with roster polling and history reads alongside it"""
+    sessions = university['storm_sessions']
+    if not sessions:
+        raise SystemExit('No sessions today to check in to; seed the database first')
+
+    check_ins = queue.Queue()
+    for session in sessions:
+        for student_id in university['rosters'].get(session['course_id'], []):
+            if rng.random() < args.checkin_rate:
+                # Stay well within the 50m radius: 0.0002 degrees is about 20m
+                check_ins.put((student_id, {
+                    'session_id': session['id'],
+                    'latitude': session['latitude'] + rng.uniform(-0.0002, 0.0002),
+                    'longitude': session['longitude'] + rng.uniform(-0.0002, 0.0002)
+                }))
+    total = check_ins.qsize()
+
+    tokens = {}
+    tokens_lock = threading.Lock()
+
+    def token_for(user_id, role):
+        with tokens_lock:
+            if user_id not in tokens:
+                tokens[user_id] = make_token(user_id, role)
+            return tokens[user_id]
+
+    recorder = Recorder()
+    storm_over = threading.Event()
+
+    def check_in_worker():
+        while True:
+            try:
+                student_id, body = check_ins.get_nowait()
+            except queue.Empty:
+                return
+            timed(transport, recorder, 'POST /api/checkin', 'POST', '/api/checkin',
+                  token_for(student_id, 'student'), body)
+
+    def roster_poller(seed):
+        local_rng = random.Random(seed)
+        while not storm_over.is_set():
+            session = local_rng.choice(sessions)
+            timed(transport, recorder, 'GET /api/session/<id>/attendance', 'GET',
+                  f"/api/session/{session['id']}/attendance", token_for(session['instructor_id'], 'instructor'))
+            storm_over.wait(args.poll_interval)
+
+    def history_reader(seed):
+        local_rng = random.Random(seed)
+        while not storm_over.is_set():
+            student_id = local_rng.choice(university['student_ids'])
+            timed(transport, recorder, 'GET /api/history', 'GET', '/api/history?limit=20',
+                  token_for(student_id, 'student'))
+            storm_over.wait(args.read_interval)
+
+    background = [threading.Thread(target=roster_poller, args=(i,)) for i in range(args.pollers)]
+    background += [threading.Thread(target=history_reader, args=(1000 + i,)) for i in range(args.readers)]
+    storm = [threading.Thread(target=check_in_worker) for _ in range(args.concurrency)]
+
+    started = time.perf_counter()
+    for thread in background + storm:
+        thread.start()
+    for thread in storm:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    storm_over.set()
+    for thread in background:
+        thread.join()
+    return total, elapsed, recorder.summary(elapsed)
+
+def print_report(report):
+    print(f"\n{'endpoint':<36} {'requests':>9} {'req/s':>8} {'errors':>7} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'sql/req':>8}")
+    for endpoint, stats in report['endpoints'].items():
+        sql = stats['sql_per_request']['mean'] if stats['sql_per_request'] else float('nan')
+        latency = stats['latency_ms']
+        print(f"{endpoint:<36} {stats['requests']:>9} {stats['throughput_rps']:>8.1f} {stats['errors']:>7} "
+              f"{latency['p50']:>8.2f} {latency['p95']:>8.2f} {latency['p99']:>8.2f} {sql:>8.2f}")
+
+def run(args):
+    directory = None
+    if args.database:
+        database = os.path.abspath(args.database)
+    else:
+        directory = tempfile.mkdtemp(prefix='gps-load-')
+        database = os.path.join(directory, 'load.db')
+
+    # The app reads its configuration from the environment when it is imported
+    os.environ['DATABASE_URL'] = f'sqlite:///{database}'
+    if args.profile:
+        os.environ['DB_PROFILE'] = args.profile
+    if args.group_commit:
+        os.environ['CHECKIN_GROUP_COMMIT'] = '1'
+    from src.main import app
+    from src.models.user import db
+
+    rng = random.Random(args.seed)
+    report = {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'mode': 'http' if args.url else 'test_client',
+        'config': vars(args),
+        'database': database
+    }
+
+    if args.no_seed:
+        university = load_university(app, db)
+    else:
+        started = time.perf_counter()
+        university = seed_university(app, db, args)
+        report['seed'] = {'counts': university['counts'], 'seconds': round(time.perf_counter() - started, 1)}
+        print(f"Seeded {university['counts']} in {report['seed']['seconds']}s")
+        if args.seed_only:
+            return
+
+    transport = HttpTransport(args.url) if args.url else TestClientTransport(app, db)
+    total, elapsed, endpoints = replay(transport, university, args, rng)
+    report['check_ins'] = total
+    report['duration_seconds'] = round(elapsed, 2)
+    report['endpoints'] = endpoints
+    print(f"Replayed {total} check-ins over {len(university['storm_sessions'])} sessions in {elapsed:.1f}s")
+    print_report(report)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"load-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"\nResults saved to {output}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=50000)
+    parser.add_argument('--courses', type=int, default=2000)
+    parser.add_argument('--sessions', type=int, default=20000, help='total sessions, including the storm sessions')
+    parser.add_argument('--storm-sessions', type=int, default=100, help='sessions starting now that receive the check-in burst')
+    parser.add_argument('--enrollments-per-student', type=int, default=3)
+    parser.add_argument('--history-rate', type=float, default=0.5, help='share of students with a record in each past session')
+    parser.add_argument('--checkin-rate', type=float, default=1.0, help='share of enrolled students checking in during the storm')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent check-in clients')
+    parser.add_argument('--pollers', type=int, default=4, help='instructors polling session rosters')
+    parser.add_argument('--poll-interval', type=float, default=0.5, help='seconds between roster polls')
+    parser.add_argument('--readers', type=int, default=4, help='students reading their history')
+    parser.add_argument('--read-interval', type=float, default=0.1, help='seconds between history reads')
+    parser.add_argument('--seed', type=int, default=42, help='random seed for data and traffic')
+    parser.add_argument('--database', help='SQLite file to use (default: a temporary file)')
+    parser.add_argument('--profile', help='DB_PROFILE for the in-process app')
+    parser.add_argument('--group-commit', action='store_true', help='enable CHECKIN_GROUP_COMMIT in-process')
+    parser.add_argument('--seed-only', action='store_true', help='seed the database and exit')
+    parser.add_argument('--no-seed', action='store_true', help='reuse an already seeded --database')
+    parser.add_argument('--url', help='send requests to a running server instead of the test client')
+    parser.add_argument('--output', help='JSON results path (default: bench/results/load-<timestamp>.json)')
+    run(parser.parse_args())
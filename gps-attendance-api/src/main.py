@@ -1,16 +1,33 @@
 import os
 import sys
+import time
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+import click
+from flask import Flask, Response, send_from_directory
 from flask_cors import CORS
 from src.models.user import db, User
+from src.migrations import run_migrations
+from src.services.attendance_counters import rebuild_counters
 from src.routes.user import user_bp
 from src.routes.auth import auth_bp
 from src.routes.courses import courses_bp
 from src.routes.attendance import attendance_bp
 from src.routes.feedback import feedback_bp
+from src.services.checkin_writer import checkin_writer
+from src.services.engine_profiles import configure_database
+from src.services.enrollment_cache import enrollment_cache
+from src.services.metrics import request_metrics
+from src.services.password_hasher import password_hasher
+from src.services.response_cache import response_cache
+from src.services.roster_stream import roster_broker
+from src.services.token_revocation import token_revocations
+from src.services.seeding import seed_database
+from src.services.session_closeout import session_closer
+from src.services.session_index import session_index
+from src.services.session_table import session_table
+from src.services.user_cache import user_cache
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'gps-attendance-system-secret-key-2024'
@@ -25,10 +42,54 @@ app.register_blueprint(courses_bp, url_prefix='/api')
 app.register_blueprint(attendance_bp, url_prefix='/api')
 app.register_blueprint(feedback_bp, url_prefix='/api')
 
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+# Database configuration, selected with DB_PROFILE (development, sqlite-wal, server)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
+configure_database(app, db)
+
+# Password hashing runs in a bounded process pool, started before any other thread
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 32))
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD')
+password_hasher.init_app(app)
+
+# Optional write-behind check-in ingestion with group commit
+app.config['CHECKIN_GROUP_COMMIT'] = os.environ.get('CHECKIN_GROUP_COMMIT', '0') == '1'
+app.config['CHECKIN_MAX_GROUP_SIZE'] = int(os.environ.get('CHECKIN_MAX_GROUP_SIZE', 200))
+app.config['CHECKIN_FLUSH_INTERVAL_MS'] = float(os.environ.get('CHECKIN_FLUSH_INTERVAL_MS', 5))
+checkin_writer.init_app(app)
+
+# Background close-out that writes absences once a session's end time passes
+app.config['SESSION_CLOSEOUT_ENABLED'] = os.environ.get('SESSION_CLOSEOUT_ENABLED', '1') == '1'
+app.config['SESSION_CLOSEOUT_INTERVAL_SECONDS'] = float(os.environ.get('SESSION_CLOSEOUT_INTERVAL_SECONDS', 60))
+
+# ETag/304 response cache for the course and session listings the apps poll
+app.config['RESPONSE_CACHE_ENABLED'] = os.environ.get('RESPONSE_CACHE_ENABLED', '1') == '1'
+app.config['RESPONSE_CACHE_MAX_BYTES'] = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+response_cache.init_app(app)
+
+# Live roster streams (Server-Sent Events) for instructor dashboards, per worker
+app.config['ROSTER_STREAM_MAX_SUBSCRIBERS'] = int(os.environ.get('ROSTER_STREAM_MAX_SUBSCRIBERS', 500))
+app.config['ROSTER_STREAM_SYNC_SECONDS'] = float(os.environ.get('ROSTER_STREAM_SYNC_SECONDS', 1))
+app.config['ROSTER_STREAM_HEARTBEAT_SECONDS'] = float(os.environ.get('ROSTER_STREAM_HEARTBEAT_SECONDS', 15))
+roster_broker.init_app(app)
+
+# Expired token revocations are deleted in the background, per worker
+app.config['REVOCATION_PURGE_SECONDS'] = float(os.environ.get('REVOCATION_PURGE_SECONDS', 600))
+token_revocations.init_app(app)
+
+# Per-endpoint latency and SQL metrics, exported at /api/metrics
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') == '1'
+request_metrics.init_app(app, db)
+request_metrics.register_stats('gps_enrollment_cache', enrollment_cache.stats)
+request_metrics.register_stats('gps_user_cache', user_cache.stats)
+request_metrics.register_stats('gps_checkin_writer', checkin_writer.stats)
+request_metrics.register_stats('gps_password_hasher', password_hasher.stats)
+request_metrics.register_stats('gps_token_revocations', token_revocations.stats)
+request_metrics.register_stats('gps_session_closer', session_closer.stats)
+request_metrics.register_stats('gps_response_cache', response_cache.stats)
+request_metrics.register_stats('gps_roster_streams', roster_broker.stats)
+request_metrics.register_stats('gps_session_table', session_table.stats)
+request_metrics.register_stats('gps_session_index', session_index.stats)
 
 def create_sample_data():
     """Create sample users and data for testing"""
@@ -80,8 +141,61 @@ def create_sample_data():
 
 with app.app_context():
     db.create_all()
+    run_migrations(db.engine)
     create_sample_data()
 
+# Started after the schema exists so the first run can close sessions that ended while stopped
+session_closer.init_app(app)
+
+# Memory-mapped table of today's open sessions shared by the workers on this host,
+# read by check-ins; one worker at a time keeps it up to date
+app.config['SESSION_TABLE_ENABLED'] = os.environ.get('SESSION_TABLE_ENABLED', '1') == '1'
+app.config['SESSION_TABLE_PATH'] = os.environ.get('SESSION_TABLE_PATH')
+app.config['SESSION_TABLE_CAPACITY'] = int(os.environ.get('SESSION_TABLE_CAPACITY', 65536))
+app.config['SESSION_TABLE_SYNC_SECONDS'] = float(os.environ.get('SESSION_TABLE_SYNC_SECONDS', 1))
+session_table.init_app(app)
+
+@app.cli.command('rebuild-counters')
+def rebuild_counters_command():
+    """Recompute the attendance counter tables from attendance records"""
+    with db.engine.begin() as connection:
+        rebuild_counters(connection)
+    print("Attendance counters rebuilt successfully!")
+
+@app.cli.command('close-sessions')
+def close_sessions_command():
+    """Close every session whose end time has passed and write its absences"""
+    closed, _ = session_closer.run_once()
+    print(f"Closed {closed} sessions")
+
+@app.cli.command('purge-revoked-tokens')
+def purge_revoked_tokens_command():
+    """Delete token revocations whose tokens have expired"""
+    print(f"Purged {token_revocations.purge()} expired token revocations")
+
+@app.cli.command('seed')
+@click.option('--students', default=1000, show_default=True, help='Number of students')
+@click.option('--courses', default=50, show_default=True, help='Number of courses (one instructor per 5 courses)')
+@click.option('--sessions', default=1000, show_default=True, help='Number of class sessions')
+@click.option('--today-sessions', default=0, show_default=True, help='Sessions starting now that can be checked into')
+@click.option('--enrollments-per-student', default=3, show_default=True, help='Average courses per student')
+@click.option('--attendance-rate', default=0.9, show_default=True, help='Share of enrolled students attending each past session')
+@click.option('--feedback-rate', default=0.2, show_default=True, help='Share of enrolled students leaving course feedback')
+@click.option('--seed', default=42, show_default=True, help='Random seed; the same seed generates the same data')
+@click.option('--password', default='password', show_default=True, help='Password of every generated user')
+def seed_command(students, courses, sessions, today_sessions, enrollments_per_student, attendance_rate,
+                 feedback_rate, seed, password):
+    """Bulk-generate users, courses, enrollments, sessions, attendance and feedback"""
+    started = time.perf_counter()
+    result = seed_database(
+        students=students, courses=courses, sessions=sessions, today_sessions=today_sessions,
+        enrollments_per_student=enrollments_per_student, attendance_rate=attendance_rate,
+        feedback_rate=feedback_rate, seed=seed, password=password
+    )
+    for name, count in result['counts'].items():
+        print(f"{name}: {count:,}")
+    print(f"Seeded database in {time.perf_counter() - started:.1f}s")
+
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
@@ -100,7 +214,24 @@ def serve(path):
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    return {'status': 'healthy', 'message': 'GPS Attendance API is running'}, 200
+    return {
+        'status': 'healthy',
+        'message': 'GPS Attendance API is running',
+        'caches': {
+            'enrollment': enrollment_cache.stats(), 'user': user_cache.stats(), 'response': response_cache.stats()
+        },
+        'checkin_writer': checkin_writer.stats(),
+        'session_closer': session_closer.stats(),
+        'roster_streams': roster_broker.stats(),
+        'session_table': session_table.stats(),
+        'session_index': session_index.stats()
+    }, 200
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    if not request_metrics.enabled:
+        return {'message': 'Metrics are disabled'}, 404
+    return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
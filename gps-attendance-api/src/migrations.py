@@ -0,0 +1,150 @@
+"""Versioned schema migrations for databases created before a model change.
+
+``db.create_all()`` only creates missing tables, so indexes and constraints
+added to existing tables are applied here. Each migration runs once, in its
+own transaction, and is recorded in the ``schema_version`` table. Migrations
+must be idempotent because fresh databases already get the full schema from
+``create_all()``.
+"""
+import logging
+from datetime import datetime
+from sqlalchemy import bindparam, inspect, select, text, update
+from src.models.user import ClassSession, CourseAttendanceCounter, StudentAttendanceCounter, check_in_window
+from src.services.attendance_counters import rebuild_counters
+
+logger = logging.getLogger(__name__)
+
+def _set_aside_duplicates(connection, table, key):
+    """Move every row but the first of each ``key`` group into ``<table>_duplicate`` and return how many"""
+    duplicates = f"SELECT * FROM {table} WHERE id NOT IN (SELECT MIN(id) FROM {table} GROUP BY {key})"
+    count = connection.execute(text(f"SELECT COUNT(*) FROM ({duplicates}) AS duplicates")).scalar()
+    if count:
+        connection.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_duplicate AS SELECT * FROM {table} WHERE 1 = 0"))
+        connection.execute(text(f"INSERT INTO {table}_duplicate {duplicates}"))
+        connection.execute(text(f"DELETE FROM {table} WHERE id IN (SELECT id FROM {table}_duplicate)"))
+        logger.warning(
+            "Moved %d duplicate %s rows (same %s) to %s_duplicate so the unique index could be built; "
+            "review them there", count, table, key, table
+        )
+    return count
+
+def _attendance_and_enrollment_indexes(connection):
+    # The old read-then-write checks could leave duplicates, which would stop the unique indexes
+    # from being built; they are kept for review rather than deleted
+    _set_aside_duplicates(connection, 'attendance_record', 'session_id, student_id')
+    _set_aside_duplicates(connection, 'course_enrollment', 'course_id, student_id')
+    for statement in [
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_attendance_record_session_student ON attendance_record (session_id, student_id)",
+        "CREATE INDEX IF NOT EXISTS ix_attendance_record_student_created ON attendance_record (student_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_attendance_record_session_status ON attendance_record (session_id, status)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_course_enrollment_course_student ON course_enrollment (course_id, student_id)",
+        "CREATE INDEX IF NOT EXISTS ix_course_enrollment_student ON course_enrollment (student_id)",
+        "CREATE INDEX IF NOT EXISTS ix_class_session_course_date ON class_session (course_id, session_date)",
+        "CREATE INDEX IF NOT EXISTS ix_class_session_date_active ON class_session (session_date, is_active)",
+    ]:
+        connection.execute(text(statement))
+
+def _attendance_counters(connection):
+    StudentAttendanceCounter.__table__.create(connection, checkfirst=True)
+    CourseAttendanceCounter.__table__.create(connection, checkfirst=True)
+    rebuild_counters(connection)
+
+def _keyset_pagination_indexes(connection):
+    # Extend the history index with id so (created_at, id) cursors seek without sorting
+    for statement in [
+        "DROP INDEX IF EXISTS ix_attendance_record_student_created",
+        "CREATE INDEX ix_attendance_record_student_created ON attendance_record (student_id, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_feedback_course_created ON feedback (course_id, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_feedback_student_created ON feedback (student_id, created_at, id)",
+    ]:
+        connection.execute(text(statement))
+
+def _course_schedules(connection):
+    # course_schedule itself comes from create_all(); link existing sessions tables to it
+    columns = [column['name'] for column in inspect(connection).get_columns('class_session')]
+    if 'schedule_id' not in columns:
+        connection.execute(text("ALTER TABLE class_session ADD COLUMN schedule_id INTEGER REFERENCES course_schedule (id)"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_class_session_schedule_date ON class_session (schedule_id, session_date)"
+    ))
+
+def _session_closeout(connection):
+    columns = [column['name'] for column in inspect(connection).get_columns('class_session')]
+    if 'closed_at' not in columns:
+        connection.execute(text("ALTER TABLE class_session ADD COLUMN closed_at DATETIME"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_class_session_closed_date ON class_session (closed_at, session_date)"
+    ))
+
+def _stamp_check_in_windows(connection, *conditions):
+    # Typed Core statements so dates and times come back as objects on every backend
+    table = ClassSession.__table__
+    rows = connection.execute(
+        select(table.c.id, table.c.session_date, table.c.start_time, table.c.end_time).where(*conditions)
+    ).all()
+    windows = [
+        dict(zip(('session_id', 'opens_at', 'late_at', 'closes_at'), (session_id, *check_in_window(*times))))
+        for session_id, *times in rows
+    ]
+    if windows:
+        connection.execute(update(table).where(table.c.id == bindparam('session_id')).values(
+            opens_at=bindparam('opens_at'), late_at=bindparam('late_at'), closes_at=bindparam('closes_at')
+        ), windows)
+
+def _check_in_windows(connection):
+    columns = [column['name'] for column in inspect(connection).get_columns('class_session')]
+    for name in ('opens_at', 'late_at', 'closes_at'):
+        if name not in columns:
+            connection.execute(text(f"ALTER TABLE class_session ADD COLUMN {name} DATETIME"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_class_session_course_window ON class_session (course_id, opens_at, closes_at)"
+    ))
+    # Backfill the same way new sessions are stamped
+    _stamp_check_in_windows(connection, ClassSession.__table__.c.opens_at.is_(None))
+
+def _session_timezone(connection):
+    # Windows stamped before SESSION_TIMEZONE existed followed the host's TZ
+    _stamp_check_in_windows(connection)
+
+def _sub_second_revocations(connection):
+    # SQLite stores fractional values in the existing column as they are
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text("ALTER TABLE revoked_token ALTER COLUMN revoked_before TYPE DOUBLE PRECISION"))
+    elif connection.dialect.name == 'mysql':
+        connection.execute(text("ALTER TABLE revoked_token MODIFY revoked_before DOUBLE"))
+
+# (version, name, function) in the order they must be applied
+MIGRATIONS = [
+    (1, 'attendance_and_enrollment_indexes', _attendance_and_enrollment_indexes),
+    (2, 'attendance_counters', _attendance_counters),
+    (3, 'keyset_pagination_indexes', _keyset_pagination_indexes),
+    (4, 'course_schedules', _course_schedules),
+    (5, 'session_closeout', _session_closeout),
+    (6, 'check_in_windows', _check_in_windows),
+    (7, 'session_timezone', _session_timezone),
+    (8, 'sub_second_revocations', _sub_second_revocations),
+]
+
+def current_version(connection):
+    return connection.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar()
+
+def run_migrations(engine):
+    """Apply every pending migration and return the list of versions applied"""
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_version ("
+            "version INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, applied_at DATETIME NOT NULL)"
+        ))
+
+    applied = []
+    for version, name, migrate in MIGRATIONS:
+        with engine.begin() as connection:
+            if version <= current_version(connection):
+                continue
+            migrate(connection)
+            connection.execute(
+                text("INSERT INTO schema_version (version, name, applied_at) VALUES (:version, :name, :applied_at)"),
+                {'version': version, 'name': name, 'applied_at': datetime.utcnow()}
+            )
+        applied.append(version)
+    return applied
@@ -1,8 +1,54 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+import json
+import os
+from src.services.engine_profiles import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+WEEKDAY_NAMES = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+# Time zone that session dates and times are entered in (an IANA name such as
+# "America/New_York"); configured explicitly so the host's TZ never moves them
+SESSION_TIMEZONE = ZoneInfo(os.environ.get('SESSION_TIMEZONE', 'UTC'))
+
+# Check-ins open this long before a session starts
+CHECKIN_OPENS_BEFORE = timedelta(minutes=15)
+
+def session_now():
+    """Current wall-clock time in SESSION_TIMEZONE, comparable with session dates and times"""
+    return datetime.now(SESSION_TIMEZONE).replace(tzinfo=None)
+
+def check_in_window(session_date, start_time, end_time):
+    """Return the UTC instants (opens_at, late_at, closes_at) of a session scheduled in SESSION_TIMEZONE.
+
+    Automatic check-in only considers sessions from opens_at up to closes_at;
+    check-ins with a session id are accepted at any time of the session's
+    day. late_at is the start of the session: check-ins up to it are present
+    and those in the following 15 minutes are late (see determine_status).
+    Working with instants keeps starts near the end of an hour or of the day
+    from wrapping around.
+    """
+    late_at = datetime.combine(session_date, start_time, SESSION_TIMEZONE).astimezone(timezone.utc).replace(tzinfo=None)
+    closes_at = datetime.combine(session_date, end_time, SESSION_TIMEZONE).astimezone(timezone.utc).replace(tzinfo=None)
+    return late_at - CHECKIN_OPENS_BEFORE, late_at, closes_at
+
+def is_unique_violation(error, index_name):
+    """Whether an IntegrityError was raised by the named unique index rather than another constraint"""
+    message = str(error.orig)
+    # PostgreSQL and MySQL name the index
+    if index_name in message:
+        return True
+    # SQLite names the indexed columns instead
+    for table in db.metadata.tables.values():
+        for index in table.indexes:
+            if index.name == index_name:
+                columns = ', '.join(f'{table.name}.{column.name}' for column in index.columns)
+                return f'UNIQUE constraint failed: {columns}' in message
+    return False
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -57,7 +103,11 @@ class Course(db.Model):
     sessions = db.relationship('ClassSession', backref='course', lazy=True)
     feedback = db.relationship('Feedback', backref='course', lazy=True)
 
-    def to_dict(self):
+    def to_dict(self, student_count=None):
+        # List endpoints pass counts from one grouped query; otherwise count
+        # in SQL rather than loading every enrollment row
+        if student_count is None:
+            student_count = CourseEnrollment.query.filter_by(course_id=self.id).count()
         return {
             'id': self.id,
             'course_name': self.course_name,
@@ -66,10 +116,15 @@ class Course(db.Model):
             'instructor_name': f"{self.instructor.first_name} {self.instructor.last_name}" if self.instructor else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'is_active': self.is_active,
-            'student_count': len(self.enrollments)
+            'student_count': student_count
         }
 
 class CourseEnrollment(db.Model):
+    __table_args__ = (
+        db.Index('uq_course_enrollment_course_student', 'course_id', 'student_id', unique=True),
+        db.Index('ix_course_enrollment_student', 'student_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -83,9 +138,53 @@ class CourseEnrollment(db.Model):
             'enrolled_at': self.enrolled_at.isoformat() if self.enrolled_at else None
         }
 
+class CourseSchedule(db.Model):
+    """Recurring weekly meeting of a course that expands into ClassSession rows for a term"""
+    id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False, index=True)
+    weekdays = db.Column(db.Integer, nullable=False)  # bitmask, Monday = 1 << 0 ... Sunday = 1 << 6
+    start_time = db.Column(db.Time, nullable=False)
+    end_time = db.Column(db.Time, nullable=False)
+    location_name = db.Column(db.String(100), nullable=False)
+    latitude = db.Column(db.Float, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+    attendance_radius = db.Column(db.Integer, default=50)  # meters
+    term_start = db.Column(db.Date, nullable=False)
+    term_end = db.Column(db.Date, nullable=False)
+    excluded_dates = db.Column(db.Text, default='[]')  # JSON list of ISO dates (holidays)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    is_active = db.Column(db.Boolean, default=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'course_id': self.course_id,
+            'weekdays': [name for bit, name in enumerate(WEEKDAY_NAMES) if self.weekdays & (1 << bit)],
+            'start_time': self.start_time.isoformat() if self.start_time else None,
+            'end_time': self.end_time.isoformat() if self.end_time else None,
+            'location_name': self.location_name,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'attendance_radius': self.attendance_radius,
+            'term_start': self.term_start.isoformat() if self.term_start else None,
+            'term_end': self.term_end.isoformat() if self.term_end else None,
+            'excluded_dates': json.loads(self.excluded_dates or '[]'),
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'is_active': self.is_active
+        }
+
 class ClassSession(db.Model):
+    __table_args__ = (
+        db.Index('ix_class_session_course_date', 'course_id', 'session_date'),
+        db.Index('ix_class_session_date_active', 'session_date', 'is_active'),
+        db.Index('ix_class_session_schedule_date', 'schedule_id', 'session_date'),
+        db.Index('ix_class_session_closed_date', 'closed_at', 'session_date'),
+        db.Index('ix_class_session_course_window', 'course_id', 'opens_at', 'closes_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    schedule_id = db.Column(db.Integer, db.ForeignKey('course_schedule.id'))  # set when generated from a schedule
     instructor_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     session_date = db.Column(db.Date, nullable=False)
     start_time = db.Column(db.Time, nullable=False)
@@ -96,14 +195,24 @@ class ClassSession(db.Model):
     attendance_radius = db.Column(db.Integer, default=50)  # meters
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
+    closed_at = db.Column(db.DateTime)  # set once absences have been written after end_time
+    # UTC instants derived from session_date, start_time and end_time; see check_in_window()
+    opens_at = db.Column(db.DateTime)
+    late_at = db.Column(db.DateTime)
+    closes_at = db.Column(db.DateTime)
 
     # Relationships
     attendance_records = db.relationship('AttendanceRecord', backref='session', lazy=True)
 
+    def set_check_in_window(self):
+        """Recompute the check-in instants after the date or times changed"""
+        self.opens_at, self.late_at, self.closes_at = check_in_window(self.session_date, self.start_time, self.end_time)
+
     def to_dict(self):
         return {
             'id': self.id,
             'course_id': self.course_id,
+            'schedule_id': self.schedule_id,
             'instructor_id': self.instructor_id,
             'session_date': self.session_date.isoformat() if self.session_date else None,
             'start_time': self.start_time.isoformat() if self.start_time else None,
@@ -113,10 +222,23 @@ class ClassSession(db.Model):
             'longitude': self.longitude,
             'attendance_radius': self.attendance_radius,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'is_active': self.is_active
+            'is_active': self.is_active,
+            'closed_at': self.closed_at.isoformat() if self.closed_at else None
         }
 
+@event.listens_for(ClassSession, 'before_insert')
+@event.listens_for(ClassSession, 'before_update')
+def _stamp_check_in_window(mapper, connection, session):
+    # Core inserts and updates (schedules, seeding) compute the window themselves
+    session.set_check_in_window()
+
 class AttendanceRecord(db.Model):
+    __table_args__ = (
+        db.Index('uq_attendance_record_session_student', 'session_id', 'student_id', unique=True),
+        db.Index('ix_attendance_record_student_created', 'student_id', 'created_at', 'id'),
+        db.Index('ix_attendance_record_session_status', 'session_id', 'status'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.Integer, db.ForeignKey('class_session.id'), nullable=False)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -138,7 +260,47 @@ class AttendanceRecord(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class StudentAttendanceCounter(db.Model):
+    """Running count of attendance records per student, course and status"""
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class CourseAttendanceCounter(db.Model):
+    """Running count of attendance records per course and status"""
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class RevokedToken(db.Model):
+    """Deny-list entry for one token, or for every token a user was issued before a point in time"""
+    __table_args__ = (
+        db.Index('uq_revoked_token_jti', 'jti', unique=True),
+        db.Index('ix_revoked_token_expires', 'expires_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36))  # null for user-wide entries
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    revoked_before = db.Column(db.Float)  # user-wide entries: tokens with this or an earlier iat are revoked
+    expires_at = db.Column(db.DateTime, nullable=False)  # when the revoked tokens expire anyway
+
+class CacheVersion(db.Model):
+    """Version counter of one group of cached responses, bumped in the transaction that changes it"""
+    __table_args__ = (
+        db.Index('ix_cache_version_version', 'version'),
+    )
+
+    name = db.Column(db.String(100), primary_key=True)  # e.g. "courses" or "sessions:42"
+    version = db.Column(db.Integer, nullable=False, default=0)  # drawn from one sequence shared by all names
+
 class Feedback(db.Model):
+    __table_args__ = (
+        db.Index('ix_feedback_course_created', 'course_id', 'created_at', 'id'),
+        db.Index('ix_feedback_student_created', 'student_id', 'created_at', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)  # nullable for anonymous feedback
@@ -1,26 +1,110 @@
-from flask import Blueprint, jsonify, request
-from datetime import datetime, date, time
-import math
-from src.models.user import User, Course, ClassSession, AttendanceRecord, CourseEnrollment, db
+from flask import Blueprint, Response, g, jsonify, request, stream_with_context
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, time, timedelta, timezone
+import csv
+import io
+import json
+from collections import Counter
+from itertools import chain
+from src.models.user import (
+    User, Course, ClassSession, AttendanceRecord, CourseEnrollment, db, is_unique_violation, session_now
+)
 from src.routes.auth import token_required, role_required
+from src.services.aggregates import attendance_status_counts, course_status_counts, student_status_counts
+from src.services.attendance_counters import record_attendance
+from src.services.checkin_writer import checkin_writer, CheckInPendingError, DuplicateCheckInError, QueueFullError
+from src.services.engine_profiles import read_only
+from src.services.enrollment_cache import enrollment_cache
+from src.services.geo import calculate_distance, haversine_distances
+from src.services.pagination import keyset_filter, split_page, wants_total
+from src.services.roster_stream import roster_broker, roster_entry, StreamLimitError
+from src.services.serializers import ATTENDANCE_FIELDS, columns, dumps, json_response
+from src.services.session_table import session_table
 
 attendance_bp = Blueprint('attendance', __name__)
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Calculate distance between two GPS coordinates using Haversine formula"""
-    R = 6371000  # Earth's radius in meters
+MAX_BATCH_CHECKINS = 500
+DEVICE_CLOCK_SKEW = timedelta(minutes=5)
+
+# Check-ins this long after a session starts are still marked late rather than present
+LATE_WINDOW = timedelta(minutes=15)
+
+def determine_status(session, check_in_time):
+    """Determine attendance status from the UTC time of a check-in and the session's precomputed late_at"""
+    if check_in_time <= session.late_at:
+        return 'present'
+    elif check_in_time <= session.late_at + LATE_WINDOW:
+        return 'late'
+    else:
+        return 'present'  # Still mark as present if they check in
+
+def parse_device_timestamp(value):
+    """Parse an ISO 8601 device timestamp into a naive UTC datetime"""
+    timestamp = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+def complete_check_in(current_user, session, latitude, longitude, distance):
+    """Write a check-in that passed the session, enrollment and geofence checks and build its response"""
+    # Read before the commit expires an ORM session
+    session_id, course_id = session.id, session.course_id
+    
+    # Determine attendance status based on time
+    check_in_time = datetime.utcnow()
+    status = determine_status(session, check_in_time)
     
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lon = math.radians(lon2 - lon1)
+    # Create attendance record
+    attendance_record = AttendanceRecord(
+        session_id=session_id,
+        student_id=current_user.id,
+        check_in_time=check_in_time,
+        latitude=latitude,
+        longitude=longitude,
+        status=status
+    )
+    
+    # The unique (session_id, student_id) index rejects a second check-in
+    if checkin_writer.enabled:
+        # Group commit: hand the connection back to the pool for the writer, then
+        # wait until the background writer has committed this row
+        db.session.close()
+        try:
+            record_dict = checkin_writer.submit(attendance_record, course_id)
+        except DuplicateCheckInError:
+            return jsonify({'message': 'You have already checked in for this session'}), 400
+        except QueueFullError:
+            return jsonify({'message': 'Check-in service is busy, please retry'}), 503
+        except CheckInPendingError:
+            # Still queued, so a retry could only be rejected as a duplicate
+            return jsonify({
+                'message': 'Check-in accepted but not recorded yet; check your attendance history before retrying',
+                'status': 'pending',
+                'session_id': session_id
+            }), 202
+    else:
+        db.session.add(attendance_record)
+        record_attendance([(current_user.id, course_id, status)])
+        try:
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            if not is_unique_violation(e, 'uq_attendance_record_session_student'):
+                raise
+            return jsonify({'message': 'You have already checked in for this session'}), 400
+        record_dict = attendance_record.to_dict()
     
-    a = (math.sin(delta_lat/2) * math.sin(delta_lat/2) + 
-         math.cos(lat1_rad) * math.cos(lat2_rad) * 
-         math.sin(delta_lon/2) * math.sin(delta_lon/2))
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    roster_broker.publish(session_id, record_dict['id'], current_user.id, status, record_dict['check_in_time'],
+                          int(distance))
     
-    return R * c  # Distance in meters
+    return jsonify({
+        'message': 'Check-in successful',
+        'status': status,
+        'distance': int(distance),
+        'check_in_time': record_dict['check_in_time'],
+        'attendance_record': record_dict
+    }), 200
 
 @attendance_bp.route('/checkin', methods=['POST'])
 @token_required
@@ -32,28 +116,16 @@ def check_in(current_user):
         if not data or not all(k in data for k in ['session_id', 'latitude', 'longitude']):
             return jsonify({'message': 'Session ID, latitude, and longitude are required'}), 400
         
-        session = ClassSession.query.get(data['session_id'])
-        if not session or not session.is_active:
+        # Only sessions that are active today can be checked into; read from the
+        # table shared by the workers on this host, querying only for sessions it lacks
+        session = session_table.get(data['session_id'])
+        if not session:
             return jsonify({'message': 'Invalid or inactive session'}), 404
         
         # Check if student is enrolled in the course
-        enrollment = CourseEnrollment.query.filter_by(
-            course_id=session.course_id,
-            student_id=current_user.id
-        ).first()
-        
-        if not enrollment:
+        if not enrollment_cache.is_enrolled(session.course_id, current_user.id):
             return jsonify({'message': 'You are not enrolled in this course'}), 403
         
-        # Check if student has already checked in for this session
-        existing_record = AttendanceRecord.query.filter_by(
-            session_id=session.id,
-            student_id=current_user.id
-        ).first()
-        
-        if existing_record:
-            return jsonify({'message': 'You have already checked in for this session'}), 400
-        
         # Calculate distance from session location
         distance = calculate_distance(
             data['latitude'], data['longitude'],
@@ -68,45 +140,290 @@ def check_in(current_user):
                 'required_radius': session.attendance_radius
             }), 400
         
-        # Determine attendance status based on time
-        current_time = datetime.now().time()
-        session_start = session.start_time
+        return complete_check_in(current_user, session, data['latitude'], data['longitude'], distance)
         
-        # Consider late if more than 15 minutes after start time
-        late_threshold = datetime.combine(date.today(), session_start).replace(minute=session_start.minute + 15)
+    except Exception as e:
+        return jsonify({'message': 'Check-in failed', 'error': str(e)}), 500
+
+@attendance_bp.route('/checkin/auto', methods=['POST'])
+@token_required
+@role_required(['student'])
+def auto_check_in(current_user):
+    try:
+        data = request.get_json()
+        
+        if not data or not all(k in data for k in ['latitude', 'longitude']):
+            return jsonify({'message': 'Latitude and longitude are required'}), 400
+        
+        latitude = float(data['latitude'])
+        longitude = float(data['longitude'])
+        if not (-90 <= latitude <= 90) or not (-180 <= longitude <= 180):
+            return jsonify({'message': 'Invalid GPS coordinates'}), 400
+        
+        # Sessions of the student's courses whose check-in window is open now, in one query:
+        # the student's enrollments, then the (course_id, opens_at, closes_at) index
+        now = datetime.utcnow()
+        sessions = db.session.query(ClassSession).join(
+            CourseEnrollment, CourseEnrollment.course_id == ClassSession.course_id
+        ).filter(
+            CourseEnrollment.student_id == current_user.id,
+            ClassSession.opens_at <= now,
+            ClassSession.closes_at > now,
+            ClassSession.is_active == True,
+            ClassSession.closed_at.is_(None)
+        ).all()
+        
+        if not sessions:
+            return jsonify({'message': 'None of your courses has a session open for check-in right now'}), 404
+        
+        distances = haversine_distances(
+            latitude, longitude, [s.latitude for s in sessions], [s.longitude for s in sessions]
+        )
+        nearby = [(session, distance) for session, distance in zip(sessions, distances)
+                  if distance <= session.attendance_radius]
+        
+        if not nearby:
+            session, distance = min(zip(sessions, distances), key=lambda match: match[1])
+            return jsonify({
+                'message': f'You are {int(distance)}m away from the class location. You need to be within {session.attendance_radius}m to check in.',
+                'session_id': session.id,
+                'distance': int(distance),
+                'required_radius': session.attendance_radius
+            }), 400
         
-        if current_time <= session_start:
-            status = 'present'
-        elif current_time <= late_threshold.time():
-            status = 'late'
+        if len(nearby) > 1:
+            # Overlapping sessions in the same place; let the student pick one and use /checkin
+            return jsonify({
+                'message': 'More than one session is open here, choose one and check in with its session ID',
+                'sessions': [
+                    {'session_id': session.id, 'course_id': session.course_id,
+                     'location_name': session.location_name, 'distance': int(distance)}
+                    for session, distance in sorted(nearby, key=lambda match: match[1])
+                ]
+            }), 409
+        
+        session, distance = nearby[0]
+        return complete_check_in(current_user, session, latitude, longitude, distance)
+        
+    except ValueError:
+        return jsonify({'message': 'Invalid coordinates'}), 400
+    except Exception as e:
+        return jsonify({'message': 'Check-in failed', 'error': str(e)}), 500
+
+def write_check_ins(accepted, reject):
+    """Flush accepted (index, distance, record) check-ins and return the ones that were written.
+
+    Everything is inserted at once; if a concurrent request wrote one of the
+    same (session, student) pairs first, the batch is retried row by row inside
+    savepoints so only the conflicting entries are rejected. Any other
+    constraint failure is raised.
+    """
+    try:
+        with db.session.begin_nested():
+            db.session.add_all([record for _, _, record in accepted])
+        return accepted
+    except IntegrityError:
+        pass
+    
+    written = []
+    for index, distance, record in accepted:
+        try:
+            with db.session.begin_nested():
+                db.session.add(record)
+            written.append((index, distance, record))
+        except IntegrityError as e:
+            if not is_unique_violation(e, 'uq_attendance_record_session_student'):
+                raise
+            reject(index, 'Student has already checked in for this session')
+    return written
+
+def upgrade_absences(upgrades, reject):
+    """Write late-uploaded (index, distance, record) check-ins over the absences close-out wrote for them.
+
+    Each update only matches a row that is still absent, so of two uploads
+    racing for the same student only one replaces the absence.
+    """
+    upgraded = []
+    for index, distance, record in upgrades:
+        changed = db.session.execute(update(AttendanceRecord.__table__).where(
+            AttendanceRecord.id == record.id, AttendanceRecord.status == 'absent'
+        ).values(
+            check_in_time=record.check_in_time, latitude=record.latitude, longitude=record.longitude,
+            status=record.status
+        )).rowcount
+        if changed:
+            upgraded.append((index, distance, record))
         else:
-            status = 'present'  # Still mark as present if they check in
-        
-        # Create attendance record
-        attendance_record = AttendanceRecord(
-            session_id=session.id,
-            student_id=current_user.id,
-            check_in_time=datetime.utcnow(),
-            latitude=data['latitude'],
-            longitude=data['longitude'],
-            status=status
+            reject(index, 'Student has already checked in for this session')
+    return upgraded
+
+@attendance_bp.route('/checkin/batch', methods=['POST'])
+@token_required
+@role_required(['student', 'instructor', 'admin'])
+def batch_check_in(current_user):
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('checkins'), list) or not data['checkins']:
+            return jsonify({'message': 'A non-empty list of check-ins is required'}), 400
+        
+        if len(data['checkins']) > MAX_BATCH_CHECKINS:
+            return jsonify({'message': f'At most {MAX_BATCH_CHECKINS} check-ins can be submitted per batch'}), 400
+        
+        results = [None] * len(data['checkins'])
+        entries = []
+        latest_allowed = datetime.utcnow() + DEVICE_CLOCK_SKEW
+        
+        def reject(index, message, **extra):
+            results[index] = dict({'index': index, 'accepted': False, 'message': message}, **extra)
+        
+        # Validate the shape of every entry before touching the database
+        for index, entry in enumerate(data['checkins']):
+            if not isinstance(entry, dict) or not all(k in entry for k in ['session_id', 'latitude', 'longitude']):
+                reject(index, 'Session ID, latitude, and longitude are required')
+                continue
+            
+            # Students can only upload their own queued check-ins
+            student_id = entry.get('student_id', current_user.id)
+            if current_user.role == 'student' and student_id != current_user.id:
+                reject(index, 'Students can only check in for themselves')
+                continue
+            
+            try:
+                session_id = int(entry['session_id'])
+                student_id = int(student_id)
+                latitude = float(entry['latitude'])
+                longitude = float(entry['longitude'])
+                check_in_time = parse_device_timestamp(entry['timestamp']) if entry.get('timestamp') else datetime.utcnow()
+            except (TypeError, ValueError):
+                reject(index, 'Invalid session ID, student ID, coordinates or timestamp')
+                continue
+            
+            if not (-90 <= latitude <= 90) or not (-180 <= longitude <= 180):
+                reject(index, 'Invalid GPS coordinates')
+                continue
+            
+            if check_in_time > latest_allowed:
+                reject(index, 'Check-in timestamp is in the future')
+                continue
+            
+            entries.append((index, session_id, student_id, latitude, longitude, check_in_time))
+        
+        # Resolve sessions and existing check-ins with one query each
+        session_ids = {e[1] for e in entries}
+        student_ids = {e[2] for e in entries}
+        
+        sessions = {}
+        if session_ids:
+            sessions = {s.id: s for s in ClassSession.query.filter(ClassSession.id.in_(session_ids)).all()}
+        
+        # (session_id, student_id) -> (id, status, created_at) of the record already written
+        existing = {}
+        if sessions and student_ids:
+            existing = {
+                (session_id, student_id): (record_id, status, created_at)
+                for session_id, student_id, record_id, status, created_at in db.session.query(
+                    AttendanceRecord.session_id, AttendanceRecord.student_id, AttendanceRecord.id,
+                    AttendanceRecord.status, AttendanceRecord.created_at
+                ).filter(
+                    AttendanceRecord.session_id.in_(sessions.keys()),
+                    AttendanceRecord.student_id.in_(student_ids)
+                )
+            }
+        
+        candidates = []
+        for index, session_id, student_id, latitude, longitude, check_in_time in entries:
+            session = sessions.get(session_id)
+            if not session or not session.is_active:
+                reject(index, 'Invalid or inactive session')
+                continue
+            
+            # Kiosk accounts belonging to an instructor may only submit for their own sessions
+            if current_user.role == 'instructor' and session.instructor_id != current_user.id:
+                reject(index, 'Access denied')
+                continue
+            
+            if not enrollment_cache.is_enrolled(session.course_id, student_id):
+                reject(index, 'Student is not enrolled in this course')
+                continue
+            
+            candidates.append((index, session, student_id, latitude, longitude, check_in_time))
+        
+        # Run the geofence test for every remaining entry at once
+        distances = haversine_distances(
+            [c[3] for c in candidates], [c[4] for c in candidates],
+            [c[1].latitude for c in candidates], [c[1].longitude for c in candidates]
         )
         
-        db.session.add(attendance_record)
-        db.session.commit()
+        accepted = []
+        upgrades = []
+        for (index, session, student_id, latitude, longitude, check_in_time), distance in zip(candidates, distances):
+            # Only an absence written at close-out may be replaced, e.g. by a device that synced late
+            previous = existing.get((session.id, student_id))
+            if previous and previous[1] != 'absent':
+                reject(index, 'Student has already checked in for this session')
+                continue
+            
+            if distance > session.attendance_radius:
+                reject(index, f'Check-in was {int(distance)}m away from the class location. It needs to be within {session.attendance_radius}m.',
+                       distance=int(distance), required_radius=session.attendance_radius)
+                continue
+            
+            record = AttendanceRecord(
+                session_id=session.id,
+                student_id=student_id,
+                check_in_time=check_in_time,
+                latitude=latitude,
+                longitude=longitude,
+                status=determine_status(session, check_in_time)
+            )
+            
+            # Guard against the same student appearing twice in one batch
+            existing[(session.id, student_id)] = (None, record.status, None)
+            if previous:
+                # Takes over the absent row's id; written with an UPDATE, never added to the session
+                record.id, record.created_at = previous[0], previous[2]
+                upgrades.append((index, int(distance), record))
+            else:
+                accepted.append((index, int(distance), record))
+        
+        # Write every accepted check-in in a single transaction, serializing
+        # after the flush so the commit does not expire the new rows
+        if accepted or upgrades:
+            accepted = write_check_ins(accepted, reject) if accepted else []
+            upgraded = upgrade_absences(upgrades, reject)
+            record_attendance(
+                [(record.student_id, sessions[record.session_id].course_id, record.status)
+                 for _, _, record in chain(accepted, upgraded)],
+                replaced=[(record.student_id, sessions[record.session_id].course_id, 'absent')
+                          for _, _, record in upgraded]
+            )
+            accepted += upgraded
+            
+            for index, distance, record in accepted:
+                results[index] = {
+                    'index': index,
+                    'accepted': True,
+                    'status': record.status,
+                    'distance': distance,
+                    'attendance_record': record.to_dict()
+                }
+            
+            db.session.commit()
+            roster_broker.notify()
         
         return jsonify({
-            'message': 'Check-in successful',
-            'status': status,
-            'distance': int(distance),
-            'check_in_time': attendance_record.check_in_time.isoformat(),
-            'attendance_record': attendance_record.to_dict()
+            'message': 'Batch check-in processed',
+            'accepted_count': len(accepted),
+            'rejected_count': len(results) - len(accepted),
+            'results': results
         }), 200
         
     except Exception as e:
-        return jsonify({'message': 'Check-in failed', 'error': str(e)}), 500
+        return jsonify({'message': 'Batch check-in failed', 'error': str(e)}), 500
 
 @attendance_bp.route('/history', methods=['GET'])
+@read_only
 @token_required
 @role_required(['student'])
 def get_attendance_history(current_user):
@@ -115,6 +432,10 @@ def get_attendance_history(current_user):
         course_id = request.args.get('course_id', type=int)
         limit = request.args.get('limit', default=50, type=int)
         offset = request.args.get('offset', default=0, type=int)
+        cursor = request.args.get('cursor')
+        
+        if limit < 1:
+            return jsonify({'message': 'Limit must be a positive integer'}), 400
         
         # Build query
         query = AttendanceRecord.query.filter_by(student_id=current_user.id)
@@ -123,53 +444,73 @@ def get_attendance_history(current_user):
             # Filter by course through session
             query = query.join(ClassSession).filter(ClassSession.course_id == course_id)
         
-        # Get total count
-        total_count = query.count()
+        # Counting repeats the whole filter, so it is opt-in
+        total_count = query.count() if wants_total() else None
+        
+        # Select the record columns with their session and course details in one query
+        query = db.session.query(
+            *columns(AttendanceRecord, ATTENDANCE_FIELDS), Course.course_name, Course.course_code,
+            ClassSession.session_date, ClassSession.start_time, ClassSession.end_time
+        ).join(ClassSession, ClassSession.id == AttendanceRecord.session_id).join(
+            Course, Course.id == ClassSession.course_id
+        ).filter(AttendanceRecord.student_id == current_user.id)
+        if course_id:
+            query = query.filter(ClassSession.course_id == course_id)
         
-        # Apply pagination and ordering
-        attendance_records = query.order_by(AttendanceRecord.created_at.desc()).offset(offset).limit(limit).all()
+        # Apply ordering, then seek past the cursor (or skip the legacy offset)
+        query = query.order_by(AttendanceRecord.created_at.desc(), AttendanceRecord.id.desc())
+        if cursor:
+            query = query.filter(keyset_filter(AttendanceRecord.created_at, AttendanceRecord.id, cursor))
+        else:
+            query = query.offset(offset)
+        attendance_records, next_cursor = split_page(query.limit(limit + 1).all(), limit)
         
         # Format response with additional information
         records_with_details = []
-        for record in attendance_records:
-            record_dict = record.to_dict()
-            record_dict['course_name'] = record.session.course.course_name
-            record_dict['course_code'] = record.session.course.course_code
-            record_dict['session_date'] = record.session.session_date.isoformat()
-            record_dict['session_time'] = f"{record.session.start_time} - {record.session.end_time}"
+        for row in attendance_records:
+            record_dict = dict(zip(ATTENDANCE_FIELDS, row))
+            if record_dict['status'] == 'absent':
+                # Close-out fills these columns with the close time and the session's location
+                record_dict.update(check_in_time=None, latitude=None, longitude=None)
+            course_name, course_code, session_date, start_time, end_time = row[-5:]
+            record_dict['course_name'] = course_name
+            record_dict['course_code'] = course_code
+            record_dict['session_date'] = session_date
+            record_dict['session_time'] = f"{start_time} - {end_time}"
             records_with_details.append(record_dict)
         
-        return jsonify({
+        response = {
             'attendance_records': records_with_details,
-            'total_count': total_count,
             'limit': limit,
-            'offset': offset
-        }), 200
+            'offset': offset,
+            'next_cursor': next_cursor
+        }
+        if total_count is not None:
+            response['total_count'] = total_count
+        
+        return json_response(response)
         
+    except ValueError as e:
+        return jsonify({'message': 'Invalid pagination cursor', 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'message': 'Failed to fetch attendance history', 'error': str(e)}), 500
 
 @attendance_bp.route('/statistics', methods=['GET'])
+@read_only
 @token_required
 @role_required(['student'])
 def get_attendance_statistics(current_user):
     try:
         course_id = request.args.get('course_id', type=int)
         
-        # Build base query
-        query = AttendanceRecord.query.filter_by(student_id=current_user.id)
-        
-        if course_id:
-            query = query.join(ClassSession).filter(ClassSession.course_id == course_id)
-        
-        # Get all attendance records
-        records = query.all()
+        # Read the precomputed per-status counters
+        counts = dict(student_status_counts(current_user.id, course_id))
         
         # Calculate statistics
-        total_sessions = len(records)
-        present_count = len([r for r in records if r.status == 'present'])
-        late_count = len([r for r in records if r.status == 'late'])
-        absent_count = len([r for r in records if r.status == 'absent'])
+        total_sessions = sum(counts.values())
+        present_count = counts.get('present', 0)
+        late_count = counts.get('late', 0)
+        absent_count = counts.get('absent', 0)
         
         attendance_percentage = (present_count + late_count) / total_sessions * 100 if total_sessions > 0 else 0
         
@@ -184,7 +525,69 @@ def get_attendance_statistics(current_user):
     except Exception as e:
         return jsonify({'message': 'Failed to fetch attendance statistics', 'error': str(e)}), 500
 
+def roster_summary(total_students, present_count, late_count, absent_count):
+    return {
+        'total_students': total_students,
+        'present_count': present_count,
+        'late_count': late_count,
+        'absent_count': absent_count,
+        'attendance_percentage': round((present_count + late_count) / total_students * 100, 2) if total_students > 0 else 0
+    }
+
+def session_roster(session):
+    """Build a session's roster response; returns the (student, record) pairs and the payload"""
+    if session.closed_at:
+        # Closed sessions have a record for every student on the roster, absences included
+        rows = db.session.query(AttendanceRecord, User).join(User, User.id == AttendanceRecord.student_id).filter(
+            AttendanceRecord.session_id == session.id
+        ).order_by(User.id).all()
+        roster = [(student, record) for record, student in rows]
+    else:
+        # Get all enrolled students for this course
+        enrolled_students = db.session.query(User).join(CourseEnrollment).filter(
+            CourseEnrollment.course_id == session.course_id
+        ).all()
+        
+        # Get attendance records for this session
+        attendance_dict = {
+            record.student_id: record for record in AttendanceRecord.query.filter_by(session_id=session.id).all()
+        }
+        roster = [(student, attendance_dict.get(student.id)) for student in enrolled_students]
+    
+    # Calculate distances for all checked-in students in one pass
+    checked_in = [record for _, record in roster if record and record.status != 'absent']
+    distances = haversine_distances(
+        [record.latitude for record in checked_in],
+        [record.longitude for record in checked_in],
+        session.latitude, session.longitude
+    )
+    distance_dict = {record.student_id: int(distance) for record, distance in zip(checked_in, distances)}
+    
+    # Build response with all students and their attendance status
+    student_attendance = [
+        roster_entry(
+            student.id, f"{student.first_name} {student.last_name}", student.email,
+            record.status if record else None, record.check_in_time.isoformat() if record else None,
+            distance_dict.get(student.id)
+        )
+        for student, record in roster
+    ]
+    
+    # Calculate summary statistics; before close-out, students without a record count as absent
+    counts = dict(attendance_status_counts(session_id=session.id))
+    total_students = len(roster)
+    present_count = counts.get('present', 0)
+    late_count = counts.get('late', 0)
+    absent_count = counts.get('absent', 0) if session.closed_at else total_students - present_count - late_count
+    
+    return roster, {
+        'session': session.to_dict(),
+        'student_attendance': student_attendance,
+        'summary': roster_summary(total_students, present_count, late_count, absent_count)
+    }
+
 @attendance_bp.route('/session/<int:session_id>/attendance', methods=['GET'])
+@read_only
 @token_required
 @role_required(['instructor', 'admin'])
 def get_session_attendance(current_user, session_id):
@@ -197,60 +600,112 @@ def get_session_attendance(current_user, session_id):
         if current_user.role == 'instructor' and session.instructor_id != current_user.id:
             return jsonify({'message': 'Access denied'}), 403
         
-        # Get all enrolled students for this course
-        enrolled_students = db.session.query(User).join(CourseEnrollment).filter(
-            CourseEnrollment.course_id == session.course_id
-        ).all()
+        _, payload = session_roster(session)
+        return jsonify(payload), 200
         
-        # Get attendance records for this session
-        attendance_records = AttendanceRecord.query.filter_by(session_id=session_id).all()
-        attendance_dict = {record.student_id: record for record in attendance_records}
-        
-        # Build response with all students and their attendance status
-        student_attendance = []
-        for student in enrolled_students:
-            record = attendance_dict.get(student.id)
-            student_info = {
-                'student_id': student.id,
-                'student_name': f"{student.first_name} {student.last_name}",
-                'student_email': student.email,
-                'status': record.status if record else 'absent',
-                'check_in_time': record.check_in_time.isoformat() if record else None,
-                'distance': None
-            }
+    except Exception as e:
+        return jsonify({'message': 'Failed to fetch session attendance', 'error': str(e)}), 500
+
+def sse_event(event, payload):
+    """Encode one Server-Sent Events message with a JSON data line"""
+    return b'event: ' + event.encode() + b'\ndata: ' + dumps(payload).rstrip(b'\n') + b'\n\n'
+
+# Not @read_only: the snapshot must be at least as fresh as the check-ins published after it
+@attendance_bp.route('/session/<int:session_id>/attendance/stream', methods=['GET'])
+@token_required
+@role_required(['instructor', 'admin'])
+def stream_session_attendance(current_user, session_id):
+    try:
+        session = ClassSession.query.get(session_id)
+        if not session:
+            return jsonify({'message': 'Session not found'}), 404
+        
+        if current_user.role == 'instructor' and session.instructor_id != current_user.id:
+            return jsonify({'message': 'Access denied'}), 403
+        
+        channel = position = None
+        if not session.closed_at:
+            # Subscribe before reading the snapshot so no check-in committed after it is missed
+            try:
+                channel, position = roster_broker.subscribe(session)
+            except StreamLimitError:
+                return jsonify({'message': 'Too many live rosters are open, please retry later'}), 503
+        
+        try:
+            roster, payload = session_roster(session)
+            if channel:
+                roster_broker.prime(channel, [record.id for _, record in roster if record], {
+                    student.id: (f"{student.first_name} {student.last_name}", student.email) for student, _ in roster
+                })
+            # Hand the connection back to the pool; the stream only touches the database to resync
+            db.session.close()
+        except Exception:
+            if channel:
+                roster_broker.unsubscribe(channel)
+            raise
+        
+        # The stream ends when the token expires, so revocations and role changes take effect on reconnect
+        expires_at = g.token_claims['exp']
+        
+        def generate(payload):
+            yield b'retry: 3000\n\n' + sse_event('snapshot', payload)
+            if channel is None:
+                yield sse_event('closed', {'session_id': session_id})
+                return
             
-            if record:
-                # Calculate distance for checked-in students
-                distance = calculate_distance(
-                    record.latitude, record.longitude,
-                    session.latitude, session.longitude
-                )
-                student_info['distance'] = int(distance)
+            rows = {entry['student_id']: entry for entry in payload['student_attendance']}
+            counts = Counter(entry['status'] for entry in rows.values())
+            for entries in roster_broker.listen(channel, position, expires_at):
+                if entries is None:
+                    # Fell behind the backlog: start over from a new snapshot
+                    session = ClassSession.query.get(session_id)
+                    if not session:
+                        return
+                    _, payload = session_roster(session)
+                    db.session.close()
+                    rows = {entry['student_id']: entry for entry in payload['student_attendance']}
+                    counts = Counter(entry['status'] for entry in rows.values())
+                    yield sse_event('snapshot', payload)
+                    continue
+                
+                if not entries:
+                    yield b': keep-alive\n\n'
+                    continue
+                
+                # Only send rows that differ from what this dashboard already shows
+                changed = []
+                for entry in entries:
+                    previous = rows.get(entry['student_id'])
+                    if previous == entry:
+                        continue
+                    if previous:
+                        counts[previous['status']] -= 1
+                    counts[entry['status']] += 1
+                    rows[entry['student_id']] = entry
+                    changed.append(entry)
+                
+                if changed:
+                    total_students = len(rows)
+                    yield sse_event('attendance', {
+                        'student_attendance': changed,
+                        'summary': roster_summary(total_students, counts['present'], counts['late'],
+                                                  total_students - counts['present'] - counts['late'])
+                    })
             
-            student_attendance.append(student_info)
+            if channel.closed:
+                yield sse_event('closed', {'session_id': session_id})
         
-        # Calculate summary statistics
-        total_students = len(enrolled_students)
-        present_count = len([s for s in student_attendance if s['status'] == 'present'])
-        late_count = len([s for s in student_attendance if s['status'] == 'late'])
-        absent_count = len([s for s in student_attendance if s['status'] == 'absent'])
-        
-        return jsonify({
-            'session': session.to_dict(),
-            'student_attendance': student_attendance,
-            'summary': {
-                'total_students': total_students,
-                'present_count': present_count,
-                'late_count': late_count,
-                'absent_count': absent_count,
-                'attendance_percentage': round((present_count + late_count) / total_students * 100, 2) if total_students > 0 else 0
-            }
-        }), 200
+        response = Response(stream_with_context(generate(payload)), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        if channel:
+            response.call_on_close(lambda: roster_broker.unsubscribe(channel))
+        return response
         
     except Exception as e:
-        return jsonify({'message': 'Failed to fetch session attendance', 'error': str(e)}), 500
+        return jsonify({'message': 'Failed to stream session attendance', 'error': str(e)}), 500
 
 @attendance_bp.route('/course/<int:course_id>/attendance-summary', methods=['GET'])
+@read_only
 @token_required
 @role_required(['instructor', 'admin'])
 def get_course_attendance_summary(current_user, course_id):
@@ -263,26 +718,21 @@ def get_course_attendance_summary(current_user, course_id):
         if current_user.role == 'instructor' and course.instructor_id != current_user.id:
             return jsonify({'message': 'Access denied'}), 403
         
-        # Get all sessions for this course
-        sessions = ClassSession.query.filter_by(course_id=course_id).all()
-        
-        # Get all attendance records for this course
-        attendance_records = db.session.query(AttendanceRecord).join(ClassSession).filter(
-            ClassSession.course_id == course_id
-        ).all()
+        # Read the precomputed per-status counters
+        counts = dict(course_status_counts(course_id))
         
         # Calculate summary statistics
-        total_sessions = len(sessions)
-        total_records = len(attendance_records)
-        present_count = len([r for r in attendance_records if r.status == 'present'])
-        late_count = len([r for r in attendance_records if r.status == 'late'])
-        absent_count = len([r for r in attendance_records if r.status == 'absent'])
+        total_sessions = ClassSession.query.filter_by(course_id=course_id).count()
+        total_records = sum(counts.values())
+        present_count = counts.get('present', 0)
+        late_count = counts.get('late', 0)
+        absent_count = counts.get('absent', 0)
         
         # Get enrolled student count
         enrolled_count = CourseEnrollment.query.filter_by(course_id=course_id).count()
         
         return jsonify({
-            'course': course.to_dict(),
+            'course': course.to_dict(enrolled_count),
             'total_sessions': total_sessions,
             'enrolled_students': enrolled_count,
             'total_attendance_records': total_records,
@@ -295,3 +745,117 @@ def get_course_attendance_summary(current_user, course_id):
     except Exception as e:
         return jsonify({'message': 'Failed to fetch course attendance summary', 'error': str(e)}), 500
 
+
+EXPORT_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+EXPORT_FETCH_SIZE = 2000
+
+def iter_attendance_matrix(course_id, sessions, session_ids):
+    """Yield (student row, [status per session]) for every enrolled student.
+
+    ``sessions`` are the matrix columns and ``session_ids`` is a SELECT of the
+    same session ids, used to filter records inside the database.
+
+    Enrolled students and attendance records are both read in student id order
+    from streaming cursors and merged, so only one student's row is held in
+    memory at a time.
+    """
+    column = {session.id: i for i, session in enumerate(sessions)}
+    today = session_now().date()
+    # Sessions that have not happened yet are left blank rather than marked absent
+    default_row = ['' if session.session_date > today else 'absent' for session in sessions]
+    
+    students = db.session.execute(
+        db.select(User.id, User.first_name, User.last_name, User.email)
+        .join(CourseEnrollment, CourseEnrollment.student_id == User.id)
+        .where(CourseEnrollment.course_id == course_id)
+        .order_by(User.id)
+        .execution_options(yield_per=EXPORT_FETCH_SIZE)
+    )
+    records = chain.from_iterable(db.session.execute(
+        db.select(AttendanceRecord.student_id, AttendanceRecord.session_id, AttendanceRecord.status)
+        .where(AttendanceRecord.session_id.in_(session_ids))
+        .order_by(AttendanceRecord.student_id)
+        .execution_options(yield_per=EXPORT_FETCH_SIZE)
+    ).tuples().partitions()) if column else iter(())
+    
+    # Records come back as plain (student_id, session_id, status) tuples in chunks
+    no_more = (None, None, None)
+    record_student, record_session, record_status = next(records, no_more)
+    for student in chain.from_iterable(students.partitions()):
+        student_id = student[0]
+        row = list(default_row)
+        # Skip records of students who are no longer enrolled
+        while record_student is not None and record_student < student_id:
+            record_student, record_session, record_status = next(records, no_more)
+        while record_student == student_id:
+            row[column[record_session]] = record_status
+            record_student, record_session, record_status = next(records, no_more)
+        yield student, row
+
+@attendance_bp.route('/course/<int:course_id>/attendance-export', methods=['GET'])
+@read_only
+@token_required
+@role_required(['instructor', 'admin'])
+def export_course_attendance(current_user, course_id):
+    try:
+        export_format = request.args.get('format', default='csv')
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'message': 'Format must be csv or ndjson'}), 400
+        
+        try:
+            start_date = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date() if request.args.get('start_date') else None
+            end_date = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date() if request.args.get('end_date') else None
+        except ValueError:
+            return jsonify({'message': 'Dates must use the YYYY-MM-DD format'}), 400
+        
+        course = Course.query.get(course_id)
+        if not course:
+            return jsonify({'message': 'Course not found'}), 404
+        
+        # Check if instructor owns this course (unless admin)
+        if current_user.role == 'instructor' and course.instructor_id != current_user.id:
+            return jsonify({'message': 'Access denied'}), 403
+        
+        # Sessions become the matrix columns, optionally limited to a term's date range
+        query = ClassSession.query.filter_by(course_id=course_id, is_active=True)
+        if start_date:
+            query = query.filter(ClassSession.session_date >= start_date)
+        if end_date:
+            query = query.filter(ClassSession.session_date <= end_date)
+        sessions = query.order_by(ClassSession.session_date, ClassSession.start_time, ClassSession.id).all()
+        session_ids = query.with_entities(ClassSession.id).scalar_subquery()
+        
+        def generate_csv():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(['student_id', 'student_name', 'student_email'] + [
+                f"{session.session_date.isoformat()} {session.start_time.strftime('%H:%M')} (#{session.id})"
+                for session in sessions
+            ])
+            for student, row in iter_attendance_matrix(course_id, sessions, session_ids):
+                writer.writerow([student.id, f"{student.first_name} {student.last_name}", student.email] + row)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            yield buffer.getvalue()
+        
+        def generate_ndjson():
+            keys = [str(session.id) for session in sessions]
+            for student, row in iter_attendance_matrix(course_id, sessions, session_ids):
+                yield json.dumps({
+                    'student_id': student.id,
+                    'student_name': f"{student.first_name} {student.last_name}",
+                    'student_email': student.email,
+                    'attendance': dict(zip(keys, row))
+                }) + '\n'
+        
+        generate = generate_csv if export_format == 'csv' else generate_ndjson
+        filename = f"{course.course_code}-attendance.{export_format}"
+        return Response(
+            stream_with_context(generate()),
+            mimetype=EXPORT_FORMATS[export_format],
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to export course attendance', 'error': str(e)}), 500
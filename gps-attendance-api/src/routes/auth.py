@@ -1,8 +1,14 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, g, jsonify, request
 from datetime import datetime, timedelta
 import jwt
+import time
+import uuid
 from functools import wraps
 from src.models.user import User, db
+from src.services.password_hasher import password_hasher, HasherBusyError
+from src.services.response_cache import response_cache
+from src.services.token_revocation import token_revocations
+from src.services.user_cache import user_cache
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -11,7 +17,24 @@ JWT_SECRET = 'your-secret-key-here'
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_DELTA = timedelta(hours=24)
 
+def create_token(user):
+    """Issue a signed JWT for the user; jti identifies it for revocation"""
+    now = datetime.utcnow()
+    token_payload = {
+        'user_id': user.id,
+        'username': user.username,
+        'role': user.role,
+        'jti': uuid.uuid4().hex,
+        # Sub-second, so a password change revokes tokens issued earlier in the same second
+        'iat': time.time(),
+        'exp': now + JWT_EXPIRATION_DELTA
+    }
+    return jwt.encode(token_payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
 def token_required(f):
+    # Roles declared by an inner @role_required, checked against the token claims
+    allowed_roles = getattr(f, 'allowed_roles', None)
+    
     @wraps(f)
     def decorated(*args, **kwargs):
         token = request.headers.get('Authorization')
@@ -24,9 +47,17 @@ def token_required(f):
                 token = token[7:]
             
             data = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-            current_user = User.query.get(data['user_id'])
             
-            if not current_user or not current_user.is_active:
+            # Reject wrong-role requests from the signed claims, before any database access
+            if allowed_roles is not None and data.get('role') not in allowed_roles:
+                return jsonify({'message': 'Insufficient permissions'}), 403
+            
+            if token_revocations.is_revoked(data):
+                return jsonify({'message': 'Token has been revoked'}), 401
+            
+            current_user = user_cache.get(data['user_id'], token)
+            
+            if not current_user:
                 return jsonify({'message': 'Invalid token'}), 401
                 
         except jwt.ExpiredSignatureError:
@@ -34,6 +65,7 @@ def token_required(f):
         except jwt.InvalidTokenError:
             return jsonify({'message': 'Invalid token'}), 401
         
+        g.token_claims = data
         return f(current_user, *args, **kwargs)
     
     return decorated
@@ -42,9 +74,11 @@ def role_required(allowed_roles):
     def decorator(f):
         @wraps(f)
         def decorated(current_user, *args, **kwargs):
+            # The stored role still decides, in case it changed after the token was issued
             if current_user.role not in allowed_roles:
                 return jsonify({'message': 'Insufficient permissions'}), 403
             return f(current_user, *args, **kwargs)
+        decorated.allowed_roles = allowed_roles
         return decorated
     return decorator
 
@@ -58,22 +92,24 @@ def login():
         
         user = User.query.filter_by(username=data['username']).first()
         
-        if not user or not user.check_password(data['password']) or not user.is_active:
+        # Hand the connection back to the pool while the password is being verified
+        password_hash, is_active = (user.password_hash, user.is_active) if user else (None, False)
+        db.session.commit()
+        valid, new_hash = password_hasher.verify(password_hash, data['password']) if user else (False, None)
+        
+        if not valid or not is_active:
             return jsonify({'message': 'Invalid username or password'}), 401
         
+        # Upgrade hashes created with older cost parameters
+        if new_hash:
+            user.password_hash = new_hash
+        
         # Update last login
         user.last_login = datetime.utcnow()
         db.session.commit()
         
         # Generate JWT token
-        token_payload = {
-            'user_id': user.id,
-            'username': user.username,
-            'role': user.role,
-            'exp': datetime.utcnow() + JWT_EXPIRATION_DELTA
-        }
-        
-        token = jwt.encode(token_payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+        token = create_token(user)
         
         return jsonify({
             'message': 'Login successful',
@@ -81,14 +117,23 @@ def login():
             'user': user.to_dict()
         }), 200
         
+    except HasherBusyError:
+        return jsonify({'message': 'Too many login attempts in progress, please retry'}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'message': 'Login failed', 'error': str(e)}), 500
 
 @auth_bp.route('/logout', methods=['POST'])
 @token_required
 def logout(current_user):
-    # In a real application, you might want to blacklist the token
-    return jsonify({'message': 'Logout successful'}), 200
+    try:
+        # Tokens issued before jti was added cannot be revoked individually
+        if g.token_claims.get('jti'):
+            token_revocations.revoke_token(g.token_claims)
+            db.session.commit()
+        return jsonify({'message': 'Logout successful'}), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Logout failed', 'error': str(e)}), 500
 
 @auth_bp.route('/profile', methods=['GET'])
 @token_required
@@ -100,23 +145,28 @@ def get_profile(current_user):
 def update_profile(current_user):
     try:
         data = request.get_json()
+        user = current_user.load()
         
         if 'first_name' in data:
-            current_user.first_name = data['first_name']
+            user.first_name = data['first_name']
         if 'last_name' in data:
-            current_user.last_name = data['last_name']
+            user.last_name = data['last_name']
         if 'email' in data:
             # Check if email is already taken by another user
             existing_user = User.query.filter_by(email=data['email']).first()
-            if existing_user and existing_user.id != current_user.id:
+            if existing_user and existing_user.id != user.id:
                 return jsonify({'message': 'Email already exists'}), 400
-            current_user.email = data['email']
+            user.email = data['email']
+        
+        # Course listings show the instructor's name
+        if user.role == 'instructor' and ('first_name' in data or 'last_name' in data):
+            response_cache.bump('courses')
         
         db.session.commit()
         
         return jsonify({
             'message': 'Profile updated successfully',
-            'user': current_user.to_dict()
+            'user': user.to_dict()
         }), 200
         
     except Exception as e:
@@ -131,17 +181,29 @@ def change_password(current_user):
         if not data or not data.get('current_password') or not data.get('new_password'):
             return jsonify({'message': 'Current password and new password are required'}), 400
         
-        if not current_user.check_password(data['current_password']):
-            return jsonify({'message': 'Current password is incorrect'}), 400
-        
         if len(data['new_password']) < 6:
             return jsonify({'message': 'New password must be at least 6 characters long'}), 400
         
-        current_user.set_password(data['new_password'])
+        # Hand the connection back to the pool while the password is being verified
+        user = current_user.load()
+        password_hash = user.password_hash
+        db.session.commit()
+        
+        valid, _ = password_hasher.verify(password_hash, data['current_password'])
+        if not valid:
+            return jsonify({'message': 'Current password is incorrect'}), 400
+        
+        user.password_hash = password_hasher.hash(data['new_password'])
+        
+        # Sign out every existing session, including this one, and hand back a fresh token
+        issued_before = time.time()
+        token_revocations.revoke_user_tokens(user.id, issued_before, datetime.utcnow() + JWT_EXPIRATION_DELTA)
         db.session.commit()
         
-        return jsonify({'message': 'Password changed successfully'}), 200
+        return jsonify({'message': 'Password changed successfully', 'token': create_token(user)}), 200
         
+    except HasherBusyError:
+        return jsonify({'message': 'Password service is busy, please retry'}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'message': 'Password change failed', 'error': str(e)}), 500
 
@@ -150,14 +212,7 @@ def change_password(current_user):
 def refresh_token(current_user):
     try:
         # Generate new JWT token
-        token_payload = {
-            'user_id': current_user.id,
-            'username': current_user.username,
-            'role': current_user.role,
-            'exp': datetime.utcnow() + JWT_EXPIRATION_DELTA
-        }
-        
-        token = jwt.encode(token_payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+        token = create_token(current_user)
         
         return jsonify({
             'message': 'Token refreshed successfully',
@@ -1,27 +1,60 @@
 from flask import Blueprint, jsonify, request
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, date, time
-from src.models.user import User, Course, ClassSession, CourseEnrollment, db
+from src.models.user import (
+    User, Course, ClassSession, CourseEnrollment, CourseSchedule, db, is_unique_violation, session_now
+)
 from src.routes.auth import token_required, role_required
+from src.services.aggregates import enrollment_counts_subquery
+from src.services.enrollment_cache import enrollment_cache
+from src.services.response_cache import cached_response, response_cache
+from src.services.schedules import (
+    cancel_future_sessions, insert_sessions, parse_schedule_fields, schedule_dates, sync_future_sessions,
+    validate_schedule
+)
+from src.services.serializers import COURSE_FIELDS, SESSION_FIELDS, columns, json_response, records
+from src.services.session_index import session_index
+from src.services.session_table import session_table
 
 courses_bp = Blueprint('courses', __name__)
 
+MAX_NEARBY_RADIUS = 5000  # meters
+
 @courses_bp.route('/courses', methods=['GET'])
 @token_required
+@cached_response(lambda: ['courses'])
 def get_courses(current_user):
     try:
+        # Select the listed columns, instructor name and enrollment count in one query
+        counts = enrollment_counts_subquery()
+        query = db.session.query(
+            *columns(Course, COURSE_FIELDS), User.id.label('instructor_user_id'), User.first_name, User.last_name,
+            func.coalesce(counts.c.student_count, 0)
+        ).outerjoin(User, User.id == Course.instructor_id).outerjoin(counts, counts.c.course_id == Course.id)
+        
         if current_user.role == 'admin':
             # Admin can see all courses
-            courses = Course.query.all()
+            pass
         elif current_user.role == 'instructor':
             # Instructor can see their own courses
-            courses = Course.query.filter_by(instructor_id=current_user.id).all()
+            query = query.filter(Course.instructor_id == current_user.id)
         else:
             # Student can see enrolled courses
-            enrollments = CourseEnrollment.query.filter_by(student_id=current_user.id).all()
-            course_ids = [e.course_id for e in enrollments]
-            courses = Course.query.filter(Course.id.in_(course_ids)).all() if course_ids else []
+            query = query.filter(Course.id.in_(
+                db.session.query(CourseEnrollment.course_id).filter(CourseEnrollment.student_id == current_user.id)
+            ))
+        
+        courses = []
+        for row in query.order_by(Course.id).all():
+            course = dict(zip(COURSE_FIELDS, row))
+            instructor_id, first_name, last_name, student_count = row[-4:]
+            # Same shape as Course.to_dict(student_count)
+            course['instructor_name'] = f"{first_name} {last_name}" if instructor_id is not None else None
+            course['student_count'] = student_count
+            courses.append(course)
         
-        return jsonify([course.to_dict() for course in courses]), 200
+        return json_response(courses)
         
     except Exception as e:
         return jsonify({'message': 'Failed to fetch courses', 'error': str(e)}), 500
@@ -53,6 +86,7 @@ def create_course(current_user):
         )
         
         db.session.add(course)
+        response_cache.bump('courses')
         db.session.commit()
         
         return jsonify({
@@ -73,11 +107,7 @@ def get_course(current_user, course_id):
         
         # Check access permissions
         if current_user.role == 'student':
-            enrollment = CourseEnrollment.query.filter_by(
-                course_id=course_id,
-                student_id=current_user.id
-            ).first()
-            if not enrollment:
+            if not enrollment_cache.is_enrolled(course_id, current_user.id):
                 return jsonify({'message': 'Access denied'}), 403
         elif current_user.role == 'instructor' and course.instructor_id != current_user.id:
             return jsonify({'message': 'Access denied'}), 403
@@ -117,6 +147,7 @@ def update_course(current_user, course_id):
         if 'is_active' in data:
             course.is_active = data['is_active']
         
+        response_cache.bump('courses')
         db.session.commit()
         
         return jsonify({
@@ -138,6 +169,7 @@ def delete_course(current_user, course_id):
         
         # Soft delete by setting is_active to False
         course.is_active = False
+        response_cache.bump('courses')
         db.session.commit()
         
         return jsonify({'message': 'Course deleted successfully'}), 200
@@ -162,22 +194,22 @@ def enroll_student(current_user, course_id):
         if not student or student.role != 'student':
             return jsonify({'message': 'Invalid student ID'}), 400
         
-        # Check if already enrolled
-        existing_enrollment = CourseEnrollment.query.filter_by(
-            course_id=course_id,
-            student_id=data['student_id']
-        ).first()
-        
-        if existing_enrollment:
-            return jsonify({'message': 'Student is already enrolled in this course'}), 400
-        
         enrollment = CourseEnrollment(
             course_id=course_id,
             student_id=data['student_id']
         )
         
+        # The unique (course_id, student_id) index rejects a second enrollment
         db.session.add(enrollment)
-        db.session.commit()
+        try:
+            response_cache.bump('courses')
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            if not is_unique_violation(e, 'uq_course_enrollment_course_student'):
+                raise
+            return jsonify({'message': 'Student is already enrolled in this course'}), 400
+        enrollment_cache.add(course_id, enrollment.student_id)
         
         return jsonify({
             'message': 'Student enrolled successfully',
@@ -189,6 +221,7 @@ def enroll_student(current_user, course_id):
 
 @courses_bp.route('/courses/<int:course_id>/sessions', methods=['GET'])
 @token_required
+@cached_response(lambda course_id: ['courses', f'sessions:{course_id}'])
 def get_course_sessions(current_user, course_id):
     try:
         course = Course.query.get(course_id)
@@ -197,21 +230,19 @@ def get_course_sessions(current_user, course_id):
         
         # Check access permissions
         if current_user.role == 'student':
-            enrollment = CourseEnrollment.query.filter_by(
-                course_id=course_id,
-                student_id=current_user.id
-            ).first()
-            if not enrollment:
+            if not enrollment_cache.is_enrolled(course_id, current_user.id):
                 return jsonify({'message': 'Access denied'}), 403
         elif current_user.role == 'instructor' and course.instructor_id != current_user.id:
             return jsonify({'message': 'Access denied'}), 403
         
-        sessions = ClassSession.query.filter_by(course_id=course_id).order_by(
+        sessions = db.session.query(*columns(ClassSession, SESSION_FIELDS)).filter(
+            ClassSession.course_id == course_id
+        ).order_by(
             ClassSession.session_date.desc(),
             ClassSession.start_time.desc()
         ).all()
         
-        return jsonify([session.to_dict() for session in sessions]), 200
+        return json_response(records(SESSION_FIELDS, sessions))
         
     except Exception as e:
         return jsonify({'message': 'Failed to fetch course sessions', 'error': str(e)}), 500
@@ -260,7 +291,10 @@ def create_session(current_user, course_id):
         )
         
         db.session.add(session)
+        response_cache.bump(f'sessions:{course_id}')
         db.session.commit()
+        session_index.upsert(session)
+        session_table.notify()
         
         return jsonify({
             'message': 'Session created successfully',
@@ -272,6 +306,34 @@ def create_session(current_user, course_id):
     except Exception as e:
         return jsonify({'message': 'Failed to create session', 'error': str(e)}), 500
 
+@courses_bp.route('/sessions/nearby', methods=['GET'])
+@token_required
+def get_nearby_sessions(current_user):
+    try:
+        latitude = request.args.get('lat', type=float)
+        longitude = request.args.get('lon', type=float)
+        radius = request.args.get('radius', type=float)
+        
+        if latitude is None or longitude is None:
+            return jsonify({'message': 'Latitude and longitude are required'}), 400
+        
+        if not (-90 <= latitude <= 90) or not (-180 <= longitude <= 180):
+            return jsonify({'message': 'Invalid GPS coordinates'}), 400
+        
+        if radius is not None and not (0 < radius <= MAX_NEARBY_RADIUS):
+            return jsonify({'message': f'Radius must be between 0 and {MAX_NEARBY_RADIUS}m'}), 400
+        
+        nearby_sessions = []
+        for session, distance in session_index.nearby(latitude, longitude, radius):
+            session_dict = session.to_dict()
+            session_dict['distance'] = int(distance)
+            nearby_sessions.append(session_dict)
+        
+        return jsonify(nearby_sessions), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to fetch nearby sessions', 'error': str(e)}), 500
+
 @courses_bp.route('/sessions/<int:session_id>', methods=['PUT'])
 @token_required
 @role_required(['instructor', 'admin'])
@@ -317,7 +379,10 @@ def update_session(current_user, session_id):
         if 'is_active' in data:
             session.is_active = data['is_active']
         
+        response_cache.bump(f'sessions:{session.course_id}')
         db.session.commit()
+        session_index.upsert(session)
+        session_table.notify()
         
         return jsonify({
             'message': 'Session updated successfully',
@@ -344,10 +409,155 @@ def delete_session(current_user, session_id):
         
         # Soft delete by setting is_active to False
         session.is_active = False
+        response_cache.bump(f'sessions:{session.course_id}')
         db.session.commit()
+        session_index.discard(session_id)
+        session_table.notify()
         
         return jsonify({'message': 'Session deleted successfully'}), 200
         
     except Exception as e:
         return jsonify({'message': 'Failed to delete session', 'error': str(e)}), 500
 
+
+def _schedule_access(current_user, course):
+    # Only the owning instructor or an admin may manage a course's schedules
+    return current_user.role == 'admin' or course.instructor_id == current_user.id
+
+@courses_bp.route('/courses/<int:course_id>/schedules', methods=['GET'])
+@token_required
+@role_required(['instructor', 'admin'])
+def get_course_schedules(current_user, course_id):
+    try:
+        course = Course.query.get(course_id)
+        if not course:
+            return jsonify({'message': 'Course not found'}), 404
+        
+        if not _schedule_access(current_user, course):
+            return jsonify({'message': 'Access denied'}), 403
+        
+        schedules = CourseSchedule.query.filter_by(course_id=course_id, is_active=True).order_by(CourseSchedule.id).all()
+        
+        return jsonify([schedule.to_dict() for schedule in schedules]), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to fetch schedules', 'error': str(e)}), 500
+
+@courses_bp.route('/courses/<int:course_id>/schedules', methods=['POST'])
+@token_required
+@role_required(['instructor', 'admin'])
+def create_schedule(current_user, course_id):
+    try:
+        course = Course.query.get(course_id)
+        if not course or not course.is_active:
+            return jsonify({'message': 'Course not found or inactive'}), 404
+        
+        if not _schedule_access(current_user, course):
+            return jsonify({'message': 'Access denied'}), 403
+        
+        data = request.get_json()
+        required_fields = ['weekdays', 'start_time', 'end_time', 'term_start', 'term_end',
+                           'location_name', 'latitude', 'longitude']
+        
+        if not data or not all(k in data for k in required_fields):
+            return jsonify({'message': 'All schedule details are required'}), 400
+        
+        schedule = CourseSchedule(course_id=course_id, **parse_schedule_fields(data))
+        validate_schedule(schedule)
+        
+        db.session.add(schedule)
+        db.session.flush()
+        
+        # Every meeting of the term in one multi-row INSERT
+        created = insert_sessions(schedule, course.instructor_id, schedule_dates(schedule))
+        response_cache.bump(f'sessions:{course_id}')
+        db.session.commit()
+        session_index.reload()
+        session_table.notify()
+        
+        return jsonify({
+            'message': 'Schedule created successfully',
+            'schedule': schedule.to_dict(),
+            'sessions_created': created
+        }), 201
+        
+    except ValueError as e:
+        return jsonify({'message': 'Invalid schedule', 'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Failed to create schedule', 'error': str(e)}), 500
+
+@courses_bp.route('/schedules/<int:schedule_id>', methods=['PUT'])
+@token_required
+@role_required(['instructor', 'admin'])
+def update_schedule(current_user, schedule_id):
+    try:
+        schedule = CourseSchedule.query.get(schedule_id)
+        if not schedule or not schedule.is_active:
+            return jsonify({'message': 'Schedule not found'}), 404
+        
+        course = Course.query.get(schedule.course_id)
+        if not _schedule_access(current_user, course):
+            return jsonify({'message': 'Access denied'}), 403
+        
+        data = request.get_json()
+        if not data:
+            return jsonify({'message': 'No schedule changes provided'}), 400
+        
+        changed = set()
+        for name, value in parse_schedule_fields(data).items():
+            if getattr(schedule, name) != value:
+                setattr(schedule, name, value)
+                changed.add(name)
+        validate_schedule(schedule)
+        
+        # Sessions that already started or took place keep their original details
+        propagated = sync_future_sessions(schedule, course.instructor_id, session_now(), changed)
+        if changed:
+            response_cache.bump(f'sessions:{course.id}')
+        db.session.commit()
+        if changed:
+            session_index.reload()
+            session_table.notify()
+        
+        return jsonify({
+            'message': 'Schedule updated successfully',
+            'schedule': schedule.to_dict(),
+            'sessions_updated': propagated['updated'],
+            'sessions_created': propagated['created'],
+            'sessions_cancelled': propagated['cancelled']
+        }), 200
+        
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'message': 'Invalid schedule', 'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Failed to update schedule', 'error': str(e)}), 500
+
+@courses_bp.route('/schedules/<int:schedule_id>', methods=['DELETE'])
+@token_required
+@role_required(['instructor', 'admin'])
+def delete_schedule(current_user, schedule_id):
+    try:
+        schedule = CourseSchedule.query.get(schedule_id)
+        if not schedule or not schedule.is_active:
+            return jsonify({'message': 'Schedule not found'}), 404
+        
+        course = Course.query.get(schedule.course_id)
+        if not _schedule_access(current_user, course):
+            return jsonify({'message': 'Access denied'}), 403
+        
+        # Soft delete; past sessions and their attendance stay as they are
+        schedule.is_active = False
+        cancelled = cancel_future_sessions(schedule.id, session_now())
+        response_cache.bump(f'sessions:{course.id}')
+        db.session.commit()
+        session_index.reload()
+        session_table.notify()
+        
+        return jsonify({'message': 'Schedule deleted successfully', 'sessions_cancelled': cancelled}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Failed to delete schedule', 'error': str(e)}), 500
@@ -1,6 +1,11 @@
 from flask import Blueprint, jsonify, request
-from src.models.user import User, Course, Feedback, CourseEnrollment, db
+from src.models.user import User, Course, Feedback, db
 from src.routes.auth import token_required, role_required
+from src.services.aggregates import feedback_rating_counts
+from src.services.enrollment_cache import enrollment_cache
+from src.services.engine_profiles import read_only
+from src.services.pagination import keyset_filter, split_page, wants_total
+from src.services.serializers import FEEDBACK_FIELDS, columns, json_response
 
 feedback_bp = Blueprint('feedback', __name__)
 
@@ -14,12 +19,7 @@ def submit_feedback(current_user, course_id):
             return jsonify({'message': 'Course not found or inactive'}), 404
         
         # Check if student is enrolled in the course
-        enrollment = CourseEnrollment.query.filter_by(
-            course_id=course_id,
-            student_id=current_user.id
-        ).first()
-        
-        if not enrollment:
+        if not enrollment_cache.is_enrolled(course_id, current_user.id):
             return jsonify({'message': 'You are not enrolled in this course'}), 403
         
         data = request.get_json()
@@ -55,6 +55,7 @@ def submit_feedback(current_user, course_id):
         return jsonify({'message': 'Failed to submit feedback', 'error': str(e)}), 500
 
 @feedback_bp.route('/courses/<int:course_id>/feedback', methods=['GET'])
+@read_only
 @token_required
 @role_required(['instructor', 'admin'])
 def get_course_feedback(current_user, course_id):
@@ -70,46 +71,62 @@ def get_course_feedback(current_user, course_id):
         # Get query parameters
         limit = request.args.get('limit', default=50, type=int)
         offset = request.args.get('offset', default=0, type=int)
+        cursor = request.args.get('cursor')
+        
+        if limit < 1:
+            return jsonify({'message': 'Limit must be a positive integer'}), 400
         
-        # Get feedback with pagination
-        feedback_query = Feedback.query.filter_by(course_id=course_id)
-        total_count = feedback_query.count()
+        # Get feedback columns and the author's name with pagination
+        feedback_query = db.session.query(
+            *columns(Feedback, FEEDBACK_FIELDS), User.id.label('author_id'), User.first_name, User.last_name
+        ).outerjoin(User, User.id == Feedback.student_id).filter(Feedback.course_id == course_id)
         
-        feedback_list = feedback_query.order_by(Feedback.created_at.desc()).offset(offset).limit(limit).all()
+        # Apply ordering, then seek past the cursor (or skip the legacy offset)
+        feedback_query = feedback_query.order_by(Feedback.created_at.desc(), Feedback.id.desc())
+        if cursor:
+            feedback_query = feedback_query.filter(keyset_filter(Feedback.created_at, Feedback.id, cursor))
+        else:
+            feedback_query = feedback_query.offset(offset)
+        feedback_list, next_cursor = split_page(feedback_query.limit(limit + 1).all(), limit)
         
         # Format response with student names for non-anonymous feedback
         feedback_with_details = []
-        for feedback in feedback_list:
-            feedback_dict = feedback.to_dict()
-            if not feedback.is_anonymous and feedback.student:
-                feedback_dict['student_name'] = f"{feedback.student.first_name} {feedback.student.last_name}"
+        for row in feedback_list:
+            feedback_dict = dict(zip(FEEDBACK_FIELDS, row))
+            author_id, first_name, last_name = row[-3:]
+            if feedback_dict['is_anonymous']:
+                feedback_dict['student_id'] = None
+            if not feedback_dict['is_anonymous'] and author_id is not None:
+                feedback_dict['student_name'] = f"{first_name} {last_name}"
             else:
                 feedback_dict['student_name'] = 'Anonymous'
             feedback_with_details.append(feedback_dict)
         
-        # Calculate summary statistics
-        all_feedback = Feedback.query.filter_by(course_id=course_id).all()
-        total_feedback = len(all_feedback)
+        # Calculate summary statistics from one GROUP BY rating query
+        rating_counts = dict(feedback_rating_counts(course_id))
+        total_feedback = sum(rating_counts.values())
+        rating_distribution = {str(i): rating_counts.get(i, 0) for i in range(1, 6)}
         
         if total_feedback > 0:
-            average_rating = sum(f.rating for f in all_feedback) / total_feedback
-            rating_distribution = {i: len([f for f in all_feedback if f.rating == i]) for i in range(1, 6)}
+            average_rating = sum(rating * count for rating, count in rating_counts.items()) / total_feedback
         else:
             average_rating = 0
-            rating_distribution = {i: 0 for i in range(1, 6)}
         
-        return jsonify({
+        return json_response({
             'feedback': feedback_with_details,
-            'total_count': total_count,
+            'total_count': total_feedback,
             'limit': limit,
             'offset': offset,
+            'next_cursor': next_cursor,
             'summary': {
                 'total_feedback': total_feedback,
                 'average_rating': round(average_rating, 2),
                 'rating_distribution': rating_distribution
             }
-        }), 200
+        })
         
+    except ValueError as e:
+        return jsonify({'message': 'Invalid pagination cursor', 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'message': 'Failed to fetch course feedback', 'error': str(e)}), 500
 
@@ -131,6 +148,7 @@ def delete_feedback(current_user, feedback_id):
         return jsonify({'message': 'Failed to delete feedback', 'error': str(e)}), 500
 
 @feedback_bp.route('/my-feedback', methods=['GET'])
+@read_only
 @token_required
 @role_required(['student'])
 def get_my_feedback(current_user):
@@ -139,6 +157,10 @@ def get_my_feedback(current_user):
         course_id = request.args.get('course_id', type=int)
         limit = request.args.get('limit', default=50, type=int)
         offset = request.args.get('offset', default=0, type=int)
+        cursor = request.args.get('cursor')
+        
+        if limit < 1:
+            return jsonify({'message': 'Limit must be a positive integer'}), 400
         
         # Build query
         query = Feedback.query.filter_by(student_id=current_user.id)
@@ -146,27 +168,46 @@ def get_my_feedback(current_user):
         if course_id:
             query = query.filter_by(course_id=course_id)
         
-        # Get total count
-        total_count = query.count()
+        # Counting repeats the whole filter, so it is opt-in
+        total_count = query.count() if wants_total() else None
         
-        # Apply pagination and ordering
-        feedback_list = query.order_by(Feedback.created_at.desc()).offset(offset).limit(limit).all()
+        # Select the feedback columns with the course name and code in one query
+        query = db.session.query(
+            *columns(Feedback, FEEDBACK_FIELDS), Course.course_name, Course.course_code
+        ).join(Course, Course.id == Feedback.course_id).filter(Feedback.student_id == current_user.id)
+        if course_id:
+            query = query.filter(Feedback.course_id == course_id)
+        
+        # Apply ordering, then seek past the cursor (or skip the legacy offset)
+        query = query.order_by(Feedback.created_at.desc(), Feedback.id.desc())
+        if cursor:
+            query = query.filter(keyset_filter(Feedback.created_at, Feedback.id, cursor))
+        else:
+            query = query.offset(offset)
+        feedback_list, next_cursor = split_page(query.limit(limit + 1).all(), limit)
         
         # Format response with course information
         feedback_with_details = []
-        for feedback in feedback_list:
-            feedback_dict = feedback.to_dict()
-            feedback_dict['course_name'] = feedback.course.course_name
-            feedback_dict['course_code'] = feedback.course.course_code
+        for row in feedback_list:
+            feedback_dict = dict(zip(FEEDBACK_FIELDS, row))
+            feedback_dict['course_name'], feedback_dict['course_code'] = row[-2:]
+            if feedback_dict['is_anonymous']:
+                feedback_dict['student_id'] = None
             feedback_with_details.append(feedback_dict)
         
-        return jsonify({
+        response = {
             'feedback': feedback_with_details,
-            'total_count': total_count,
             'limit': limit,
-            'offset': offset
-        }), 200
+            'offset': offset,
+            'next_cursor': next_cursor
+        }
+        if total_count is not None:
+            response['total_count'] = total_count
+        
+        return json_response(response)
         
+    except ValueError as e:
+        return jsonify({'message': 'Invalid pagination cursor', 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'message': 'Failed to fetch your feedback', 'error': str(e)}), 500
 
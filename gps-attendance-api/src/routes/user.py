@@ -1,12 +1,14 @@
 from flask import Blueprint, jsonify, request
 from src.models.user import User, db
+from src.services.response_cache import response_cache
+from src.services.serializers import USER_FIELDS, columns, json_response, records
 
 user_bp = Blueprint('user', __name__)
 
 @user_bp.route('/users', methods=['GET'])
 def get_users():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    users = db.session.query(*columns(User, USER_FIELDS)).all()
+    return json_response(records(USER_FIELDS, users))
 
 @user_bp.route('/users', methods=['POST'])
 def create_user():
@@ -28,6 +30,8 @@ def update_user(user_id):
     data = request.json
     user.username = data.get('username', user.username)
     user.email = data.get('email', user.email)
+    # Course listings embed instructor details
+    response_cache.bump('courses')
     db.session.commit()
     return jsonify(user.to_dict())
 
@@ -35,5 +39,6 @@ def update_user(user_id):
 def delete_user(user_id):
     user = User.query.get_or_404(user_id)
     db.session.delete(user)
+    response_cache.bump('courses')
     db.session.commit()
     return '', 204
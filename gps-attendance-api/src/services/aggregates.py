@@ -0,0 +1,47 @@
+from sqlalchemy import func
+from src.models.user import (
+    AttendanceRecord, ClassSession, CourseAttendanceCounter, CourseEnrollment, Feedback,
+    StudentAttendanceCounter, db
+)
+
+def attendance_status_counts(student_id=None, course_id=None, session_id=None):
+    """Return (status, count) tuples from one GROUP BY over the matching attendance records"""
+    query = db.session.query(AttendanceRecord.status, func.count(AttendanceRecord.id))
+    if course_id:
+        query = query.join(ClassSession, ClassSession.id == AttendanceRecord.session_id).filter(
+            ClassSession.course_id == course_id
+        )
+    if student_id:
+        query = query.filter(AttendanceRecord.student_id == student_id)
+    if session_id:
+        query = query.filter(AttendanceRecord.session_id == session_id)
+    return [tuple(row) for row in query.group_by(AttendanceRecord.status).all()]
+
+def feedback_rating_counts(course_id):
+    """Return (rating, count) tuples from one GROUP BY over a course's feedback"""
+    rows = db.session.query(Feedback.rating, func.count(Feedback.id)).filter(
+        Feedback.course_id == course_id
+    ).group_by(Feedback.rating).all()
+    return [tuple(row) for row in rows]
+
+def student_status_counts(student_id, course_id=None):
+    """Return (status, count) tuples for a student from the attendance counters"""
+    query = db.session.query(StudentAttendanceCounter.status, func.sum(StudentAttendanceCounter.count)).filter(
+        StudentAttendanceCounter.student_id == student_id
+    )
+    if course_id:
+        query = query.filter(StudentAttendanceCounter.course_id == course_id)
+    return [(status, int(count)) for status, count in query.group_by(StudentAttendanceCounter.status).all()]
+
+def course_status_counts(course_id):
+    """Return (status, count) tuples for a course from the attendance counters"""
+    rows = db.session.query(CourseAttendanceCounter.status, CourseAttendanceCounter.count).filter(
+        CourseAttendanceCounter.course_id == course_id
+    ).all()
+    return [tuple(row) for row in rows]
+
+def enrollment_counts_subquery():
+    """Subquery of (course_id, student_count) to outer join onto course listings"""
+    return db.session.query(
+        CourseEnrollment.course_id, func.count(CourseEnrollment.id).label('student_count')
+    ).group_by(CourseEnrollment.course_id).subquery()
@@ -0,0 +1,86 @@
+from collections import Counter
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from src.models.user import AttendanceRecord, ClassSession, CourseAttendanceCounter, StudentAttendanceCounter, db
+
+def _upsert_increments(connection, model, key_columns, increments):
+    """Add each count in increments ({key tuple: n}) to the matching counter row"""
+    rows = [dict(zip(key_columns, key), count=n) for key, n in increments.items() if n]
+    if not rows:
+        return
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert_stmt = (sqlite.insert if dialect == 'sqlite' else postgresql.insert)(model.__table__)
+        connection.execute(insert_stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={'count': model.__table__.c.count + insert_stmt.excluded.count}
+        ), rows)
+        return
+    # Portable fallback: update existing rows, insert the missing ones
+    table = model.__table__
+    for row in rows:
+        condition = [table.c[column] == row[column] for column in key_columns]
+        updated = connection.execute(
+            table.update().where(*condition).values(count=table.c.count + row['count'])
+        ).rowcount
+        if not updated:
+            connection.execute(table.insert().values(**row))
+
+def record_attendance(rows, replaced=()):
+    """Bump the counters for new attendance records in the current transaction.
+
+    ``rows`` is an iterable of (student_id, course_id, status) tuples. Call this
+    before the commit that writes the records so counters never drift from them.
+    ``replaced`` takes the same tuples for records whose old status was
+    overwritten, such as absences upgraded by a late offline upload.
+    """
+    student_counts = Counter()
+    course_counts = Counter()
+    for student_id, course_id, status in rows:
+        student_counts[(student_id, course_id, status)] += 1
+        course_counts[(course_id, status)] += 1
+    for student_id, course_id, status in replaced:
+        student_counts[(student_id, course_id, status)] -= 1
+        course_counts[(course_id, status)] -= 1
+
+    connection = db.session.connection()
+    _upsert_increments(connection, StudentAttendanceCounter, ['student_id', 'course_id', 'status'], student_counts)
+    _upsert_increments(connection, CourseAttendanceCounter, ['course_id', 'status'], course_counts)
+
+def record_absences(connection, closed_at):
+    """Bump the counters for the absences written by the close-out run stamped ``closed_at``"""
+    rows = connection.execute(select(
+        AttendanceRecord.student_id, ClassSession.course_id, func.count()
+    ).join(ClassSession, ClassSession.id == AttendanceRecord.session_id).where(
+        ClassSession.closed_at == closed_at,
+        AttendanceRecord.status == 'absent',
+        AttendanceRecord.created_at == closed_at
+    ).group_by(AttendanceRecord.student_id, ClassSession.course_id)).all()
+
+    student_counts = {(student_id, course_id, 'absent'): n for student_id, course_id, n in rows}
+    course_counts = Counter()
+    for student_id, course_id, n in rows:
+        course_counts[(course_id, 'absent')] += n
+    _upsert_increments(connection, StudentAttendanceCounter, ['student_id', 'course_id', 'status'], student_counts)
+    _upsert_increments(connection, CourseAttendanceCounter, ['course_id', 'status'], course_counts)
+
+def rebuild_counters(connection):
+    """Recompute every counter from the attendance records"""
+    connection.execute(delete(StudentAttendanceCounter.__table__))
+    connection.execute(delete(CourseAttendanceCounter.__table__))
+
+    per_student = select(
+        AttendanceRecord.student_id, ClassSession.course_id, AttendanceRecord.status, func.count()
+    ).join(ClassSession, ClassSession.id == AttendanceRecord.session_id).group_by(
+        AttendanceRecord.student_id, ClassSession.course_id, AttendanceRecord.status
+    )
+    connection.execute(insert(StudentAttendanceCounter.__table__).from_select(
+        ['student_id', 'course_id', 'status', 'count'], per_student
+    ))
+
+    per_course = select(
+        StudentAttendanceCounter.course_id, StudentAttendanceCounter.status, func.sum(StudentAttendanceCounter.count)
+    ).group_by(StudentAttendanceCounter.course_id, StudentAttendanceCounter.status)
+    connection.execute(insert(CourseAttendanceCounter.__table__).from_select(
+        ['course_id', 'status', 'count'], per_course
+    ))
@@ -0,0 +1,196 @@
+import atexit
+import queue
+import threading
+import time
+from sqlalchemy.exc import IntegrityError
+from src.models.user import db, is_unique_violation
+from src.services.attendance_counters import record_attendance
+
+# Flush a group when it reaches this many rows or this many milliseconds after its first row
+DEFAULT_MAX_GROUP_SIZE = 200
+DEFAULT_FLUSH_INTERVAL_MS = 5
+DEFAULT_MAX_QUEUE_SIZE = 10000
+
+# Upper bounds of the flush-size histogram buckets
+FLUSH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+class QueueFullError(Exception):
+    """Raised when the check-in queue cannot accept more rows"""
+
+class DuplicateCheckInError(Exception):
+    """Raised when the (session, student) pair was already written"""
+
+class CheckInPendingError(Exception):
+    """Raised when a queued row was not written in time; it stays queued and may still be committed"""
+
+class PendingCheckIn:
+    """A queued attendance record and the event its request thread waits on"""
+
+    __slots__ = ('record', 'course_id', 'result', 'error', 'done')
+
+    def __init__(self, record, course_id):
+        self.record = record
+        self.course_id = course_id
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+class CheckInWriter:
+    """Background writer that commits queued check-ins in grouped transactions.
+
+    Request threads call ``submit`` and block until the transaction holding
+    their row has committed, so a successful response still means the row is
+    durable. Only one commit (and one fsync) is paid per group instead of per row.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.max_group_size = DEFAULT_MAX_GROUP_SIZE
+        self.flush_interval = DEFAULT_FLUSH_INTERVAL_MS / 1000
+        self._queue = None
+        self._thread = None
+        self._stopping = False
+        self._lock = threading.Lock()
+        self.flushes = 0
+        self.rows_written = 0
+        self.last_flush_size = 0
+        self.max_flush_size = 0
+        self.flush_size_counts = [0] * (len(FLUSH_SIZE_BUCKETS) + 1)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('CHECKIN_GROUP_COMMIT', False)
+        self.max_group_size = app.config.get('CHECKIN_MAX_GROUP_SIZE', DEFAULT_MAX_GROUP_SIZE)
+        self.flush_interval = app.config.get('CHECKIN_FLUSH_INTERVAL_MS', DEFAULT_FLUSH_INTERVAL_MS) / 1000
+        self._queue = queue.Queue(maxsize=app.config.get('CHECKIN_MAX_QUEUE_SIZE', DEFAULT_MAX_QUEUE_SIZE))
+        if self.enabled:
+            self._thread = threading.Thread(target=self._run, name='checkin-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def submit(self, record, course_id, timeout=10):
+        """Queue an AttendanceRecord and wait until it is committed; returns its dict"""
+        if self._stopping:
+            raise QueueFullError('Check-in writer is shutting down')
+        pending = PendingCheckIn(record, course_id)
+        try:
+            self._queue.put_nowait(pending)
+        except queue.Full:
+            raise QueueFullError('Check-in queue is full')
+        if not pending.done.wait(timeout):
+            raise CheckInPendingError('Timed out waiting for check-in to be written')
+        if pending.error:
+            raise pending.error
+        return pending.result
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            group = [first]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(group) < self.max_group_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    pending = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if pending is None:
+                    stop = True
+                    break
+                group.append(pending)
+            self._flush(group)
+            if stop:
+                break
+
+    def _flush(self, group):
+        with self.app.app_context():
+            try:
+                written = self._write(group)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                written = []
+                for pending in group:
+                    pending.error = pending.error or e
+
+        self._record_flush(len(written))
+        for pending in group:
+            pending.done.set()
+
+    def _write(self, group):
+        """Insert the group in one transaction, isolating duplicates with savepoints if needed"""
+        try:
+            with db.session.begin_nested():
+                db.session.add_all([pending.record for pending in group])
+            written = group
+        except IntegrityError:
+            written = []
+            for pending in group:
+                try:
+                    with db.session.begin_nested():
+                        db.session.add(pending.record)
+                    written.append(pending)
+                except IntegrityError as e:
+                    if is_unique_violation(e, 'uq_attendance_record_session_student'):
+                        pending.error = DuplicateCheckInError('Already checked in for this session')
+                    else:
+                        pending.error = e
+
+        record_attendance([
+            (pending.record.student_id, pending.course_id, pending.record.status) for pending in written
+        ])
+        
+        # Serialize before the commit expires the new rows
+        for pending in written:
+            pending.result = pending.record.to_dict()
+        return written
+
+    def _record_flush(self, size):
+        with self._lock:
+            self.flushes += 1
+            self.rows_written += size
+            self.last_flush_size = size
+            self.max_flush_size = max(self.max_flush_size, size)
+            bucket = next((i for i, bound in enumerate(FLUSH_SIZE_BUCKETS) if size <= bound), len(FLUSH_SIZE_BUCKETS))
+            self.flush_size_counts[bucket] += 1
+
+    def shutdown(self, timeout=30):
+        """Stop accepting check-ins and drain everything already queued"""
+        if not self._thread or self._stopping:
+            return
+        self._stopping = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+        # Write anything that slipped in behind the stop marker
+        leftover = []
+        while True:
+            try:
+                pending = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if pending is not None:
+                leftover.append(pending)
+        if leftover:
+            self._flush(leftover)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'queue_depth': self._queue.qsize() if self._queue else 0,
+                'flushes': self.flushes,
+                'rows_written': self.rows_written,
+                'last_flush_size': self.last_flush_size,
+                'max_flush_size': self.max_flush_size,
+                'flush_size_histogram': {
+                    **{f'le_{bound}': count for bound, count in zip(FLUSH_SIZE_BUCKETS, self.flush_size_counts)},
+                    'gt_' + str(FLUSH_SIZE_BUCKETS[-1]): self.flush_size_counts[-1]
+                }
+            }
+
+checkin_writer = CheckInWriter()
@@ -0,0 +1,121 @@
+import os
+from functools import wraps
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'app.db')
+DEFAULT_PROFILE = 'development'
+
+# Bind key of the engine that read-only requests are routed to
+READ_BIND = 'read'
+
+# Engine settings per deployment, selected with the DB_PROFILE environment variable
+PROFILES = {
+    # Single SQLite connection settings as shipped; fine for one dev server
+    'development': {
+        'engine_options': {},
+        'pragmas': {},
+        'read_only_bind': False
+    },
+    # SQLite shared by several gunicorn workers: WAL lets readers run alongside the
+    # writer, and the busy timeout makes writers queue instead of failing with "database is locked"
+    'sqlite-wal': {
+        'engine_options': {'pool_size': 10, 'max_overflow': 20, 'pool_timeout': 30},
+        'pragmas': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 5000},
+        'read_only_bind': True
+    },
+    # PostgreSQL / MySQL server; reads go to DATABASE_READ_URL when it is set
+    'server': {
+        'engine_options': {'pool_size': 10, 'max_overflow': 20, 'pool_timeout': 30,
+                           'pool_pre_ping': True, 'pool_recycle': 1800},
+        'pragmas': {},
+        'read_only_bind': False
+    }
+}
+
+class RoutingSession(Session):
+    """Session that sends every statement of a read-only request to the read bind.
+
+    Flushes always use the primary engine, so an accidental write inside a
+    read-only request still lands on the primary (or fails on a read-only replica).
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get('read_only_session'):
+            engine = self._db.engines.get(READ_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def read_only(f):
+    """Route the queries of a GET endpoint to the read bind, if one is configured"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        g.read_only_session = True
+        return f(*args, **kwargs)
+
+    return decorated
+
+def install_pragmas(engine, pragmas):
+    """Run the given SQLite PRAGMAs on every new connection of the engine"""
+    if not pragmas or engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+def resolve_profile(name=None, database_url=None, read_url=None):
+    """Build the engine settings for a profile, applying environment overrides"""
+    name = name or os.environ.get('DB_PROFILE', DEFAULT_PROFILE)
+    if name not in PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE '{name}', expected one of: {', '.join(PROFILES)}")
+    profile = PROFILES[name]
+
+    url = database_url or os.environ.get('DATABASE_URL') or f"sqlite:///{DEFAULT_SQLITE_PATH}"
+    engine_options = dict(profile['engine_options'])
+    if os.environ.get('DB_POOL_SIZE'):
+        engine_options['pool_size'] = int(os.environ['DB_POOL_SIZE'])
+    if os.environ.get('DB_MAX_OVERFLOW'):
+        engine_options['max_overflow'] = int(os.environ['DB_MAX_OVERFLOW'])
+
+    pragmas = dict(profile['pragmas'])
+    if os.environ.get('DB_BUSY_TIMEOUT_MS'):
+        pragmas['busy_timeout'] = int(os.environ['DB_BUSY_TIMEOUT_MS'])
+
+    # With SQLite the read bind is a second pool on the same file that cannot write
+    read_url = read_url or os.environ.get('DATABASE_READ_URL') or (url if profile['read_only_bind'] else None)
+    read_pragmas = {'query_only': 'ON'}
+    if 'busy_timeout' in pragmas:
+        read_pragmas['busy_timeout'] = pragmas['busy_timeout']
+
+    return {
+        'name': name,
+        'url': url,
+        'engine_options': engine_options,
+        'pragmas': pragmas,
+        'read_url': read_url,
+        'read_pragmas': read_pragmas
+    }
+
+def configure_database(app, db, name=None, database_url=None, read_url=None):
+    """Apply an engine profile to the app and initialise Flask-SQLAlchemy with it"""
+    profile = resolve_profile(name, database_url, read_url)
+    app.config['DB_PROFILE'] = profile['name']
+    app.config['SQLALCHEMY_DATABASE_URI'] = profile['url']
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = profile['engine_options']
+    if profile['read_url']:
+        app.config['SQLALCHEMY_BINDS'] = {
+            READ_BIND: {'url': profile['read_url'], **profile['engine_options']}
+        }
+    db.init_app(app)
+
+    with app.app_context():
+        install_pragmas(db.engines[None], profile['pragmas'])
+        if READ_BIND in db.engines:
+            install_pragmas(db.engines[READ_BIND], profile['read_pragmas'])
+    return profile
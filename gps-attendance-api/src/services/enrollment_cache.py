@@ -0,0 +1,98 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from src.models.user import CourseEnrollment, db
+
+MAX_CACHED_COURSES = 2048
+
+# Cached rosters are reloaded this often; enrollments from other worker processes are
+# found sooner, because a student missing from a cached roster is looked up in the database
+MEMBERSHIP_TTL_SECONDS = 60
+
+class EnrollmentCache:
+    """LRU cache of per-course enrollment sets stored as sorted arrays of student ids.
+
+    A hit answers from memory. A student missing from a roster loaded earlier
+    is confirmed with one indexed lookup before the answer is "no", so an
+    enrollment written through another worker counts right away.
+    """
+
+    def __init__(self, max_courses=MAX_CACHED_COURSES, ttl=MEMBERSHIP_TTL_SECONDS):
+        self.max_courses = max_courses
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._courses = OrderedDict()  # course_id -> (loaded_at, sorted array of student ids)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.confirmations = 0
+
+    def _load(self, course_id):
+        rows = db.session.query(CourseEnrollment.student_id).filter_by(
+            course_id=course_id
+        ).order_by(CourseEnrollment.student_id).all()
+        return array('q', (row[0] for row in rows))
+
+    def _members(self, course_id):
+        """Return (sorted student ids, whether they were read from the database just now)"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._courses.get(course_id)
+            if cached and now - cached[0] < self.ttl:
+                self._courses.move_to_end(course_id)
+                self.hits += 1
+                return cached[1], False
+            self.misses += 1
+
+        members = self._load(course_id)
+
+        with self._lock:
+            self._courses[course_id] = (now, members)
+            self._courses.move_to_end(course_id)
+            while len(self._courses) > self.max_courses:
+                self._courses.popitem(last=False)
+                self.evictions += 1
+        return members, True
+
+    def is_enrolled(self, course_id, student_id):
+        """Return True if the student is enrolled in the course"""
+        members, fresh = self._members(course_id)
+        position = bisect_left(members, student_id)
+        if position < len(members) and members[position] == student_id:
+            return True
+        if fresh:
+            return False
+        with self._lock:
+            self.confirmations += 1
+        enrolled = db.session.query(CourseEnrollment.id).filter_by(
+            course_id=course_id, student_id=student_id
+        ).first() is not None
+        if enrolled:
+            self.add(course_id, student_id)
+        return enrolled
+
+    def add(self, course_id, student_id):
+        """Record a new enrollment in an already cached course"""
+        with self._lock:
+            cached = self._courses.get(course_id)
+            if cached:
+                # Readers may hold the old array, so swap in a new one instead of mutating it
+                members = array('q', cached[1])
+                position = bisect_left(members, student_id)
+                if position == len(members) or members[position] != student_id:
+                    members.insert(position, student_id)
+                    self._courses[course_id] = (cached[0], members)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'cached_courses': len(self._courses),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'confirmations': self.confirmations
+            }
+
+enrollment_cache = EnrollmentCache()
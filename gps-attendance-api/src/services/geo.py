@@ -0,0 +1,32 @@
+import numpy as np
+
+EARTH_RADIUS_METERS = 6371000
+METERS_PER_DEGREE_LAT = 111320
+
+def haversine_distances(lat1, lon1, lat2, lon2):
+    """Calculate distances in meters between arrays of GPS coordinates using the Haversine formula.
+
+    Inputs may be scalars or array-likes and broadcast against each other, so a
+    whole roster can be measured against a single session location in one call.
+    """
+    lat1 = np.asarray(lat1, dtype=np.float64)
+    lon1 = np.asarray(lon1, dtype=np.float64)
+    lat2 = np.asarray(lat2, dtype=np.float64)
+    lon2 = np.asarray(lon2, dtype=np.float64)
+
+    lat1_rad = np.radians(lat1)
+    lat2_rad = np.radians(lat2)
+    sin_half_delta_lat = np.sin(np.radians(lat2 - lat1) / 2)
+    sin_half_delta_lon = np.sin(np.radians(lon2 - lon1) / 2)
+
+    a = (sin_half_delta_lat * sin_half_delta_lat +
+         np.cos(lat1_rad) * np.cos(lat2_rad) *
+         sin_half_delta_lon * sin_half_delta_lon)
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    return EARTH_RADIUS_METERS * c  # Distances in meters
+
+def calculate_distance(lat1, lon1, lat2, lon2):
+    """Calculate distance between two GPS coordinates using Haversine formula"""
+    # The same kernel as batches, so a point on a geofence boundary gets the same answer on every path
+    return float(haversine_distances(lat1, lon1, lat2, lon2))
@@ -0,0 +1,138 @@
+import threading
+import time
+from bisect import bisect_left
+from flask import g, request
+from sqlalchemy import event
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SQL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SQL_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+HISTOGRAMS = (
+    ('http_request_duration_seconds', 'Request latency in seconds', LATENCY_BUCKETS),
+    ('http_request_sql_statements', 'SQL statements executed per request', SQL_COUNT_BUCKETS),
+    ('http_request_sql_duration_seconds', 'Time spent in SQL per request in seconds', SQL_TIME_BUCKETS)
+)
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout"""
+
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self, buckets):
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, buckets, value):
+        self.counts[bisect_left(buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+def _format_labels(labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels)
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+class RequestMetrics:
+    """Per-endpoint request latency and SQL histograms, exported in Prometheus text format.
+
+    Flask request hooks time each request and SQLAlchemy cursor events add up
+    the statements it runs on the request's thread. Recording is a few
+    additions under a lock, cheap enough to leave on in production. Counts are
+    per process; with several gunicorn workers each worker reports its own.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._series = {}  # (endpoint, method, status) -> one Histogram per entry in HISTOGRAMS
+        self._gauges = {}  # metric prefix -> callable returning a stats dict
+
+    def init_app(self, app, db):
+        self.enabled = app.config.get('METRICS_ENABLED', True)
+        if not self.enabled:
+            return
+        app.before_request(self._start_request)
+        app.after_request(self._capture_status)
+        app.teardown_request(self._finish_request)
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def register_stats(self, prefix, stats):
+        """Export the numeric fields of ``stats()`` as gauges named ``<prefix>_<field>``"""
+        self._gauges[prefix] = stats
+
+    def _start_request(self):
+        local = self._local
+        local.active = True
+        local.statements = 0
+        local.sql_time = 0.0
+        g.metrics_started = time.perf_counter()
+
+    def _capture_status(self, response):
+        g.metrics_status = response.status_code
+        return response
+
+    def _finish_request(self, error=None):
+        # Runs after streamed responses are fully sent, so their SQL is included
+        local = self._local
+        if not getattr(local, 'active', False) or 'metrics_started' not in g:
+            return
+        local.active = False
+        elapsed = time.perf_counter() - g.metrics_started
+        status = g.get('metrics_status', 500)
+        key = (request.endpoint or 'unmatched', request.method, status)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [Histogram(buckets) for _, _, buckets in HISTOGRAMS]
+            series[0].observe(LATENCY_BUCKETS, elapsed)
+            series[1].observe(SQL_COUNT_BUCKETS, local.statements)
+            series[2].observe(SQL_TIME_BUCKETS, local.sql_time)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self._local.statement_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        local = self._local
+        # Statements from background threads (e.g. the check-in writer) belong to no request
+        if getattr(local, 'active', False):
+            local.statements += 1
+            local.sql_time += time.perf_counter() - local.statement_started
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format"""
+        with self._lock:
+            snapshot = {
+                key: [(list(h.counts), h.total, h.count) for h in series]
+                for key, series in self._series.items()
+            }
+
+        lines = []
+        for index, (name, help_text, buckets) in enumerate(HISTOGRAMS):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for (endpoint, method, status), series in sorted(snapshot.items()):
+                counts, total, count = series[index]
+                labels = (('endpoint', endpoint), ('method', method), ('status', status))
+                cumulative = 0
+                for bound, bucket_count in zip(buckets + ('+Inf',), counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{{{_format_labels(labels + (("le", bound),))}}} {cumulative}')
+                lines.append(f'{name}_sum{{{_format_labels(labels)}}} {_format_value(total)}')
+                lines.append(f'{name}_count{{{_format_labels(labels)}}} {count}')
+
+        for prefix, stats in self._gauges.items():
+            for field, value in stats().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f'# TYPE {prefix}_{field} gauge')
+                    lines.append(f'{prefix}_{field} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,35 @@
+import base64
+import json
+from datetime import datetime
+from flask import request
+from sqlalchemy import and_, or_
+
+def encode_cursor(created_at, record_id):
+    """Encode the (created_at, id) of the last row on a page as an opaque cursor"""
+    payload = json.dumps([created_at.isoformat() if created_at else None, record_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor into (created_at, id); raises ValueError if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, record_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(record_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+def keyset_filter(created_column, id_column, cursor):
+    """Filter for rows after the cursor in (created_at DESC, id DESC) order"""
+    created_at, record_id = decode_cursor(cursor)
+    return or_(created_column < created_at, and_(created_column == created_at, id_column < record_id))
+
+def split_page(rows, limit):
+    """Split limit + 1 fetched rows into the page and the cursor for the next one"""
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(page[-1].created_at, page[-1].id)
+
+def wants_total():
+    """Whether the caller opted in to the (full scan) total count"""
+    return request.args.get('include_total', 'false').lower() in ('1', 'true', 'yes')
@@ -0,0 +1,114 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 32
+DEFAULT_TIMEOUT_SECONDS = 30
+
+class HasherBusyError(Exception):
+    """Raised when too many hashing jobs are already queued"""
+
+# Fully expanded parameters of each configured method, filled in once per worker process
+_target_parameters = {}
+
+def _hash_parameters(password_hash):
+    # Werkzeug hashes look like "method:param:param$salt$hash"
+    return password_hash.split('$', 1)[0]
+
+def hash_password(password, method):
+    password_hash = generate_password_hash(password, method=method) if method else generate_password_hash(password)
+    _target_parameters.setdefault(method, _hash_parameters(password_hash))
+    return password_hash
+
+def verify_password(password_hash, password, method):
+    """Check a password and rehash it if it was stored with other parameters.
+
+    Returns (valid, new_hash); new_hash is None unless the password is valid
+    and its stored hash does not match the configured method.
+    """
+    if not check_password_hash(password_hash, password):
+        return False, None
+    if method not in _target_parameters:
+        new_hash = hash_password(password, method)
+        return True, None if _hash_parameters(new_hash) == _hash_parameters(password_hash) else new_hash
+    if _target_parameters[method] == _hash_parameters(password_hash):
+        return True, None
+    return True, hash_password(password, method)
+
+class PasswordHasher:
+    """Runs PBKDF2/scrypt hashing in a bounded process pool.
+
+    Hashing is CPU-bound and holds the GIL, so running it on request threads
+    stalls every other request in the worker during a login rush. Jobs go to a
+    small process pool instead; once ``max_pending`` jobs are in flight new
+    ones are rejected with ``HasherBusyError`` instead of queueing.
+    """
+
+    def __init__(self):
+        self.workers = DEFAULT_WORKERS
+        self.max_pending = DEFAULT_MAX_PENDING
+        self.timeout = DEFAULT_TIMEOUT_SECONDS
+        self.method = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def init_app(self, app):
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', DEFAULT_WORKERS)
+        self.max_pending = app.config.get('PASSWORD_HASH_MAX_PENDING', DEFAULT_MAX_PENDING)
+        self.method = app.config.get('PASSWORD_HASH_METHOD') or None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        if self.workers > 0:
+            # Fork the pool now, while the process has a single thread, rather than mid-request
+            self._get_executor().submit(_hash_parameters, '').result()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Forking avoids spawn re-importing the app module in every worker
+                method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context(method)
+                )
+            return self._executor
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HasherBusyError('Too many password operations in progress')
+        try:
+            return self._get_executor().submit(fn, *args).result(timeout=self.timeout)
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool on the next call
+            with self._lock:
+                self._executor = None
+            raise
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        """Return a new hash of the password using the configured method"""
+        return self._run(hash_password, password, self.method)
+
+    def verify(self, password_hash, password):
+        """Return (valid, new_hash), where new_hash replaces an outdated stored hash"""
+        return self._run(verify_password, password_hash, password, self.method)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def stats(self):
+        with self._lock:
+            return {'workers': self.workers, 'max_pending': self.max_pending, 'rejected': self.rejected}
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,206 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import make_response, request
+from sqlalchemy import event, func, insert, select, update
+from src.models.user import CacheVersion, db
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+# Other worker processes see a bumped version after at most this long
+VERSION_SYNC_SECONDS = 2
+
+# Every version is reloaded this often, catching bumps a pull can miss when
+# two transactions draw the same number from the sequence concurrently
+VERSION_RELOAD_SECONDS = 60
+
+def bump_versions(connection, names):
+    """Give each named version the next number of the shared sequence, in the caller's transaction"""
+    table = CacheVersion.__table__
+    for name in sorted(names):
+        version = connection.execute(select(func.coalesce(func.max(table.c.version), 0) + 1)).scalar()
+        updated = connection.execute(update(table).where(table.c.name == name).values(version=version)).rowcount
+        if not updated:
+            connection.execute(insert(table).values(name=name, version=version))
+
+class ResponseCache:
+    """Size-bounded LRU cache of serialized GET responses validated by version counters.
+
+    A cached response depends on a few named versions ("courses",
+    "sessions:<course_id>"), which write handlers bump in the same transaction
+    as their change. The ETag is derived from the request key and those
+    versions only, so a matching If-None-Match is answered with 304 before the
+    view runs, and a version bump makes every response built on it unreachable.
+    Versions live in the cache_version table; each process pulls new ones
+    every few seconds and immediately after its own bumps commit.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, sync_interval=VERSION_SYNC_SECONDS,
+                 reload_interval=VERSION_RELOAD_SECONDS):
+        self.enabled = False
+        self.max_bytes = max_bytes
+        self.sync_interval = sync_interval
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._entries = OrderedDict()  # request key -> (etag, body, mimetype)
+        self._bytes = 0
+        self._versions = {}
+        self._last_version = 0
+        self._synced_at = None
+        self._reloaded_at = None
+        self._expired = False
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get('RESPONSE_CACHE_ENABLED', True)
+        self.max_bytes = app.config.get('RESPONSE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+        event.listen(db.session, 'after_commit', self._after_commit)
+        event.listen(db.session, 'after_rollback', self._after_rollback)
+
+    def bump(self, *names):
+        """Invalidate responses depending on ``names`` once the current transaction commits"""
+        bump_versions(db.session.connection(), names)
+        db.session.info['response_cache_bumped'] = True
+
+    def _after_commit(self, session):
+        if session.info.pop('response_cache_bumped', False):
+            self.expire()
+
+    def _after_rollback(self, session):
+        session.info.pop('response_cache_bumped', None)
+
+    def expire(self):
+        """Pull versions on the next lookup instead of waiting for the sync interval"""
+        self._expired = True
+
+    def _sync(self):
+        now = time.monotonic()
+        if not self._expired and self._synced_at is not None and now - self._synced_at < self.sync_interval:
+            return
+        # One thread syncs while the others keep using the current versions
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            # Cleared before the query, so a commit landing during it triggers another pull
+            self._expired = False
+            table = CacheVersion.__table__
+            reload = self._reloaded_at is None or now - self._reloaded_at >= self.reload_interval
+            query = select(table.c.name, table.c.version)
+            if not reload:
+                query = query.where(table.c.version > self._last_version)
+            # Use the primary engine directly, outside the request's session and any read-only routing
+            try:
+                with db.engine.connect() as connection:
+                    rows = connection.execute(query).all()
+            except Exception:
+                self._expired = True
+                raise
+            with self._lock:
+                versions = {} if reload else self._versions
+                for name, version in rows:
+                    versions[name] = version
+                    self._last_version = max(self._last_version, version)
+                self._versions = versions
+            if reload:
+                self._reloaded_at = now
+            self._synced_at = now
+        finally:
+            self._sync_lock.release()
+
+    def etag(self, key, names):
+        """Return the strong ETag of the response for ``key`` under the current versions"""
+        self._sync()
+        with self._lock:
+            versions = tuple(self._versions.get(name, 0) for name in names)
+        return hashlib.blake2b(repr((key, versions)).encode(), digest_size=16).hexdigest()
+
+    def get(self, key, etag):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == etag:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            return None
+
+    def put(self, key, etag, body, mimetype):
+        size = len(body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous:
+                self._bytes -= len(previous[1])
+            self._entries[key] = (etag, body, mimetype)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'evictions': self.evictions
+            }
+
+response_cache = ResponseCache()
+
+def _with_validators(response, etag):
+    response.set_etag(etag)
+    # Clients may keep the body but must revalidate it on every use
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def cached_response(versions):
+    """Serve a GET view from the response cache, with strong ETags and 304 replies.
+
+    ``versions(**view_args)`` returns the names of the versions the response
+    depends on. Goes below ``@token_required``: responses are cached per
+    user (admins share one scope), so a 304 never skips an access check that
+    could have a different outcome under the same versions.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(current_user, *args, **kwargs):
+            if not response_cache.enabled:
+                return f(current_user, *args, **kwargs)
+
+            scope = 'admin' if current_user.role == 'admin' else f'{current_user.role}:{current_user.id}'
+            key = (request.endpoint, tuple(sorted(kwargs.items())), request.query_string, scope)
+            etag = response_cache.etag(key, versions(**kwargs))
+
+            if request.if_none_match.contains(etag):
+                response_cache.record_not_modified()
+                return _with_validators(make_response('', 304), etag)
+
+            cached = response_cache.get(key, etag)
+            if cached:
+                return _with_validators(make_response(cached[1], 200, {'Content-Type': cached[2]}), etag)
+
+            # Versions were read before the view runs, so a concurrent write can only make this entry unreachable
+            response = make_response(f(current_user, *args, **kwargs))
+            if response.status_code != 200:
+                return response
+            response_cache.put(key, etag, response.get_data(), response.content_type)
+            return _with_validators(response, etag)
+        return decorated
+    return decorator
@@ -0,0 +1,274 @@
+import atexit
+import threading
+import time
+from collections import deque
+from itertools import islice
+from sqlalchemy import select
+from src.models.user import AttendanceRecord, ClassSession, User, db
+from src.services.geo import haversine_distances
+
+# Check-ins written by other worker processes reach this worker's streams after at most this long
+DEFAULT_SYNC_SECONDS = 1
+
+# Idle streams get a comment this often, keeping proxies from closing them
+DEFAULT_HEARTBEAT_SECONDS = 15
+
+DEFAULT_MAX_SUBSCRIBERS = 500
+
+# Events kept per session; a subscriber that falls further behind is sent a new snapshot
+BACKLOG_SIZE = 1000
+
+# Every watched session is re-read this often, catching rows committed out of id order
+RELOAD_SECONDS = 30
+
+class StreamLimitError(Exception):
+    """Raised when the worker already serves its maximum number of roster streams"""
+
+def roster_entry(student_id, student_name, student_email, status, check_in_time, distance):
+    """One student's row of a session roster; students without a check-in are listed as absent"""
+    attended = status is not None and status != 'absent'
+    return {
+        'student_id': student_id,
+        'student_name': student_name,
+        'student_email': student_email,
+        'status': status or 'absent',
+        'check_in_time': check_in_time if attended else None,
+        'distance': distance if attended else None
+    }
+
+class RosterChannel:
+    """Recent roster changes of one session, shared by every stream watching it"""
+
+    def __init__(self, session, lock):
+        self.session_id = session.id
+        self.latitude = session.latitude
+        self.longitude = session.longitude
+        self.changed = threading.Condition(lock)
+        self.events = deque(maxlen=BACKLOG_SIZE)  # (sequence, roster entry)
+        self.sequence = 0
+        self.seen = set()  # attendance record ids already part of a snapshot or an event
+        self.students = {}  # student_id -> (name, email)
+        self.ready = False
+        self.closed = False
+        self.subscribers = 0
+
+class RosterBroker:
+    """In-process fan-out of session roster changes to live dashboard streams.
+
+    Each watched session has one channel holding a short backlog of roster
+    entries. Publishing appends an entry and wakes that channel's streams, so
+    the cost of a check-in does not grow with the number of dashboards; every
+    stream reads the backlog from its own position. Check-ins handled by this
+    worker are published as soon as they commit. A background thread, started
+    with the first stream, picks up everything else (other workers, batch
+    uploads, close-out absences) with one query per interval for all watched
+    sessions, and ends the streams of sessions that were closed.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.sync_interval = DEFAULT_SYNC_SECONDS
+        self.heartbeat_interval = DEFAULT_HEARTBEAT_SECONDS
+        self.max_subscribers = DEFAULT_MAX_SUBSCRIBERS
+        self.reload_interval = RELOAD_SECONDS
+        self._lock = threading.Lock()
+        self._channels = {}  # session_id -> RosterChannel
+        self._subscribers = 0
+        self._thread = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._last_id = 0
+        self._since_reload = 0
+        self.events_published = 0
+        self.syncs = 0
+        self.resyncs = 0
+        self.errors = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.sync_interval = app.config.get('ROSTER_STREAM_SYNC_SECONDS', DEFAULT_SYNC_SECONDS)
+        self.heartbeat_interval = app.config.get('ROSTER_STREAM_HEARTBEAT_SECONDS', DEFAULT_HEARTBEAT_SECONDS)
+        self.max_subscribers = app.config.get('ROSTER_STREAM_MAX_SUBSCRIBERS', DEFAULT_MAX_SUBSCRIBERS)
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='roster-stream-sync', daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def subscribe(self, session):
+        """Register a stream for the session and return (channel, position).
+
+        Call before reading the roster snapshot, so nothing committed after
+        the snapshot is missed, then hand the snapshot to ``prime``.
+        """
+        with self._lock:
+            if self._subscribers >= self.max_subscribers:
+                raise StreamLimitError('Too many roster streams')
+            channel = self._channels.get(session.id)
+            if channel is None:
+                channel = self._channels[session.id] = RosterChannel(session, self._lock)
+            channel.subscribers += 1
+            self._subscribers += 1
+            self._start()
+            return channel, channel.sequence
+
+    def prime(self, channel, record_ids, students):
+        """Record what a snapshot already shows: attendance record ids and student_id -> (name, email)"""
+        with self._lock:
+            channel.students.update(students)
+            if not channel.ready:
+                channel.seen.update(record_ids)
+                channel.ready = True
+
+    def unsubscribe(self, channel):
+        with self._lock:
+            channel.subscribers -= 1
+            self._subscribers -= 1
+            if channel.subscribers == 0 and self._channels.get(channel.session_id) is channel:
+                del self._channels[channel.session_id]
+
+    def is_watched(self, session_id):
+        return session_id in self._channels
+
+    def _append(self, channel, record_id, entry):
+        # Called with the lock held
+        if record_id in channel.seen:
+            return
+        channel.seen.add(record_id)
+        channel.sequence += 1
+        channel.events.append((channel.sequence, entry))
+        self.events_published += 1
+        channel.changed.notify_all()
+
+    def publish(self, session_id, record_id, student_id, status, check_in_time, distance):
+        """Push a committed attendance record to the session's streams"""
+        if session_id not in self._channels:
+            return
+        with self._lock:
+            channel = self._channels.get(session_id)
+            if channel is None or not channel.ready:
+                return
+            student = channel.students.get(student_id)
+            if student is None:
+                # Not on any snapshot yet; the next sync reads the name along with the row
+                return
+            self._append(channel, record_id, roster_entry(student_id, *student, status, check_in_time, distance))
+
+    def notify(self):
+        """Sync now instead of waiting for the interval, e.g. after a batch of check-ins commits"""
+        if self._channels:
+            self._wake.set()
+
+    def close(self, session_ids):
+        """End the streams of sessions that were closed"""
+        with self._lock:
+            for session_id in session_ids:
+                channel = self._channels.get(session_id)
+                if channel is not None:
+                    channel.closed = True
+                    channel.changed.notify_all()
+
+    def listen(self, channel, position, expires_at=None):
+        """Yield lists of roster entries published after ``position`` until the session closes.
+
+        An empty list means nothing happened for a heartbeat interval; None
+        means the stream fell behind the backlog and needs a new snapshot.
+        Stops once the session is closed or at ``expires_at`` (a unix time);
+        the caller unsubscribes when its response is closed.
+        """
+        while True:
+            with self._lock:
+                if channel.sequence == position and not channel.closed:
+                    channel.changed.wait(self.heartbeat_interval)
+                oldest = channel.events[0][0] if channel.events else channel.sequence + 1
+                if position + 1 < oldest:
+                    entries = None
+                    self.resyncs += 1
+                else:
+                    entries = [entry for _, entry in islice(channel.events, position + 1 - oldest, None)]
+                position = channel.sequence
+                closed = channel.closed
+            if entries is None or entries or not closed:
+                yield entries
+            if closed or (expires_at is not None and time.time() >= expires_at):
+                return
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.sync_interval)
+            self._wake.clear()
+            if not self._channels:
+                continue
+            try:
+                self.sync()
+            except Exception:
+                # A busy database; try again on the next tick
+                with self._lock:
+                    self.errors += 1
+
+    def sync(self):
+        """Publish attendance rows written outside this worker and close finished sessions"""
+        with self._lock:
+            channels = {session_id: channel for session_id, channel in self._channels.items() if channel.ready}
+        if not channels:
+            return
+        self._since_reload += self.sync_interval
+        reload = self._since_reload >= self.reload_interval
+
+        query = select(
+            AttendanceRecord.id, AttendanceRecord.session_id, AttendanceRecord.student_id, AttendanceRecord.status,
+            AttendanceRecord.check_in_time, AttendanceRecord.latitude, AttendanceRecord.longitude,
+            User.first_name, User.last_name, User.email
+        ).join(User, User.id == AttendanceRecord.student_id).where(AttendanceRecord.session_id.in_(channels))
+        if not reload:
+            query = query.where(AttendanceRecord.id > self._last_id)
+
+        # Use the primary engine directly, outside any request's session and read-only routing
+        with self.app.app_context():
+            with db.engine.connect() as connection:
+                rows = connection.execute(query.order_by(AttendanceRecord.id)).all()
+                closed = connection.execute(select(ClassSession.id).where(
+                    ClassSession.id.in_(channels), ClassSession.closed_at.isnot(None)
+                )).scalars().all()
+        if reload:
+            self._since_reload = 0
+
+        by_session = {}
+        for row in rows:
+            by_session.setdefault(row.session_id, []).append(row)
+            self._last_id = max(self._last_id, row.id)
+
+        with self._lock:
+            self.syncs += 1
+            for session_id, session_rows in by_session.items():
+                channel = channels[session_id]
+                distances = haversine_distances(
+                    [row.latitude for row in session_rows], [row.longitude for row in session_rows],
+                    channel.latitude, channel.longitude
+                )
+                for row, distance in zip(session_rows, distances):
+                    name = f"{row.first_name} {row.last_name}"
+                    channel.students[row.student_id] = (name, row.email)
+                    self._append(channel, row.id, roster_entry(
+                        row.student_id, name, row.email, row.status, row.check_in_time.isoformat(), int(distance)
+                    ))
+        self.close(closed)
+
+    def shutdown(self):
+        self._stop.set()
+        self._wake.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'streams': self._subscribers,
+                'sessions': len(self._channels),
+                'max_streams': self.max_subscribers,
+                'events_published': self.events_published,
+                'syncs': self.syncs,
+                'resyncs': self.resyncs,
+                'errors': self.errors
+            }
+
+roster_broker = RosterBroker()
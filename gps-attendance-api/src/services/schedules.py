@@ -0,0 +1,175 @@
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import and_, bindparam, insert, not_, or_, select, update
+from src.models.user import ClassSession, WEEKDAY_NAMES, check_in_window, db
+
+# Longest term a schedule may span; keeps one request from generating years of sessions
+MAX_SCHEDULE_DAYS = 366
+
+# Columns copied from a schedule onto each session it generates
+SESSION_FIELDS = ('start_time', 'end_time', 'location_name', 'latitude', 'longitude', 'attendance_radius')
+
+WINDOW_FIELDS = ('opens_at', 'late_at', 'closes_at')
+
+def parse_weekdays(names):
+    """Turn a list of weekday names ("mon".."sun") into the stored bitmask"""
+    if not isinstance(names, list) or not names:
+        raise ValueError('weekdays must be a non-empty list')
+    mask = 0
+    for name in names:
+        key = str(name).lower()[:3]
+        if key not in WEEKDAY_NAMES:
+            raise ValueError(f'Unknown weekday: {name}')
+        mask |= 1 << WEEKDAY_NAMES.index(key)
+    return mask
+
+def parse_schedule_fields(data):
+    """Validate the schedule fields present in a request body and return them as column values"""
+    values = {}
+    if 'weekdays' in data:
+        values['weekdays'] = parse_weekdays(data['weekdays'])
+    if 'start_time' in data:
+        values['start_time'] = datetime.strptime(data['start_time'], '%H:%M').time()
+    if 'end_time' in data:
+        values['end_time'] = datetime.strptime(data['end_time'], '%H:%M').time()
+    if 'term_start' in data:
+        values['term_start'] = datetime.strptime(data['term_start'], '%Y-%m-%d').date()
+    if 'term_end' in data:
+        values['term_end'] = datetime.strptime(data['term_end'], '%Y-%m-%d').date()
+    if 'location_name' in data:
+        values['location_name'] = data['location_name']
+    if 'latitude' in data:
+        values['latitude'] = float(data['latitude'])
+        if not (-90 <= values['latitude'] <= 90):
+            raise ValueError('Invalid latitude')
+    if 'longitude' in data:
+        values['longitude'] = float(data['longitude'])
+        if not (-180 <= values['longitude'] <= 180):
+            raise ValueError('Invalid longitude')
+    if 'attendance_radius' in data:
+        values['attendance_radius'] = int(data['attendance_radius'])
+    if 'excluded_dates' in data:
+        excluded = sorted({datetime.strptime(day, '%Y-%m-%d').date() for day in data['excluded_dates']})
+        values['excluded_dates'] = json.dumps([day.isoformat() for day in excluded])
+    return values
+
+def validate_schedule(schedule):
+    """Raise ValueError if the schedule's window or term is inconsistent"""
+    if schedule.start_time >= schedule.end_time:
+        raise ValueError('start_time must be before end_time')
+    if schedule.term_start > schedule.term_end:
+        raise ValueError('term_start must not be after term_end')
+    if (schedule.term_end - schedule.term_start).days >= MAX_SCHEDULE_DAYS:
+        raise ValueError(f'A schedule may span at most {MAX_SCHEDULE_DAYS} days')
+
+def schedule_dates(schedule):
+    """Return every date in the term that falls on a scheduled weekday and is not excluded"""
+    excluded = set(json.loads(schedule.excluded_dates or '[]'))
+    dates = []
+    day = schedule.term_start
+    while day <= schedule.term_end:
+        if schedule.weekdays & (1 << day.weekday()) and day.isoformat() not in excluded:
+            dates.append(day)
+        day += timedelta(days=1)
+    return dates
+
+def future_sessions(schedule_id, now):
+    """WHERE clause for the schedule's sessions that have not started yet"""
+    return and_(
+        ClassSession.schedule_id == schedule_id,
+        or_(
+            ClassSession.session_date > now.date(),
+            and_(ClassSession.session_date == now.date(), ClassSession.start_time > now.time())
+        )
+    )
+
+def insert_sessions(schedule, instructor_id, dates):
+    """Create one session per date with a single multi-row INSERT and return how many were added"""
+    if not dates:
+        return 0
+    created_at = datetime.utcnow()
+    fields = {name: getattr(schedule, name) for name in SESSION_FIELDS}
+    rows = [
+        dict(fields, course_id=schedule.course_id, schedule_id=schedule.id, instructor_id=instructor_id,
+             session_date=day, created_at=created_at, is_active=True,
+             **dict(zip(WINDOW_FIELDS, check_in_window(day, schedule.start_time, schedule.end_time))))
+        for day in dates
+    ]
+    db.session.execute(insert(ClassSession.__table__), rows)
+    return len(rows)
+
+def refresh_check_in_windows(condition):
+    """Recompute the check-in instants of the sessions matching ``condition`` after their times changed"""
+    table = ClassSession.__table__
+    rows = db.session.execute(
+        select(table.c.id, table.c.session_date, table.c.start_time, table.c.end_time).where(condition)
+    ).all()
+    if rows:
+        db.session.execute(update(table).where(table.c.id == bindparam('session_id')).values(
+            {name: bindparam(name) for name in WINDOW_FIELDS}
+        ), [dict(zip(WINDOW_FIELDS, check_in_window(*times)), session_id=session_id) for session_id, *times in rows])
+
+def sync_future_sessions(schedule, instructor_id, now, changed):
+    """Propagate a schedule edit to its sessions that have not started yet.
+
+    ``changed`` names the schedule columns that were modified. Field changes
+    become one UPDATE over the future sessions; changes to the date set
+    deactivate sessions on dates that dropped out, reactivate ones that came
+    back and insert the dates that are new. Sessions already started or past
+    are never touched, and their dates never get a second session. Returns
+    counts of updated, created and cancelled rows.
+    """
+    result = {'updated': 0, 'created': 0, 'cancelled': 0}
+    future = future_sessions(schedule.id, now)
+
+    # Read before the updates: a session moved to an earlier time today drops out of ``future``
+    retimed = []
+    if changed & {'start_time', 'end_time'}:
+        retimed = db.session.execute(select(ClassSession.id).where(future)).scalars().all()
+
+    session_values = {name: getattr(schedule, name) for name in SESSION_FIELDS if name in changed}
+    if session_values:
+        result['updated'] = db.session.execute(
+            update(ClassSession).where(future, ClassSession.is_active == True).values(**session_values),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+
+    if changed & {'weekdays', 'term_start', 'term_end', 'excluded_dates', 'start_time'}:
+        wanted = {day for day in schedule_dates(schedule) if (day, schedule.start_time) > (now.date(), now.time())}
+        # A session that already started today keeps its date even when the new start is still ahead
+        wanted -= set(db.session.execute(select(ClassSession.session_date).where(
+            ClassSession.schedule_id == schedule.id, ClassSession.session_date.in_(wanted), not_(future)
+        )).scalars())
+        existing = dict(db.session.query(ClassSession.session_date, ClassSession.is_active).filter(future).all())
+
+        cancelled = [day for day, active in existing.items() if active and day not in wanted]
+        restored = [day for day, active in existing.items() if not active and day in wanted]
+        if cancelled:
+            result['cancelled'] = db.session.execute(
+                update(ClassSession).where(future, ClassSession.session_date.in_(cancelled)).values(is_active=False),
+                execution_options={'synchronize_session': False}
+            ).rowcount
+        if restored:
+            # Reactivated sessions also pick up the schedule's current fields
+            fields = {name: getattr(schedule, name) for name in SESSION_FIELDS}
+            result['updated'] += db.session.execute(
+                update(ClassSession).where(future, ClassSession.session_date.in_(restored))
+                .values(is_active=True, **fields),
+                execution_options={'synchronize_session': False}
+            ).rowcount
+            # Edits made while they were inactive skipped them, so their windows may be stale
+            refresh_check_in_windows(and_(future, ClassSession.session_date.in_(restored)))
+        result['created'] = insert_sessions(schedule, instructor_id, sorted(wanted - existing.keys()))
+
+    if retimed:
+        refresh_check_in_windows(ClassSession.id.in_(retimed))
+
+    return result
+
+def cancel_future_sessions(schedule_id, now):
+    """Deactivate the schedule's sessions that have not started yet and return how many"""
+    return db.session.execute(
+        update(ClassSession).where(future_sessions(schedule_id, now), ClassSession.is_active == True)
+        .values(is_active=False),
+        execution_options={'synchronize_session': False}
+    ).rowcount
@@ -0,0 +1,181 @@
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from werkzeug.security import generate_password_hash
+from src.models.user import AttendanceRecord, ClassSession, Course, CourseEnrollment, Feedback, User, check_in_window, db, session_now
+from src.services.attendance_counters import rebuild_counters
+from src.services.response_cache import response_cache
+
+# Rows per bulk INSERT; large batches keep executemany overhead low
+SEED_BATCH_SIZE = 20000
+
+# Every seeded course and session lies within this box around the campus
+CAMPUS_LATITUDE = 40.7128
+CAMPUS_LONGITUDE = -74.0060
+CAMPUS_SPREAD_DEGREES = 0.01
+
+FEEDBACK_COMMENTS = (
+    'Great lectures, very clear explanations.',
+    'The pace was a bit fast for me.',
+    'More worked examples would help.',
+    'Assignments were challenging but fair.',
+    None
+)
+
+def _bulk_insert(model, rows, batch_size):
+    """Insert mapping dicts in batches and return how many were written"""
+    written = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            db.session.bulk_insert_mappings(model, batch, render_nulls=True)
+            written += len(batch)
+            batch = []
+    if batch:
+        db.session.bulk_insert_mappings(model, batch, render_nulls=True)
+        written += len(batch)
+    return written
+
+def _next_id(model):
+    return db.session.query(func.coalesce(func.max(model.id), 0)).scalar() + 1
+
+def seed_database(students=1000, courses=50, sessions=1000, today_sessions=0, enrollments_per_student=3,
+                  attendance_rate=0.9, late_rate=0.1, feedback_rate=0.2, seed=42, password='password',
+                  batch_size=SEED_BATCH_SIZE):
+    """Bulk-generate a deterministic university on top of whatever is already stored.
+
+    Sessions are spread round-robin over the courses on past days, except the
+    last ``today_sessions`` which start five minutes ago so they can be checked
+    into. Every user gets the same password, hashed once. Returns the row
+    counts and the generated ids, rosters and today's sessions.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    today = session_now().date()
+    password_hash = generate_password_hash(password)
+
+    instructors = max(1, courses // 5)
+    first_user_id = _next_id(User)
+    instructor_ids = list(range(first_user_id, first_user_id + instructors))
+    student_ids = list(range(first_user_id + instructors, first_user_id + instructors + students))
+    first_course_id = _next_id(Course)
+    course_ids = list(range(first_course_id, first_course_id + courses))
+    course_instructor = {course_id: instructor_ids[i % instructors] for i, course_id in enumerate(course_ids)}
+
+    per_course = max(1, min(students, students * enrollments_per_student // max(courses, 1)))
+    rosters = {course_id: rng.sample(student_ids, per_course) for course_id in course_ids}
+
+    today_sessions = min(today_sessions, sessions)
+    past_sessions = sessions - today_sessions
+    first_session_id = _next_id(ClassSession)
+    storm_start = session_now() - timedelta(minutes=5)
+    session_rows = []
+    for i in range(sessions):
+        course_id = course_ids[i % courses]
+        if i < past_sessions:
+            session_date = today - timedelta(days=1 + i // courses)
+            start = datetime.combine(session_date, datetime.min.time()).replace(hour=9)
+        else:
+            session_date = today
+            start = storm_start
+        end = start + timedelta(minutes=90)
+        opens_at, late_at, closes_at = check_in_window(session_date, start.time(), end.time())
+        session_rows.append({
+            'id': first_session_id + i,
+            'course_id': course_id,
+            'instructor_id': course_instructor[course_id],
+            'session_date': session_date,
+            'start_time': start.time(),
+            'end_time': end.time(),
+            'location_name': f'Room {i % 500}',
+            'latitude': CAMPUS_LATITUDE + rng.uniform(-CAMPUS_SPREAD_DEGREES, CAMPUS_SPREAD_DEGREES),
+            'longitude': CAMPUS_LONGITUDE + rng.uniform(-CAMPUS_SPREAD_DEGREES, CAMPUS_SPREAD_DEGREES),
+            'attendance_radius': 50,
+            'created_at': now,
+            'is_active': True,
+            # Past sessions are finalized, absences included, like the close-out job leaves them
+            'closed_at': now if i < past_sessions else None,
+            'opens_at': opens_at,
+            'late_at': late_at,
+            'closes_at': closes_at
+        })
+
+    def users():
+        for user_id in instructor_ids:
+            yield {
+                'id': user_id, 'username': f'seed_instructor{user_id}', 'email': f'instructor{user_id}@seed.test',
+                'password_hash': password_hash, 'role': 'instructor', 'first_name': 'Seed',
+                'last_name': f'Instructor {user_id}', 'created_at': now, 'is_active': True, 'last_login': None
+            }
+        for user_id in student_ids:
+            yield {
+                'id': user_id, 'username': f'seed_student{user_id}', 'email': f'student{user_id}@seed.test',
+                'password_hash': password_hash, 'role': 'student', 'first_name': 'Seed',
+                'last_name': f'Student {user_id}', 'created_at': now, 'is_active': True, 'last_login': None
+            }
+
+    def course_rows():
+        for course_id in course_ids:
+            yield {
+                'id': course_id, 'course_name': f'Seed Course {course_id}', 'course_code': f'SEED{course_id}',
+                'instructor_id': course_instructor[course_id], 'created_at': now, 'is_active': True
+            }
+
+    def enrollments():
+        for course_id, roster in rosters.items():
+            for student_id in roster:
+                yield {'course_id': course_id, 'student_id': student_id, 'enrolled_at': now}
+
+    def attendance():
+        random_value = rng.random
+        for session in session_rows[:past_sessions]:
+            checked_in = datetime.combine(session['session_date'], session['start_time'])
+            latitude = session['latitude']
+            longitude = session['longitude']
+            session_id = session['id']
+            for student_id in rosters[session['course_id']]:
+                roll = random_value()
+                if roll < attendance_rate:
+                    yield {
+                        'session_id': session_id, 'student_id': student_id, 'check_in_time': checked_in,
+                        'latitude': latitude, 'longitude': longitude,
+                        'status': 'late' if roll < attendance_rate * late_rate else 'present',
+                        'created_at': checked_in
+                    }
+                else:
+                    yield {
+                        'session_id': session_id, 'student_id': student_id, 'check_in_time': now,
+                        'latitude': latitude, 'longitude': longitude, 'status': 'absent', 'created_at': now
+                    }
+
+    def feedback():
+        for course_id, roster in rosters.items():
+            for student_id in roster:
+                if rng.random() < feedback_rate:
+                    anonymous = rng.random() < 0.1
+                    yield {
+                        'course_id': course_id, 'student_id': None if anonymous else student_id,
+                        'rating': rng.randint(1, 5), 'comment': rng.choice(FEEDBACK_COMMENTS),
+                        'is_anonymous': anonymous, 'created_at': now - timedelta(minutes=rng.randint(0, 60 * 24 * 90))
+                    }
+
+    counts = {
+        'users': _bulk_insert(User, users(), batch_size),
+        'courses': _bulk_insert(Course, course_rows(), batch_size),
+        'enrollments': _bulk_insert(CourseEnrollment, enrollments(), batch_size),
+        'sessions': _bulk_insert(ClassSession, session_rows, batch_size),
+        'attendance_records': _bulk_insert(AttendanceRecord, attendance(), batch_size),
+        'feedback': _bulk_insert(Feedback, feedback(), batch_size)
+    }
+    rebuild_counters(db.session.connection())
+    response_cache.bump('courses')
+    db.session.commit()
+
+    return {
+        'counts': counts,
+        'instructor_ids': instructor_ids,
+        'student_ids': student_ids,
+        'rosters': rosters,
+        'today_sessions': session_rows[past_sessions:]
+    }
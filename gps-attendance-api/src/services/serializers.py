@@ -0,0 +1,55 @@
+import json
+import re
+from flask import current_app
+
+try:
+    import orjson
+except ImportError:  # optional; the standard library encoder produces the same bytes, more slowly
+    orjson = None
+
+# to_dict() keys of each model that are plain column values, in model order.
+# Selecting exactly these columns gives rows that zip straight into the dicts.
+USER_FIELDS = ('id', 'username', 'email', 'role', 'first_name', 'last_name', 'created_at', 'is_active', 'last_login')
+COURSE_FIELDS = ('id', 'course_name', 'course_code', 'instructor_id', 'created_at', 'is_active')
+SESSION_FIELDS = ('id', 'course_id', 'schedule_id', 'instructor_id', 'session_date', 'start_time', 'end_time',
+                  'location_name', 'latitude', 'longitude', 'attendance_radius', 'created_at', 'is_active', 'closed_at')
+ATTENDANCE_FIELDS = ('id', 'session_id', 'student_id', 'check_in_time', 'latitude', 'longitude', 'status', 'created_at')
+FEEDBACK_FIELDS = ('id', 'course_id', 'student_id', 'rating', 'comment', 'is_anonymous', 'created_at')
+
+# orjson writes floats differently from the standard library when Python would
+# use an exponent: small ones as 0.0000x, others as 1e-7 instead of 1e-07.
+# Strings that merely look similar only cost a fallback to the slower encoder.
+_EXPONENT = re.compile(rb'e[-0-9]')
+
+def columns(model, fields):
+    """Return the model's columns for ``fields``, to select as plain row tuples"""
+    return [getattr(model, field) for field in fields]
+
+def records(fields, rows):
+    """Turn selected rows into the dicts the model's to_dict() would return"""
+    return [dict(zip(fields, row)) for row in rows]
+
+def _isoformat(value):
+    return value.isoformat()
+
+def dumps(payload, indent=None):
+    """Encode a payload to the exact bytes ``jsonify`` would send.
+
+    Dates, times and datetimes are written in ISO format, as the to_dict()
+    methods do, so rows can be passed through without converting each value.
+    """
+    if orjson is not None and indent is None:
+        body = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE)
+        # Flask escapes non-ASCII characters, orjson does not
+        if body.isascii() and b'0.0000' not in body and not _EXPONENT.search(body):
+            return body
+    separators = None if indent else (',', ':')
+    return (json.dumps(payload, default=_isoformat, sort_keys=True, indent=indent, separators=separators) + '\n').encode()
+
+def json_response(payload, status=200):
+    """Response with the same body and headers as ``jsonify(payload), status``"""
+    provider = current_app.json
+    # jsonify pretty-prints in debug mode
+    pretty = provider.compact is False or (provider.compact is None and current_app.debug)
+    return current_app.response_class(dumps(payload, indent=2 if pretty else None), status=status,
+                                      mimetype=provider.mimetype)
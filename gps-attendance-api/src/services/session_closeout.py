@@ -0,0 +1,154 @@
+import atexit
+import threading
+from datetime import datetime
+from sqlalchemy import and_, func, insert, literal, or_, select, update
+from src.models.user import AttendanceRecord, ClassSession, CourseEnrollment, db, session_now
+from src.services.attendance_counters import record_absences
+from src.services.response_cache import bump_versions, response_cache
+from src.services.roster_stream import roster_broker
+from src.services.session_index import session_index
+from src.services.session_table import session_table
+
+# Upper bound on the sleep between runs, so sessions created or moved meanwhile are noticed
+DEFAULT_INTERVAL_SECONDS = 60
+
+def _ended(now):
+    # Session times are wall-clock times in SESSION_TIMEZONE
+    return or_(
+        ClassSession.session_date < now.date(),
+        and_(ClassSession.session_date == now.date(), ClassSession.end_time <= now.time())
+    )
+
+def close_sessions(connection, now=None):
+    """Close every active session whose end time has passed and return the ids closed.
+
+    Sessions are claimed by stamping ``closed_at``, so concurrent runs in
+    other worker processes never close the same session twice. Students who
+    were enrolled before the session ended and have no record then get an
+    ``absent`` record from one INSERT ... SELECT over all claimed sessions,
+    carrying the close-out time and the session's coordinates, and the
+    counters are bumped to match. Students who enrolled later are left out,
+    which matters when the first run closes a backlog of past sessions.
+    """
+    now = now or session_now()
+    closed_at = datetime.utcnow()
+    claimed = connection.execute(
+        update(ClassSession).where(
+            ClassSession.closed_at.is_(None), ClassSession.is_active == True, _ended(now)
+        ).values(closed_at=closed_at)
+    ).rowcount
+    if not claimed:
+        return []
+
+    session_ids = connection.execute(
+        select(ClassSession.id).where(ClassSession.closed_at == closed_at)
+    ).scalars().all()
+
+    checked_in = select(AttendanceRecord.id).where(
+        AttendanceRecord.session_id == ClassSession.id,
+        AttendanceRecord.student_id == CourseEnrollment.student_id
+    ).exists()
+    absentees = select(
+        ClassSession.id, CourseEnrollment.student_id, literal(closed_at), ClassSession.latitude,
+        ClassSession.longitude, literal('absent'), literal(closed_at)
+    ).join(CourseEnrollment, CourseEnrollment.course_id == ClassSession.course_id).where(
+        ClassSession.closed_at == closed_at, ~checked_in,
+        or_(
+            CourseEnrollment.enrolled_at.is_(None), ClassSession.closes_at.is_(None),
+            CourseEnrollment.enrolled_at < ClassSession.closes_at
+        )
+    )
+    connection.execute(insert(AttendanceRecord.__table__).from_select(
+        ['session_id', 'student_id', 'check_in_time', 'latitude', 'longitude', 'status', 'created_at'], absentees
+    ))
+    record_absences(connection, closed_at)
+    
+    # Session listings show closed_at
+    course_ids = connection.execute(
+        select(ClassSession.course_id).where(ClassSession.closed_at == closed_at).distinct()
+    ).scalars().all()
+    bump_versions(connection, [f'sessions:{course_id}' for course_id in course_ids])
+    return session_ids
+
+def next_session_end(connection, now=None):
+    """Return the SESSION_TIMEZONE datetime at which the next open session today ends, or None"""
+    now = now or session_now()
+    end_time = connection.execute(select(func.min(ClassSession.end_time)).where(
+        ClassSession.closed_at.is_(None), ClassSession.is_active == True,
+        ClassSession.session_date == now.date(), ClassSession.end_time > now.time()
+    )).scalar()
+    return datetime.combine(now.date(), end_time) if end_time else None
+
+class SessionCloser:
+    """Background scheduler that closes sessions as soon as their end time passes.
+
+    The thread sleeps until the earliest end time among today's open sessions,
+    capped at ``interval`` seconds, then closes everything that has ended.
+    Each worker process runs its own closer; claiming via ``closed_at`` keeps
+    them from writing the same absences twice.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.interval = DEFAULT_INTERVAL_SECONDS
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.sessions_closed = 0
+        self.errors = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('SESSION_CLOSEOUT_ENABLED', True)
+        self.interval = app.config.get('SESSION_CLOSEOUT_INTERVAL_SECONDS', DEFAULT_INTERVAL_SECONDS)
+        if self.enabled:
+            self._thread = threading.Thread(target=self._run, name='session-closer', daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def run_once(self):
+        """Close every ended session now; returns (sessions closed, next end time today or None)"""
+        with self.app.app_context():
+            with db.engine.begin() as connection:
+                session_ids = close_sessions(connection)
+                next_end = next_session_end(connection)
+        if session_ids:
+            response_cache.expire()
+        for session_id in session_ids:
+            session_index.discard(session_id)
+        roster_broker.close(session_ids)
+        if session_ids:
+            session_table.notify()
+        with self._lock:
+            self.runs += 1
+            self.sessions_closed += len(session_ids)
+        return len(session_ids), next_end
+
+    def _run(self):
+        while not self._stop.is_set():
+            wait = self.interval
+            try:
+                closed, next_end = self.run_once()
+                if next_end:
+                    wait = min(wait, max((next_end - session_now()).total_seconds(), 0) + 1)
+            except Exception:
+                # A busy database or a concurrent closer; try again on the next tick
+                with self._lock:
+                    self.errors += 1
+            self._stop.wait(wait)
+
+    def shutdown(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'runs': self.runs,
+                'sessions_closed': self.sessions_closed,
+                'errors': self.errors
+            }
+
+session_closer = SessionCloser()
@@ -0,0 +1,169 @@
+import math
+import threading
+import time
+from src.models.user import ClassSession, session_now
+from src.services.geo import calculate_distance, METERS_PER_DEGREE_LAT
+
+# Grid cells are 0.01 degrees (~1.1km north-south), so a geofence of a few
+# hundred meters only ever touches the cell it is in and its neighbours
+CELL_SIZE_DEGREES = 0.01
+
+# Sessions changed by another worker process are picked up on the next reload
+RELOAD_INTERVAL_SECONDS = 60
+
+class IndexedSession:
+    """Read-only snapshot of an active ClassSession row held in the index"""
+
+    __slots__ = ('id', 'course_id', 'instructor_id', 'session_date', 'start_time', 'end_time', 'opens_at', 'late_at',
+                 'closes_at', 'location_name', 'latitude', 'longitude', 'attendance_radius', 'is_active', 'data')
+
+    def __init__(self, session):
+        self.id = session.id
+        self.course_id = session.course_id
+        self.instructor_id = session.instructor_id
+        self.session_date = session.session_date
+        self.start_time = session.start_time
+        self.end_time = session.end_time
+        self.opens_at = session.opens_at
+        self.late_at = session.late_at
+        self.closes_at = session.closes_at
+        self.location_name = session.location_name
+        self.latitude = session.latitude
+        self.longitude = session.longitude
+        self.attendance_radius = session.attendance_radius if session.attendance_radius is not None else 50
+        self.is_active = session.is_active
+        self.data = session.to_dict()
+
+    def to_dict(self):
+        return dict(self.data)
+
+def _cell(latitude, longitude):
+    return (math.floor(latitude / CELL_SIZE_DEGREES), math.floor(longitude / CELL_SIZE_DEGREES))
+
+class SessionIndex:
+    """Grid-bucketed in-memory index of today's active class sessions.
+
+    Upserts and discards made while a reload is reading rows are logged and
+    replayed onto the fresh index when it is swapped in, so a change that
+    lands between the reload's query and the swap is not lost.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._day = None
+        self._loaded_at = 0.0
+        self._sessions = {}
+        self._cells = {}
+        self._max_radius = 0
+        self._reloading = 0
+        self._changes = []  # (session_id, entry or None) applied while a reload was running
+        self._changes_base = 0  # number of changes made before self._changes[0]
+
+    def _ensure_loaded(self):
+        if self._day == session_now().date() and time.monotonic() - self._loaded_at < RELOAD_INTERVAL_SECONDS:
+            return
+        self.reload()
+
+    def reload(self):
+        """Rebuild the index from the active sessions scheduled for today that are not closed yet"""
+        with self._lock:
+            self._reloading += 1
+            replay_from = self._changes_base + len(self._changes)
+        try:
+            today = session_now().date()
+            rows = ClassSession.query.filter_by(session_date=today, is_active=True, closed_at=None).all()
+            sessions = {}
+            cells = {}
+            for row in rows:
+                entry = IndexedSession(row)
+                sessions[entry.id] = entry
+                cells.setdefault(_cell(entry.latitude, entry.longitude), set()).add(entry.id)
+            with self._lock:
+                self._sessions = sessions
+                self._cells = cells
+                for session_id, entry in self._changes[replay_from - self._changes_base:]:
+                    self._apply(session_id, entry, log=False)
+                self._max_radius = max((e.attendance_radius for e in self._sessions.values()), default=0)
+                self._day = today
+                self._loaded_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._reloading -= 1
+                if not self._reloading:
+                    self._changes_base += len(self._changes)
+                    self._changes = []
+
+    def _apply(self, session_id, entry, log=True):
+        """Replace a session's entry, or drop it when ``entry`` is None; call with the lock held"""
+        old = self._sessions.pop(session_id, None)
+        if old:
+            key = _cell(old.latitude, old.longitude)
+            bucket = self._cells.get(key)
+            if bucket:
+                bucket.discard(session_id)
+                if not bucket:
+                    del self._cells[key]
+        if entry:
+            self._sessions[entry.id] = entry
+            self._cells.setdefault(_cell(entry.latitude, entry.longitude), set()).add(entry.id)
+            self._max_radius = max(self._max_radius, entry.attendance_radius)
+        shrunk = old is not None and (entry is None or entry.attendance_radius < old.attendance_radius)
+        if shrunk and old.attendance_radius >= self._max_radius:
+            # The widest geofence may be gone, so shrink the search box to what is left
+            self._max_radius = max((e.attendance_radius for e in self._sessions.values()), default=0)
+        if log and self._reloading:
+            self._changes.append((session_id, entry))
+
+    def upsert(self, session):
+        """Add, move or drop a session after it was created or updated"""
+        open_today = session.is_active and session.closed_at is None and session.session_date == session_now().date()
+        entry = IndexedSession(session) if open_today else None
+        with self._lock:
+            if self._day is None and not self._reloading:
+                # Nothing loaded yet; the first lookup will load fresh rows
+                return
+            self._apply(session.id, entry)
+
+    def discard(self, session_id):
+        """Drop a session after it was deleted, deactivated or closed"""
+        with self._lock:
+            self._apply(session_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {'sessions': len(self._sessions), 'max_radius': self._max_radius}
+
+    def get(self, session_id):
+        """Return the indexed session, or None if it is not active today"""
+        self._ensure_loaded()
+        return self._sessions.get(session_id)
+
+    def nearby(self, latitude, longitude, radius=None):
+        """Return (session, distance) pairs close to a point, nearest first.
+
+        Without a radius a session matches when the point is inside its own
+        attendance radius; with one it matches when it is within that many meters.
+        """
+        self._ensure_loaded()
+        reach = radius if radius is not None else self._max_radius
+        lat_span = reach / METERS_PER_DEGREE_LAT
+        lon_span = reach / (METERS_PER_DEGREE_LAT * max(math.cos(math.radians(latitude)), 0.01))
+        min_lat, min_lon = _cell(latitude - lat_span, longitude - lon_span)
+        max_lat, max_lon = _cell(latitude + lat_span, longitude + lon_span)
+
+        sessions = self._sessions
+        cells = self._cells
+        matches = []
+        for lat_cell in range(min_lat, max_lat + 1):
+            for lon_cell in range(min_lon, max_lon + 1):
+                for session_id in tuple(cells.get((lat_cell, lon_cell), ())):
+                    entry = sessions.get(session_id)
+                    if not entry:
+                        continue
+                    distance = calculate_distance(latitude, longitude, entry.latitude, entry.longitude)
+                    if distance <= (radius if radius is not None else entry.attendance_radius):
+                        matches.append((entry, distance))
+        matches.sort(key=lambda match: match[1])
+        return matches
+
+session_index = SessionIndex()
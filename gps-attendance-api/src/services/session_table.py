@@ -0,0 +1,332 @@
+import atexit
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time as clock
+from collections import namedtuple
+from datetime import datetime, time, timezone
+from sqlalchemy import func, select
+from src.models.user import CacheVersion, ClassSession, db, session_now
+from src.services.session_index import session_index
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; every lookup then goes to the per-process session index
+    fcntl = None
+
+DEFAULT_CAPACITY = 65536
+
+# The writer checks for session changes this often
+DEFAULT_SYNC_SECONDS = 1
+
+# Rebuilt at least this often even when no change was seen
+REFRESH_SECONDS = 60
+
+# Readers stop trusting a table whose writer has not checked in for this long
+STALE_SECONDS = 30
+
+# Reads retried while the writer is mid-update before falling back to the session index
+MAX_READ_ATTEMPTS = 100
+
+MAGIC = b'GPST'
+LAYOUT_VERSION = 2
+FLAG_OVERFLOW = 1
+
+# magic, layout, flags, local day (ordinal), sequence (odd while writing), generation, written at, count, capacity
+HEADER = struct.Struct('<4sHHIQQdII')
+HEADER_SIZE = 64
+SEQUENCE = struct.Struct('<Q')
+SEQUENCE_OFFSET = 12
+
+# id, course_id, instructor_id, latitude, longitude, radius, start and end (seconds after midnight), version,
+# then the UTC check-in instants opens_at, late_at and closes_at as unix times
+RECORD = struct.Struct('<qqqddiiiIddd16x')
+RECORD_ID = struct.Struct('<q')
+
+ActiveSession = namedtuple('ActiveSession', (
+    'id', 'course_id', 'instructor_id', 'latitude', 'longitude', 'attendance_radius', 'start_time', 'end_time',
+    'version', 'opens_at', 'late_at', 'closes_at'
+))
+
+def _seconds(value):
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+def _time(seconds):
+    return time(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+def _timestamp(instant):
+    # Naive UTC datetime to unix time; 0 stands for a window that was never computed
+    return instant.replace(tzinfo=timezone.utc).timestamp() if instant else 0.0
+
+def _instant(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None) if timestamp else None
+
+class SessionTable:
+    """Memory-mapped table of today's open sessions, shared by every worker process on a host.
+
+    Fixed-size records sorted by session id follow a small header, so a
+    check-in finds its session with a binary search over the mapping instead
+    of a query. One process at a time holds the writer lock; its thread
+    rebuilds the table whenever a session write bumps a cache version (the
+    same counters the response cache uses), and at least once a minute.
+    Readers follow a sequence lock: the writer makes the sequence odd while it
+    writes and readers retry if it changed under them. A session missing from
+    the table is read from the database, since it may have been created after
+    the last rebuild. When the table is missing, stale, full or from another
+    day, lookups fall back to the per-process session index.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.path = None
+        self.capacity = DEFAULT_CAPACITY
+        self.sync_interval = DEFAULT_SYNC_SECONDS
+        self._lock = threading.Lock()
+        self._pid = None
+        self._map = None
+        self._lock_file = None
+        self._thread = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self.is_writer = False
+        self._marker = None
+        self._written_at = 0.0
+        self.lookups = 0
+        self.misses = 0
+        self.fallbacks = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('SESSION_TABLE_ENABLED', True) and fcntl is not None
+        self.capacity = app.config.get('SESSION_TABLE_CAPACITY', DEFAULT_CAPACITY)
+        self.sync_interval = app.config.get('SESSION_TABLE_SYNC_SECONDS', DEFAULT_SYNC_SECONDS)
+        self.path = app.config.get('SESSION_TABLE_PATH')
+        if not self.path:
+            # One table per database, so several deployments on a host do not share one
+            digest = hashlib.blake2b(app.config['SQLALCHEMY_DATABASE_URI'].encode(), digest_size=6).hexdigest()
+            self.path = os.path.join(tempfile.gettempdir(), f'gps-attendance-sessions-{digest}.tbl')
+        if self.enabled:
+            self._attach()
+
+    def _attach(self):
+        """Map the table in this process, once per process (gunicorn forks workers after import)"""
+        if self._pid == os.getpid():
+            return self._map is not None
+        with self._lock:
+            if self._pid == os.getpid():
+                return self._map is not None
+            size = HEADER_SIZE + self.capacity * RECORD.size
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                if os.fstat(fd).st_size < size:
+                    os.ftruncate(fd, size)
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                self._map = mmap.mmap(fd, size)
+            finally:
+                os.close(fd)
+            self._lock_file = None
+            self.is_writer = False
+            self._marker = None
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='session-table-writer', daemon=True)
+            self._thread.start()
+            if self._pid is None:
+                atexit.register(self.shutdown)
+            self._pid = os.getpid()
+            return True
+
+    def _usable_header(self):
+        magic, layout, flags, day, sequence, generation, written_at, count, capacity = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or layout != LAYOUT_VERSION or flags & FLAG_OVERFLOW:
+            return None
+        if day != session_now().date().toordinal() or clock.time() - written_at > STALE_SECONDS:
+            return None
+        return sequence, min(count, capacity, self.capacity)
+
+    def _find(self, session_id):
+        """Binary search for a session id; returns (found, record) or None if the table is not usable"""
+        for _ in range(MAX_READ_ATTEMPTS):
+            header = self._usable_header()
+            if header is None:
+                return None
+            sequence, count = header
+            if sequence & 1:
+                continue
+            low, high = 0, count - 1
+            record = None
+            while low <= high:
+                middle = (low + high) // 2
+                offset = HEADER_SIZE + middle * RECORD.size
+                current = RECORD_ID.unpack_from(self._map, offset)[0]
+                if current < session_id:
+                    low = middle + 1
+                elif current > session_id:
+                    high = middle - 1
+                else:
+                    record = RECORD.unpack_from(self._map, offset)
+                    break
+            # Retry if the writer replaced the table while we were reading it
+            if SEQUENCE.unpack_from(self._map, SEQUENCE_OFFSET)[0] == sequence:
+                return record is not None, record
+        # A writer that died mid-write leaves the sequence odd until its successor rewrites the table
+        return None
+
+    def get(self, session_id):
+        """Return the open session with this id scheduled for today, or None"""
+        try:
+            session_id = int(session_id)
+        except (TypeError, ValueError):
+            return None
+        result = None
+        if self.enabled and self._attach():
+            result = self._find(session_id)
+        if result is None:
+            with self._lock:
+                self.fallbacks += 1
+            return session_index.get(session_id) or self._load(session_id)
+        with self._lock:
+            self.lookups += 1
+        found, record = result
+        if not found:
+            # Created since the last rebuild, possibly by another worker, or not open today at all
+            with self._lock:
+                self.misses += 1
+            return self._load(session_id)
+        session_id, course_id, instructor_id, latitude, longitude, radius, start, end, version = record[:9]
+        return ActiveSession(session_id, course_id, instructor_id, latitude, longitude, radius, _time(start),
+                             _time(end), version, *(_instant(timestamp) for timestamp in record[9:]))
+
+    def _load(self, session_id):
+        """Read a session missing from the table from the database, with the same filter the writer uses"""
+        return ClassSession.query.filter_by(
+            id=session_id, session_date=session_now().date(), is_active=True, closed_at=None
+        ).first()
+
+    def notify(self):
+        """Check for session changes now instead of waiting for the sync interval"""
+        self._wake.set()
+
+    def _acquire_writer_lock(self):
+        fd = os.open(self.path + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        # Held until the process exits; the lock is released with it and another worker takes over
+        self._lock_file = fd
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.is_writer or self._acquire_writer_lock():
+                    self.is_writer = True
+                    self.sync()
+            except Exception:
+                # A busy database; try again on the next tick
+                with self._lock:
+                    self.errors += 1
+            self._wake.wait(self.sync_interval)
+            self._wake.clear()
+
+    def sync(self):
+        """Rebuild the table if sessions may have changed, otherwise just mark it as current"""
+        today = session_now().date()
+        with self.app.app_context():
+            with db.engine.connect() as connection:
+                marker = (today, connection.execute(select(func.max(CacheVersion.version))).scalar())
+                now = clock.time()
+                if marker == self._marker and now - self._written_at < REFRESH_SECONDS:
+                    self._touch(now)
+                    return
+                rows = connection.execute(select(
+                    ClassSession.id, ClassSession.course_id, ClassSession.instructor_id, ClassSession.latitude,
+                    ClassSession.longitude, ClassSession.attendance_radius, ClassSession.start_time,
+                    ClassSession.end_time, ClassSession.opens_at, ClassSession.late_at, ClassSession.closes_at
+                ).where(
+                    ClassSession.session_date == today, ClassSession.is_active == True,
+                    ClassSession.closed_at.is_(None)
+                ).order_by(ClassSession.id)).all()
+        self._write(today, rows)
+        self._marker = marker
+
+    def _touch(self, now):
+        sequence = SEQUENCE.unpack_from(self._map, SEQUENCE_OFFSET)[0]
+        if sequence & 1:
+            # Left odd by a writer that died mid-write; readers expect it even at rest
+            sequence += 1
+        header = list(HEADER.unpack_from(self._map, 0))
+        header[4] = sequence + 1
+        header[6] = now
+        HEADER.pack_into(self._map, 0, *header)
+        SEQUENCE.pack_into(self._map, SEQUENCE_OFFSET, sequence + 2)
+        self._written_at = now
+
+    def _write(self, today, rows):
+        magic, layout, _, _, sequence, generation, _, count, _ = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or layout != LAYOUT_VERSION:
+            sequence, generation, count = 0, 0, 0
+        else:
+            count = min(count, self.capacity)
+        if sequence & 1:
+            # Left odd by a writer that died mid-write; readers expect it even at rest
+            sequence += 1
+
+        # Keep the version of rows that did not change, so readers can tell which ones did
+        previous = {}
+        for index in range(count):
+            record = RECORD.unpack_from(self._map, HEADER_SIZE + index * RECORD.size)
+            previous[record[0]] = record
+        generation += 1
+
+        records = []
+        for session_id, course_id, instructor_id, latitude, longitude, radius, start, end, *window in rows[:self.capacity]:
+            values = (session_id, course_id, instructor_id, latitude, longitude,
+                      radius if radius is not None else 50, _seconds(start), _seconds(end))
+            instants = tuple(_timestamp(instant) for instant in window)
+            old = previous.get(session_id)
+            unchanged = old and old[:8] == values and old[9:] == instants
+            records.append(values + (old[8] if unchanged else generation,) + instants)
+
+        flags = FLAG_OVERFLOW if len(rows) > self.capacity else 0
+        now = clock.time()
+        SEQUENCE.pack_into(self._map, SEQUENCE_OFFSET, sequence + 1)
+        for index, record in enumerate(records):
+            RECORD.pack_into(self._map, HEADER_SIZE + index * RECORD.size, *record)
+        HEADER.pack_into(self._map, 0, MAGIC, LAYOUT_VERSION, flags, today.toordinal(), sequence + 1, generation,
+                         now, len(records), self.capacity)
+        SEQUENCE.pack_into(self._map, SEQUENCE_OFFSET, sequence + 2)
+        self._written_at = now
+        with self._lock:
+            self.refreshes += 1
+
+    def shutdown(self):
+        self._stop.set()
+        self._wake.set()
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'enabled': self.enabled,
+                'writer': self.is_writer,
+                'lookups': self.lookups,
+                'misses': self.misses,
+                'fallbacks': self.fallbacks,
+                'refreshes': self.refreshes,
+                'errors': self.errors
+            }
+        if self._map is not None:
+            _, _, flags, _, _, generation, written_at, count, _ = HEADER.unpack_from(self._map, 0)
+            stats.update(sessions=count, generation=generation, overflow=bool(flags & FLAG_OVERFLOW),
+                         age_seconds=round(max(clock.time() - written_at, 0), 1) if written_at else None)
+        return stats
+
+session_table = SessionTable()
@@ -0,0 +1,242 @@
+import atexit
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import delete, or_, select
+from src.models.user import RevokedToken, db
+
+# Other worker processes see a revocation after at most this long
+REVOCATION_SYNC_SECONDS = 5
+
+# The filter is rebuilt without expired entries this often
+REVOCATION_REBUILD_SECONDS = 600
+
+# Expired rows are deleted from the table this often, by a background thread
+REVOCATION_PURGE_SECONDS = 600
+
+# Ids below the newest one seen that are still missing may belong to inserts that
+# commit late (ids are not handed out in commit order); they are re-read for this long
+REVOCATION_GAP_SECONDS = 60
+
+# More missing ids than this at once (a burst of rollbacks) falls back to a full rebuild
+MAX_TRACKED_GAPS = 1000
+
+MIN_CAPACITY = 10000
+FALSE_POSITIVE_RATE = 0.001
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings; answers "maybe present" or "definitely absent" """
+
+    def __init__(self, capacity, error_rate=FALSE_POSITIVE_RATE):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing: derive every probe from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+class TokenRevocationList:
+    """Deny-list of revoked JWTs kept in memory and persisted in the revoked_token table.
+
+    Revoked token ids go into a Bloom filter, so the common case (a token that
+    was never revoked) is answered without touching the database; a filter hit
+    is confirmed with a primary-key lookup. User-wide revocations, written on
+    password changes, are few and kept as an exact user_id -> cutoff map. Each
+    process pulls rows written by other processes every few seconds, and
+    entries age out once the tokens they cover have expired.
+
+    Pulls read rows above the newest id seen, plus the ids below it that
+    were missing so far. A row that committed after a row with a higher id
+    is therefore picked up on the next pull rather than at the next rebuild.
+
+    Expired rows are deleted by a background thread (or ``flask
+    purge-revoked-tokens``), never on the request path.
+    """
+
+    def __init__(self, sync_interval=REVOCATION_SYNC_SECONDS, rebuild_interval=REVOCATION_REBUILD_SECONDS):
+        self.app = None
+        self.sync_interval = sync_interval
+        self.rebuild_interval = rebuild_interval
+        self.purge_interval = REVOCATION_PURGE_SECONDS
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._filter = BloomFilter(MIN_CAPACITY)
+        self._user_cutoffs = {}  # user_id -> (latest revoked iat, expires_at)
+        self._last_id = 0
+        self._gaps = {}  # missing id -> monotonic time it was first missed
+        self._synced_at = None
+        self._rebuilt_at = None
+        self.checks = 0
+        self.confirmations = 0
+        self.purged = 0
+        self.purge_errors = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.purge_interval = app.config.get('REVOCATION_PURGE_SECONDS', REVOCATION_PURGE_SECONDS)
+        if self.purge_interval > 0:
+            self._thread = threading.Thread(target=self._run, name='revocation-purge', daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def _apply(self, rows):
+        for row_id, jti, user_id, revoked_before, expires_at in rows:
+            if jti:
+                self._filter.add(jti)
+            elif revoked_before is not None:
+                current = self._user_cutoffs.get(user_id)
+                if current is None or revoked_before > current[0]:
+                    self._user_cutoffs[user_id] = (revoked_before, expires_at)
+            self._last_id = max(self._last_id, row_id)
+
+    def _track_gaps(self, previous_last_id, rows, now):
+        """Remember ids between ``previous_last_id`` and the newest id that no row has used yet"""
+        seen = {row[0] for row in rows}
+        for row_id in seen:
+            self._gaps.pop(row_id, None)
+        start = max(previous_last_id, self._last_id - MAX_TRACKED_GAPS)
+        for row_id in range(start + 1, self._last_id):
+            if row_id not in seen:
+                self._gaps.setdefault(row_id, now)
+        self._gaps = {row_id: since for row_id, since in self._gaps.items() if now - since < REVOCATION_GAP_SECONDS}
+        if len(self._gaps) > MAX_TRACKED_GAPS:
+            self._gaps = {}
+            self._rebuilt_at = None
+
+    def _rebuild(self, connection):
+        """Rebuild the filter from the unexpired rows, sized for them"""
+        table = RevokedToken.__table__
+        rows = connection.execute(select(
+            table.c.id, table.c.jti, table.c.user_id, table.c.revoked_before, table.c.expires_at
+        ).where(table.c.expires_at > datetime.utcnow())).all()
+        with self._lock:
+            self._filter = BloomFilter(max(MIN_CAPACITY, len(rows) * 2))
+            self._user_cutoffs = {}
+            self._last_id = 0
+            self._gaps = {}
+            self._apply(rows)
+            self._track_gaps(0, rows, time.monotonic())
+
+    def _pull(self, connection):
+        """Add rows written since the last sync, e.g. by other worker processes"""
+        table = RevokedToken.__table__
+        with self._lock:
+            last_id, gaps = self._last_id, list(self._gaps)
+        condition = table.c.id > last_id
+        if gaps:
+            condition = or_(condition, table.c.id.in_(gaps))
+        rows = connection.execute(select(
+            table.c.id, table.c.jti, table.c.user_id, table.c.revoked_before, table.c.expires_at
+        ).where(condition).order_by(table.c.id)).all()
+        with self._lock:
+            self._apply(rows)
+            self._track_gaps(last_id, rows, time.monotonic())
+            # An outgrown filter loses accuracy, so resize it on the next sync
+            if self._filter.count > self._filter.capacity:
+                self._rebuilt_at = None
+
+    def _sync(self):
+        now = time.monotonic()
+        if self._synced_at is not None and now - self._synced_at < self.sync_interval and self._rebuilt_at is not None:
+            return
+        # One thread syncs while the others keep using the current filter
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            # Use the primary engine directly, outside the request's session and any read-only routing
+            with db.engine.connect() as connection:
+                if self._rebuilt_at is None or now - self._rebuilt_at >= self.rebuild_interval:
+                    self._rebuild(connection)
+                    self._rebuilt_at = now
+                else:
+                    self._pull(connection)
+            self._synced_at = now
+        finally:
+            self._sync_lock.release()
+
+    def is_revoked(self, claims):
+        """Return True if the decoded token claims belong to a revoked token"""
+        self._sync()
+        with self._lock:
+            self.checks += 1
+            cutoff = self._user_cutoffs.get(claims.get('user_id'))
+            maybe_revoked = claims.get('jti') in self._filter if claims.get('jti') else False
+        if cutoff and claims.get('iat', 0) <= cutoff[0]:
+            return True
+        if not maybe_revoked:
+            return False
+        with self._lock:
+            self.confirmations += 1
+        return db.session.query(RevokedToken.id).filter_by(jti=claims['jti']).first() is not None
+
+    def revoke_token(self, claims):
+        """Revoke a single token until it expires"""
+        db.session.add(RevokedToken(
+            jti=claims['jti'], user_id=claims['user_id'], expires_at=datetime.utcfromtimestamp(claims['exp'])
+        ))
+        db.session.flush()
+        with self._lock:
+            self._filter.add(claims['jti'])
+
+    def revoke_user_tokens(self, user_id, issued_before, expires_at):
+        """Revoke every token of a user issued at or before ``issued_before`` (a unix timestamp)"""
+        db.session.add(RevokedToken(user_id=user_id, revoked_before=issued_before, expires_at=expires_at))
+        db.session.flush()
+        with self._lock:
+            current = self._user_cutoffs.get(user_id)
+            if current is None or issued_before > current[0]:
+                self._user_cutoffs[user_id] = (issued_before, expires_at)
+
+    def purge(self):
+        """Delete the rows whose tokens have expired and return how many"""
+        table = RevokedToken.__table__
+        with self.app.app_context():
+            with db.engine.begin() as connection:
+                deleted = connection.execute(delete(table).where(table.c.expires_at <= datetime.utcnow())).rowcount
+        with self._lock:
+            self.purged += deleted
+        return deleted
+
+    def _run(self):
+        while not self._stop.wait(self.purge_interval):
+            try:
+                self.purge()
+            except Exception:
+                # A busy database; try again on the next tick
+                with self._lock:
+                    self.purge_errors += 1
+
+    def shutdown(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'filter_entries': self._filter.count,
+                'filter_capacity': self._filter.capacity,
+                'revoked_users': len(self._user_cutoffs),
+                'checks': self.checks,
+                'confirmations': self.confirmations,
+                'purged': self.purged,
+                'purge_errors': self.purge_errors
+            }
+
+token_revocations = TokenRevocationList()
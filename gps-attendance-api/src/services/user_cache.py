@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+from src.models.user import User, db
+
+MAX_CACHED_TOKENS = 10000
+
+# Changes made through another worker process are picked up after this long
+USER_CACHE_TTL_SECONDS = 30
+
+class AuthenticatedUser:
+    """Lightweight view of the user behind a verified token.
+
+    Carries only the fields needed for authorization. Any other attribute, such
+    as ``to_dict`` or ``email``, loads the full ORM ``User`` on first access.
+    """
+
+    __slots__ = ('id', 'username', 'role', 'is_active', '_model')
+
+    def __init__(self, id, username, role, is_active):
+        self.id = id
+        self.username = username
+        self.role = role
+        self.is_active = is_active
+        self._model = None
+
+    def load(self):
+        """Return the full ORM User, querying it at most once per request"""
+        if self._model is None:
+            self._model = User.query.get(self.id)
+        return self._model
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+class UserCache:
+    """Bounded TTL cache of authorization state keyed by user id and token"""
+
+    def __init__(self, max_entries=MAX_CACHED_TOKENS, ttl=USER_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (user_id, token) -> (expires_at, generation, state)
+        self._generations = {}  # user_id -> bumped on every invalidation
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id, token):
+        """Return an AuthenticatedUser for an active user, or None"""
+        key = (user_id, token)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached and cached[0] > now and cached[1] == self._generations.get(user_id, 0):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return AuthenticatedUser(*cached[2]) if cached[2] else None
+            generation = self._generations.get(user_id, 0)
+            self.misses += 1
+
+        row = db.session.query(User.id, User.username, User.role, User.is_active).filter(
+            User.id == user_id
+        ).first()
+        state = tuple(row) if row and row.is_active else None
+
+        with self._lock:
+            # Skip caching if the user changed while we were reading it
+            if generation == self._generations.get(user_id, 0):
+                self._entries[key] = (now + self.ttl, generation, state)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return AuthenticatedUser(*state) if state else None
+
+    def invalidate(self, user_id):
+        """Forget every cached token of a user"""
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            return {'cached_tokens': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+user_cache = UserCache()
+
+# Invalidate after the change is committed, so a concurrent request cannot
+# re-cache the old row between the flush and the commit
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _track_changed_user(mapper, connection, target):
+    object_session(target).info.setdefault('changed_user_ids', set()).add(target.id)
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_changed_users(session):
+    for user_id in session.info.pop('changed_user_ids', ()):
+        user_cache.invalidate(user_id)
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_changed_users(session):
+    session.info.pop('changed_user_ids', None)
@@ -0,0 +1,66 @@
+import itertools
+import os
+import sys
+import tempfile
+from datetime import time
+
+import pytest
+
+# The app reads its configuration from the environment when it is imported
+_directory = tempfile.mkdtemp(prefix='gps-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_directory, 'test.db')}"
+os.environ['SESSION_TABLE_PATH'] = os.path.join(_directory, 'sessions.tbl')
+os.environ['SESSION_CLOSEOUT_ENABLED'] = '0'
+os.environ['RESPONSE_CACHE_ENABLED'] = '0'
+# Away from UTC so code that mixes up the session zone and UTC fails
+os.environ['SESSION_TIMEZONE'] = 'America/New_York'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import app as flask_app
+from src.models.user import ClassSession, Course, CourseEnrollment, User, db, session_now
+from src.routes.auth import create_token
+
+_ids = itertools.count(1)
+
+@pytest.fixture
+def app():
+    with flask_app.app_context():
+        yield flask_app
+        db.session.remove()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def auth_headers(user):
+    return {'Authorization': f'Bearer {create_token(user)}'}
+
+def make_user(role='student'):
+    number = next(_ids)
+    # Tests sign their own tokens, so no user needs a usable password
+    user = User(username=f'test_{role}{number}', email=f'test_{role}{number}@test.edu', role=role,
+                first_name=role.title(), last_name=str(number), password_hash='!')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+def make_course(instructor, students=(), enrolled_at=None):
+    number = next(_ids)
+    course = Course(course_name=f'Course {number}', course_code=f'T{number}', instructor_id=instructor.id)
+    db.session.add(course)
+    db.session.commit()
+    # Enrollments default to now, too late for sessions in the past to count them
+    when = {'enrolled_at': enrolled_at} if enrolled_at else {}
+    db.session.add_all([CourseEnrollment(course_id=course.id, student_id=student.id, **when) for student in students])
+    db.session.commit()
+    return course
+
+def make_session(course, session_date=None, start_time=time(0, 0), end_time=time(23, 59),
+                 latitude=40.0, longitude=-74.0, radius=100):
+    session = ClassSession(course_id=course.id, instructor_id=course.instructor_id,
+                           session_date=session_date or session_now().date(), start_time=start_time, end_time=end_time,
+                           location_name='Room 1', latitude=latitude, longitude=longitude, attendance_radius=radius)
+    db.session.add(session)
+    db.session.commit()
+    return session
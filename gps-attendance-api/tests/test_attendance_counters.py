@@ -0,0 +1,49 @@
+from datetime import datetime, time, timedelta
+
+from conftest import auth_headers, make_course, make_session, make_user
+from src.models.user import SESSION_TIMEZONE, db, session_now
+from src.services.aggregates import attendance_status_counts, course_status_counts, student_status_counts
+from src.services.attendance_counters import rebuild_counters
+
+def test_counters_follow_every_check_in_path(app, client):
+    instructor = make_user('instructor')
+    students = [make_user() for _ in range(3)]
+    course = make_course(instructor, students)
+    today = make_session(course)
+    day = session_now().date() - timedelta(days=1)
+    yesterday = make_session(course, session_date=day, start_time=time(9, 0), end_time=time(10, 0))
+    on_time, late = (datetime.combine(day, t, SESSION_TIMEZONE).isoformat() for t in (time(8, 55), time(9, 10)))
+
+    client.post('/api/checkin', headers=auth_headers(students[0]), json={
+        'session_id': today.id, 'latitude': 40.0, 'longitude': -74.0
+    })
+    client.post('/api/checkin/batch', headers=auth_headers(instructor), json={'checkins': [
+        {'session_id': today.id, 'student_id': students[1].id, 'latitude': 40.0, 'longitude': -74.0},
+        {'session_id': yesterday.id, 'student_id': students[0].id, 'latitude': 40.0, 'longitude': -74.0,
+         'timestamp': late},
+        {'session_id': yesterday.id, 'student_id': students[1].id, 'latitude': 40.0, 'longitude': -74.0,
+         'timestamp': on_time},
+    ]})
+
+    maintained = sorted(course_status_counts(course.id))
+    assert maintained == [('late', 1), ('present', 3)]
+    assert maintained == sorted(attendance_status_counts(course_id=course.id))
+    assert sorted(student_status_counts(students[0].id, course.id)) == [('late', 1), ('present', 1)]
+
+    # A full recount agrees with the counters kept up on every write
+    rebuild_counters(db.session.connection())
+    db.session.commit()
+    assert sorted(course_status_counts(course.id)) == maintained
+
+def test_duplicate_check_in_does_not_bump_counters(app, client):
+    student = make_user()
+    course = make_course(make_user('instructor'), [student])
+    session = make_session(course)
+    payload = {'session_id': session.id, 'latitude': 40.0, 'longitude': -74.0}
+
+    client.post('/api/checkin', headers=auth_headers(student), json=payload)
+    assert client.post('/api/checkin', headers=auth_headers(student), json=payload).status_code == 400
+
+    response = client.get('/api/statistics', headers=auth_headers(student), query_string={'course_id': course.id})
+    assert response.get_json()['total_sessions'] == 1
+    assert course_status_counts(course.id) == [('present', 1)]
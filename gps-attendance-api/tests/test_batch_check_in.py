@@ -0,0 +1,59 @@
+from conftest import auth_headers, make_course, make_session, make_user
+
+def test_batch_accepts_and_rejects_entries_independently(app, client):
+    instructor = make_user('instructor')
+    students = [make_user() for _ in range(3)]
+    outsider = make_user()
+    course = make_course(instructor, students)
+    session = make_session(course)
+
+    response = client.post('/api/checkin/batch', headers=auth_headers(instructor), json={'checkins': [
+        {'session_id': session.id, 'student_id': students[0].id, 'latitude': 40.0, 'longitude': -74.0},
+        {'session_id': session.id, 'student_id': students[1].id, 'latitude': 40.0, 'longitude': -74.0},
+        # About 1.1km north of the class
+        {'session_id': session.id, 'student_id': students[2].id, 'latitude': 40.01, 'longitude': -74.0},
+        {'session_id': session.id, 'student_id': outsider.id, 'latitude': 40.0, 'longitude': -74.0},
+        {'session_id': session.id, 'student_id': students[0].id, 'latitude': 40.0, 'longitude': -74.0},
+        {'session_id': session.id, 'latitude': 40.0},
+    ]})
+    assert response.status_code == 200
+    body = response.get_json()
+
+    assert [r['accepted'] for r in body['results']] == [True, True, False, False, False, False]
+    assert body['accepted_count'] == 2 and body['rejected_count'] == 4
+    assert body['results'][2]['required_radius'] == 100
+    assert body['results'][3]['message'] == 'Student is not enrolled in this course'
+    assert body['results'][4]['message'] == 'Student has already checked in for this session'
+
+    # A resubmitted batch is rejected for the students already written
+    response = client.post('/api/checkin/batch', headers=auth_headers(instructor), json={'checkins': [
+        {'session_id': session.id, 'student_id': students[1].id, 'latitude': 40.0, 'longitude': -74.0}
+    ]})
+    assert response.get_json()['results'][0]['message'] == 'Student has already checked in for this session'
+
+def test_students_can_only_batch_their_own_check_ins(app, client):
+    instructor = make_user('instructor')
+    student, classmate = make_user(), make_user()
+    session = make_session(make_course(instructor, [student, classmate]))
+
+    response = client.post('/api/checkin/batch', headers=auth_headers(student), json={'checkins': [
+        {'session_id': session.id, 'latitude': 40.0, 'longitude': -74.0},
+        {'session_id': session.id, 'student_id': classmate.id, 'latitude': 40.0, 'longitude': -74.0},
+    ]})
+    results = response.get_json()['results']
+    assert results[0]['accepted'] and results[0]['attendance_record']['student_id'] == student.id
+    assert results[1]['message'] == 'Students can only check in for themselves'
+
+def test_instructors_can_only_batch_their_own_sessions(app, client):
+    student = make_user()
+    session = make_session(make_course(make_user('instructor'), [student]))
+
+    response = client.post('/api/checkin/batch', headers=auth_headers(make_user('instructor')), json={'checkins': [
+        {'session_id': session.id, 'student_id': student.id, 'latitude': 40.0, 'longitude': -74.0}
+    ]})
+    assert response.get_json()['results'][0]['message'] == 'Access denied'
+
+def test_batch_requires_a_non_empty_list(app, client):
+    headers = auth_headers(make_user())
+    assert client.post('/api/checkin/batch', headers=headers, json={'checkins': []}).status_code == 400
+    assert client.post('/api/checkin/batch', headers=headers, json={}).status_code == 400
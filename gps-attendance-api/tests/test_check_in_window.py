@@ -0,0 +1,57 @@
+import os
+import time as clock
+from datetime import date, datetime, time, timedelta
+
+from conftest import auth_headers, make_course, make_session, make_user
+from src.models.user import SESSION_TIMEZONE, check_in_window, session_now
+
+def test_window_does_not_depend_on_host_time_zone():
+    before = os.environ.get('TZ')
+    windows = []
+    try:
+        for zone in ('UTC', 'Asia/Tokyo'):
+            os.environ['TZ'] = zone
+            clock.tzset()
+            windows.append(check_in_window(date(2030, 1, 7), time(9, 0), time(10, 0)))
+    finally:
+        if before is None:
+            os.environ.pop('TZ', None)
+        else:
+            os.environ['TZ'] = before
+        clock.tzset()
+
+    # 09:00 in New York (the test zone) is 14:00 UTC in January
+    assert windows[0] == windows[1] == (
+        datetime(2030, 1, 7, 13, 45), datetime(2030, 1, 7, 14, 0), datetime(2030, 1, 7, 15, 0)
+    )
+
+def test_check_in_with_session_id_outside_window_is_accepted(app, client):
+    student = make_user()
+    course = make_course(make_user('instructor'), [student])
+    # A session today whose window is nowhere near the current time
+    start = time(1, 0) if session_now().hour >= 12 else time(20, 0)
+    session = make_session(course, start_time=start, end_time=start.replace(minute=50))
+
+    response = client.post('/api/checkin', headers=auth_headers(student), json={
+        'session_id': session.id, 'latitude': 40.0, 'longitude': -74.0
+    })
+    assert response.status_code == 200, response.get_json()
+
+    # Automatic check-in only looks at sessions whose window is open
+    response = client.post('/api/checkin/auto', headers=auth_headers(student), json={
+        'latitude': 40.0, 'longitude': -74.0
+    })
+    assert response.status_code == 404
+
+def test_batch_check_in_status_follows_session_time_zone(app, client):
+    instructor = make_user('instructor')
+    student = make_user()
+    course = make_course(instructor, [student])
+    yesterday = session_now().date() - timedelta(days=1)
+    session = make_session(course, session_date=yesterday, start_time=time(9, 0), end_time=time(10, 0))
+
+    response = client.post('/api/checkin/batch', headers=auth_headers(instructor), json={'checkins': [
+        {'session_id': session.id, 'student_id': student.id, 'latitude': 40.0, 'longitude': -74.0,
+         'timestamp': datetime.combine(yesterday, time(9, 10), SESSION_TIMEZONE).isoformat()}
+    ]})
+    assert response.get_json()['results'][0]['status'] == 'late'
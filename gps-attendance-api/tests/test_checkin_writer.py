@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+
+from conftest import auth_headers, make_course, make_session, make_user
+from src.models.user import AttendanceRecord
+from src.services.checkin_writer import CheckInWriter
+
+@pytest.fixture
+def writer(app, monkeypatch):
+    # A long flush interval so concurrent check-ins land in one group
+    monkeypatch.setitem(app.config, 'CHECKIN_GROUP_COMMIT', True)
+    monkeypatch.setitem(app.config, 'CHECKIN_FLUSH_INTERVAL_MS', 300)
+    writer = CheckInWriter()
+    writer.init_app(app)
+    monkeypatch.setattr('src.routes.attendance.checkin_writer', writer)
+    yield writer
+    writer.shutdown()
+
+def test_concurrent_check_ins_commit_in_one_group(app, writer):
+    students = [make_user() for _ in range(5)]
+    session_id = make_session(make_course(make_user('instructor'), students)).id
+    headers = [auth_headers(student) for student in students]
+    responses = [None] * len(students)
+
+    def check_in(index):
+        responses[index] = app.test_client().post('/api/checkin', headers=headers[index], json={
+            'session_id': session_id, 'latitude': 40.0, 'longitude': -74.0
+        })
+
+    threads = [threading.Thread(target=check_in, args=(i,)) for i in range(len(students))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [r.status_code for r in responses] == [200] * len(students)
+    # Every request only returned once its row was committed
+    assert AttendanceRecord.query.filter_by(session_id=session_id).count() == len(students)
+    assert {r.get_json()['attendance_record']['id'] for r in responses} == {
+        record.id for record in AttendanceRecord.query.filter_by(session_id=session_id)
+    }
+    stats = writer.stats()
+    assert stats['rows_written'] == len(students)
+    assert stats['max_flush_size'] > 1 and stats['flushes'] < len(students)
+
+def test_duplicate_check_in_is_rejected_by_the_writer(app, client, writer):
+    student = make_user()
+    session = make_session(make_course(make_user('instructor'), [student]))
+    payload = {'session_id': session.id, 'latitude': 40.0, 'longitude': -74.0}
+
+    assert client.post('/api/checkin', headers=auth_headers(student), json=payload).status_code == 200
+    response = client.post('/api/checkin', headers=auth_headers(student), json=payload)
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'You have already checked in for this session'
+    assert writer.stats()['rows_written'] == 1
+
+def test_shutdown_stops_accepting_check_ins(app, client, writer):
+    student = make_user()
+    session = make_session(make_course(make_user('instructor'), [student]))
+    writer.shutdown()
+
+    response = client.post('/api/checkin', headers=auth_headers(student), json={
+        'session_id': session.id, 'latitude': 40.0, 'longitude': -74.0
+    })
+    assert response.status_code == 503
@@ -0,0 +1,93 @@
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import select
+
+from conftest import auth_headers, make_course, make_session, make_user
+from src.models.user import (
+    SESSION_TIMEZONE, AttendanceRecord, CourseAttendanceCounter, CourseEnrollment, StudentAttendanceCounter, db,
+    session_now
+)
+from src.services.attendance_counters import rebuild_counters
+from src.services.session_closeout import session_closer
+
+LONG_AGO = datetime(2020, 1, 1)
+
+def counters():
+    """Non-zero counter rows; a maintained counter can drop to zero where a recount writes no row"""
+    with db.engine.connect() as connection:
+        return tuple(
+            sorted(row for row in connection.execute(select(model.__table__)) if row.count)
+            for model in (StudentAttendanceCounter, CourseAttendanceCounter)
+        )
+
+def device_timestamp(day, local_time):
+    return datetime.combine(day, local_time, SESSION_TIMEZONE).isoformat()
+
+def test_late_offline_upload_replaces_close_out_absence(app, client):
+    instructor = make_user('instructor')
+    on_time, late, missing = make_user(), make_user(), make_user()
+    course = make_course(instructor, [on_time, late, missing], enrolled_at=LONG_AGO)
+    yesterday = session_now().date() - timedelta(days=1)
+    session = make_session(course, session_date=yesterday, start_time=time(9, 0), end_time=time(10, 0))
+
+    session_closer.run_once()
+    statuses = dict(db.session.query(AttendanceRecord.student_id, AttendanceRecord.status).filter_by(
+        session_id=session.id
+    ))
+    assert statuses == {on_time.id: 'absent', late.id: 'absent', missing.id: 'absent'}
+
+    response = client.post('/api/checkin/batch', headers=auth_headers(instructor), json={'checkins': [
+        {'session_id': session.id, 'student_id': on_time.id, 'latitude': 40.0, 'longitude': -74.0,
+         'timestamp': device_timestamp(yesterday, time(8, 58))},
+        {'session_id': session.id, 'student_id': late.id, 'latitude': 40.0, 'longitude': -74.0,
+         'timestamp': device_timestamp(yesterday, time(9, 7))},
+    ]})
+    body = response.get_json()
+    assert response.status_code == 200, body
+    assert [result['status'] for result in body['results']] == ['present', 'late']
+
+    db.session.expire_all()
+    statuses = dict(db.session.query(AttendanceRecord.student_id, AttendanceRecord.status).filter_by(
+        session_id=session.id
+    ))
+    assert statuses == {on_time.id: 'present', late.id: 'late', missing.id: 'absent'}
+
+    # A second upload for the same student is a duplicate again
+    response = client.post('/api/checkin/batch', headers=auth_headers(instructor), json={'checkins': [
+        {'session_id': session.id, 'student_id': late.id, 'latitude': 40.0, 'longitude': -74.0,
+         'timestamp': device_timestamp(yesterday, time(9, 8))},
+    ]})
+    assert response.get_json()['rejected_count'] == 1
+
+    # The counters match a full recount
+    maintained = counters()
+    with db.engine.begin() as connection:
+        rebuild_counters(connection)
+    assert counters() == maintained
+
+def test_history_hides_close_out_placeholders_of_absences(app, client):
+    student = make_user()
+    course = make_course(make_user('instructor'), [student], enrolled_at=LONG_AGO)
+    make_session(course, session_date=session_now().date() - timedelta(days=1), start_time=time(9, 0),
+                 end_time=time(10, 0))
+    session_closer.run_once()
+
+    response = client.get('/api/history', headers=auth_headers(student))
+    [record] = response.get_json()['attendance_records']
+    assert record['status'] == 'absent'
+    assert (record['check_in_time'], record['latitude'], record['longitude']) == (None, None, None)
+
+def test_close_out_skips_students_who_enrolled_after_the_session(app):
+    enrolled_then, enrolled_later = make_user(), make_user()
+    course = make_course(make_user('instructor'), [enrolled_then], enrolled_at=LONG_AGO)
+    # Enrolled today, after the session a week ago
+    db.session.add(CourseEnrollment(course_id=course.id, student_id=enrolled_later.id))
+    db.session.commit()
+    session = make_session(course, session_date=session_now().date() - timedelta(days=7), start_time=time(9, 0),
+                           end_time=time(10, 0))
+
+    session_closer.run_once()
+    absent = {student_id for student_id, in db.session.query(AttendanceRecord.student_id).filter_by(
+        session_id=session.id, status='absent'
+    )}
+    assert absent == {enrolled_then.id}
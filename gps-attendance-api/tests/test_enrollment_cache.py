@@ -0,0 +1,19 @@
+from conftest import make_course, make_user
+from src.models.user import CourseEnrollment, db
+from src.services.enrollment_cache import EnrollmentCache
+
+def test_enrollment_written_elsewhere_is_seen_before_the_roster_reloads(app):
+    course = make_course(make_user('instructor'), [make_user()])
+    student = make_user()
+    cache = EnrollmentCache()
+    assert not cache.is_enrolled(course.id, student.id)
+
+    # Another worker enrolls the student; this cache still holds the old roster
+    db.session.add(CourseEnrollment(course_id=course.id, student_id=student.id))
+    db.session.commit()
+
+    assert cache.is_enrolled(course.id, student.id)
+    assert cache.stats()['confirmations'] == 1
+    # Added to the cached roster, so the next check is a plain hit
+    assert cache.is_enrolled(course.id, student.id)
+    assert cache.stats()['confirmations'] == 1
@@ -0,0 +1,13 @@
+import numpy as np
+
+from src.services.geo import calculate_distance, haversine_distances
+
+def test_single_distance_matches_batch_exactly():
+    rng = np.random.default_rng(7)
+    lats = 40.7128 + rng.uniform(-0.01, 0.01, 1000)
+    lons = -74.0060 + rng.uniform(-0.01, 0.01, 1000)
+
+    batch = haversine_distances(lats, lons, 40.7128, -74.0060)
+    single = [calculate_distance(lat, lon, 40.7128, -74.0060) for lat, lon in zip(lats.tolist(), lons.tolist())]
+    # Exact equality: the single check-in path and the batch paths must agree on geofence boundaries
+    assert single == batch.tolist()
@@ -0,0 +1,51 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError
+
+from conftest import make_course, make_session, make_user
+from src.migrations import MIGRATIONS
+from src.models.user import AttendanceRecord, db, is_unique_violation
+
+def test_duplicates_are_moved_aside_before_unique_indexes_are_built(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    migrate = {name: function for _, name, function in MIGRATIONS}['attendance_and_enrollment_indexes']
+    with engine.begin() as connection:
+        for statement in [
+            "CREATE TABLE attendance_record (id INTEGER PRIMARY KEY, session_id INTEGER, student_id INTEGER, "
+            "status VARCHAR(20), created_at DATETIME)",
+            "CREATE TABLE course_enrollment (id INTEGER PRIMARY KEY, course_id INTEGER, student_id INTEGER)",
+            "CREATE TABLE class_session (id INTEGER PRIMARY KEY, course_id INTEGER, session_date DATE, is_active BOOLEAN)",
+            "INSERT INTO attendance_record VALUES (1, 10, 20, 'present', NULL), (2, 10, 20, 'late', NULL), "
+            "(3, 11, 20, 'present', NULL)",
+            "INSERT INTO course_enrollment VALUES (1, 5, 20), (2, 5, 21)",
+        ]:
+            connection.execute(text(statement))
+        migrate(connection)
+
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT id FROM attendance_record ORDER BY id")).scalars().all() == [1, 3]
+        assert connection.execute(text("SELECT id, status FROM attendance_record_duplicate")).all() == [(2, 'late')]
+        assert connection.execute(text("SELECT COUNT(*) FROM course_enrollment")).scalar() == 2
+        assert 'course_enrollment_duplicate' not in engine.dialect.get_table_names(connection)
+
+def test_only_the_session_student_index_counts_as_a_duplicate_check_in(app):
+    student = make_user()
+    session = make_session(make_course(make_user('instructor'), [student]))
+
+    def insert(**values):
+        db.session.add(AttendanceRecord(**dict(dict(
+            session_id=session.id, student_id=student.id, check_in_time=datetime.utcnow(), latitude=40.0,
+            longitude=-74.0, status='present'
+        ), **values)))
+        with pytest.raises(IntegrityError) as raised:
+            db.session.commit()
+        db.session.rollback()
+        return is_unique_violation(raised.value, 'uq_attendance_record_session_student')
+
+    db.session.add(AttendanceRecord(session_id=session.id, student_id=student.id, check_in_time=datetime.utcnow(),
+                                    latitude=40.0, longitude=-74.0, status='present'))
+    db.session.commit()
+    assert insert()
+    assert not insert(student_id=make_user().id, status=None)
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+from conftest import auth_headers, make_course, make_session, make_user
+from src.models.user import AttendanceRecord, Feedback, db
+
+def pages(client, url, headers, key, limit):
+    """Follow next_cursor from the first page to the last, returning the ids of every page"""
+    result = []
+    params = {'limit': limit}
+    while True:
+        body = client.get(url, headers=headers, query_string=params).get_json()
+        result.append([item['id'] for item in body[key]])
+        if not body['next_cursor']:
+            return result
+        params = {'limit': limit, 'cursor': body['next_cursor']}
+
+def test_feedback_cursor_walks_ties_without_gaps_or_repeats(app, client):
+    instructor = make_user('instructor')
+    course = make_course(instructor)
+    # Rows sharing a created_at are ordered by id
+    when = datetime(2030, 1, 7, 9, 0)
+    feedback = [Feedback(course_id=course.id, rating=4, created_at=when - timedelta(minutes=i // 3)) for i in range(7)]
+    db.session.add_all(feedback)
+    db.session.commit()
+    expected = [f.id for f in sorted(feedback, key=lambda f: (f.created_at, f.id), reverse=True)]
+
+    result = pages(client, f'/api/courses/{course.id}/feedback', auth_headers(instructor), 'feedback', 3)
+    assert [len(page) for page in result] == [3, 3, 1]
+    assert sum(result, []) == expected
+
+def test_history_cursor_is_not_shifted_by_new_rows(app, client):
+    student = make_user()
+    course = make_course(make_user('instructor'), [student])
+    sessions = [make_session(course) for _ in range(4)]
+    db.session.add_all([
+        AttendanceRecord(session_id=session.id, student_id=student.id, status='present', latitude=40.0,
+                         longitude=-74.0, check_in_time=datetime(2030, 1, 7, 9, i), created_at=datetime(2030, 1, 7, 9, i))
+        for i, session in enumerate(sessions[:3])
+    ])
+    db.session.commit()
+    headers = auth_headers(student)
+
+    first = client.get('/api/history', headers=headers, query_string={'limit': 2}).get_json()
+    # A row written between pages would push an offset-based second page back by one
+    db.session.add(AttendanceRecord(session_id=sessions[3].id, student_id=student.id, status='present',
+                                    latitude=40.0, longitude=-74.0, check_in_time=datetime(2030, 1, 7, 10, 0),
+                                    created_at=datetime(2030, 1, 7, 10, 0)))
+    db.session.commit()
+    second = client.get('/api/history', headers=headers, query_string={
+        'limit': 2, 'cursor': first['next_cursor']
+    }).get_json()
+
+    assert [r['session_id'] for r in first['attendance_records']] == [sessions[2].id, sessions[1].id]
+    assert [r['session_id'] for r in second['attendance_records']] == [sessions[0].id]
+    assert second['next_cursor'] is None
+
+def test_malformed_cursor_is_rejected(app, client):
+    response = client.get('/api/history', headers=auth_headers(make_user()), query_string={'cursor': 'not-a-cursor'})
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Invalid pagination cursor'
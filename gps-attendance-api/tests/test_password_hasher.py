@@ -0,0 +1,51 @@
+import pytest
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from conftest import make_user
+from src.models.user import User, db
+from src.services.password_hasher import PasswordHasher
+
+def set_password(user, password, method='pbkdf2:sha256:1000'):
+    user.password_hash = generate_password_hash(password, method=method)
+    db.session.commit()
+
+def test_login_verifies_in_the_worker_pool(app, client):
+    user = make_user()
+    set_password(user, 'correct horse', method='scrypt')
+
+    response = client.post('/api/auth/login', json={'username': user.username, 'password': 'correct horse'})
+    assert response.status_code == 200
+    assert response.get_json()['token']
+    response = client.post('/api/auth/login', json={'username': user.username, 'password': 'wrong'})
+    assert response.status_code == 401
+
+def test_login_upgrades_outdated_hash(app, client):
+    user = make_user()
+    set_password(user, 'correct horse')
+
+    assert client.post('/api/auth/login', json={'username': user.username, 'password': 'correct horse'}).status_code == 200
+    db.session.expire_all()
+    upgraded = db.session.get(User, user.id).password_hash
+    # Rehashed with the default method, and still the same password
+    assert not upgraded.startswith('pbkdf2:sha256:1000$')
+    assert check_password_hash(upgraded, 'correct horse')
+
+@pytest.fixture
+def saturated_hasher(app, monkeypatch):
+    # No free slots, as if max_pending logins were already being verified
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_WORKERS', 1)
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_MAX_PENDING', 0)
+    hasher = PasswordHasher()
+    hasher.init_app(app)
+    monkeypatch.setattr('src.routes.auth.password_hasher', hasher)
+    yield hasher
+    hasher.shutdown()
+
+def test_login_is_shed_when_the_pool_is_full(app, client, saturated_hasher):
+    user = make_user()
+    set_password(user, 'correct horse')
+
+    response = client.post('/api/auth/login', json={'username': user.username, 'password': 'correct horse'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert saturated_hasher.stats()['rejected'] == 1
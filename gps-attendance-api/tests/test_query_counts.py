@@ -0,0 +1,96 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from conftest import auth_headers, make_course, make_session, make_user
+from src.models.user import AttendanceRecord, Feedback, db
+
+# Statements per request once the user and enrollment caches are warm; the
+# same for every page size, since each listing is a fixed set of queries
+EXPECTED_STATEMENTS = {
+    'history': 1,
+    'admin_courses': 1,
+    'student_courses': 1,
+    'my_feedback': 1,
+    'course_feedback': 3,  # course access check, the page, the rating breakdown
+}
+
+def count_statements(client, url, headers):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engines = list(db.engines.values())
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', record)
+    try:
+        response = client.get(url, headers=headers)
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', record)
+    assert response.status_code == 200, response.get_json()
+    return len(statements)
+
+def history(rows):
+    student = make_user()
+    instructor = make_user('instructor')
+    for day in range(rows):
+        course = make_course(instructor, [student])
+        session = make_session(course, session_date=date.today() - timedelta(days=day + 1))
+        db.session.add(AttendanceRecord(session_id=session.id, student_id=student.id, check_in_time=datetime.utcnow(),
+                                        latitude=40.0, longitude=-74.0, status='present'))
+    db.session.commit()
+    return f'/api/history?limit={rows}', auth_headers(student)
+
+def admin_courses(rows):
+    instructor = make_user('instructor')
+    students = [make_user() for _ in range(3)]
+    for _ in range(rows):
+        make_course(instructor, students)
+    return '/api/courses', auth_headers(make_user('admin'))
+
+def student_courses(rows):
+    student = make_user()
+    for _ in range(rows):
+        make_course(make_user('instructor'), [student, make_user()])
+    return '/api/courses', auth_headers(student)
+
+def my_feedback(rows):
+    student = make_user()
+    instructor = make_user('instructor')
+    for _ in range(rows):
+        course = make_course(instructor, [student])
+        db.session.add(Feedback(course_id=course.id, student_id=student.id, rating=4, comment='Good'))
+    db.session.commit()
+    return f'/api/my-feedback?limit={rows}', auth_headers(student)
+
+def course_feedback(rows):
+    instructor = make_user('instructor')
+    students = [make_user() for _ in range(rows)]
+    course = make_course(instructor, students)
+    db.session.add_all([
+        Feedback(course_id=course.id, student_id=student.id, rating=5, comment='Clear', is_anonymous=index % 2 == 0)
+        for index, student in enumerate(students)
+    ])
+    db.session.commit()
+    return f'/api/courses/{course.id}/feedback?limit={rows}', auth_headers(instructor)
+
+LISTINGS = {
+    'history': history,
+    'admin_courses': admin_courses,
+    'student_courses': student_courses,
+    'my_feedback': my_feedback,
+    'course_feedback': course_feedback,
+}
+
+@pytest.mark.parametrize('name', sorted(LISTINGS))
+def test_listing_statement_count_does_not_grow_with_page_size(app, client, name):
+    counts = []
+    for rows in (1, 20):
+        url, headers = LISTINGS[name](rows)
+        # Warm the user and enrollment caches so only the listing itself is counted
+        client.get(url, headers=headers)
+        counts.append(count_statements(client, url, headers))
+    assert counts == [EXPECTED_STATEMENTS[name]] * 2
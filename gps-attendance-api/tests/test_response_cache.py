@@ -0,0 +1,79 @@
+import pytest
+
+from conftest import auth_headers, make_course, make_session, make_user
+from src.services.response_cache import response_cache
+
+@pytest.fixture
+def cache(app):
+    response_cache.enabled = True
+    yield response_cache
+    response_cache.enabled = False
+
+def test_unchanged_course_listing_answers_304(cache, client):
+    headers = auth_headers(make_user('admin'))
+    make_course(make_user('instructor'))
+
+    first = client.get('/api/courses', headers=headers)
+    assert first.status_code == 200 and first.headers['ETag']
+    again = client.get('/api/courses', headers=dict(headers, **{'If-None-Match': first.headers['ETag']}))
+    assert again.status_code == 304
+
+def test_deleting_user_changes_course_listing_etag(cache, client):
+    headers = auth_headers(make_user('admin'))
+    make_course(make_user('instructor'))
+    # Users still referenced by a course or enrollment cannot be deleted
+    user = make_user('instructor')
+
+    first = client.get('/api/courses', headers=headers)
+    assert client.delete(f'/api/users/{user.id}').status_code == 204
+
+    response = client.get('/api/courses', headers=dict(headers, **{'If-None-Match': first.headers['ETag']}))
+    assert response.status_code == 200
+
+def test_updating_user_changes_course_listing_etag(cache, client):
+    headers = auth_headers(make_user('admin'))
+    instructor = make_user('instructor')
+    make_course(instructor)
+
+    first = client.get('/api/courses', headers=headers)
+    assert client.put(f'/api/users/{instructor.id}', json={'email': f'renamed{instructor.id}@test.edu'}).status_code == 200
+
+    response = client.get('/api/courses', headers=dict(headers, **{'If-None-Match': first.headers['ETag']}))
+    assert response.status_code == 200
+
+def revalidate(client, url, headers, response):
+    return client.get(url, headers=dict(headers, **{'If-None-Match': response.headers['ETag']}))
+
+def test_new_session_changes_only_its_course_listing(cache, client):
+    instructor = make_user('instructor')
+    headers = auth_headers(instructor)
+    changed, untouched = make_course(instructor), make_course(instructor)
+    changed_url, untouched_url = f'/api/courses/{changed.id}/sessions', f'/api/courses/{untouched.id}/sessions'
+    first_changed, first_untouched = client.get(changed_url, headers=headers), client.get(untouched_url, headers=headers)
+
+    response = client.post(changed_url, headers=headers, json={
+        'session_date': '2030-01-07', 'start_time': '09:00', 'end_time': '10:00',
+        'location_name': 'Room 1', 'latitude': 40.0, 'longitude': -74.0
+    })
+    assert response.status_code == 201
+
+    response = revalidate(client, changed_url, headers, first_changed)
+    assert response.status_code == 200 and len(response.get_json()) == 1
+    assert revalidate(client, untouched_url, headers, first_untouched).status_code == 304
+
+def test_cached_listing_is_served_per_user(cache, client):
+    instructor = make_user('instructor')
+    student, outsider = make_user(), make_user()
+    course = make_course(instructor, [student])
+    make_session(course)
+    url = f'/api/courses/{course.id}/sessions'
+
+    first = client.get(url, headers=auth_headers(student))
+    hits = cache.stats()['hits']
+    again = client.get(url, headers=auth_headers(student))
+    assert again.status_code == 200 and again.get_data() == first.get_data()
+    assert cache.stats()['hits'] == hits + 1
+
+    # Another user never gets the enrolled student's cached copy or a 304 for its ETag
+    assert client.get(url, headers=auth_headers(outsider)).status_code == 403
+    assert revalidate(client, url, auth_headers(outsider), first).status_code == 403
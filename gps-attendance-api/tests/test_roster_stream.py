@@ -0,0 +1,99 @@
+import json
+from datetime import datetime, time, timedelta
+
+import pytest
+
+from conftest import auth_headers, make_course, make_session, make_user
+from src.models.user import session_now
+from src.services.roster_stream import roster_broker
+from src.services.session_closeout import session_closer
+
+@pytest.fixture
+def broker(monkeypatch):
+    # Idle streams wake up quickly, so a missing event fails the test instead of hanging it
+    monkeypatch.setattr(roster_broker, 'heartbeat_interval', 0.2)
+    return roster_broker
+
+def events(stream):
+    """Read the next chunk of the stream and parse its events into (event, payload) pairs"""
+    result = []
+    for block in next(stream).decode().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line and not line.startswith(':'))
+        if 'event' in fields:
+            result.append((fields['event'], json.loads(fields['data'])))
+    return result
+
+def open_stream(client, user, session):
+    response = client.get(f'/api/session/{session.id}/attendance/stream', headers=auth_headers(user), buffered=False)
+    assert response.status_code == 200 and response.mimetype == 'text/event-stream'
+    return response, iter(response.response)
+
+def test_stream_sends_snapshot_then_check_ins(app, client, broker):
+    instructor = make_user('instructor')
+    present, remote = make_user(), make_user()
+    session = make_session(make_course(instructor, [present, remote]))
+    streams = broker.stats()['streams']
+
+    response, stream = open_stream(client, instructor, session)
+    try:
+        [(event, snapshot)] = events(stream)
+        assert event == 'snapshot'
+        assert {entry['status'] for entry in snapshot['student_attendance']} == {'absent'}
+
+        # Published by the check-in handler as soon as it commits
+        client.post('/api/checkin', headers=auth_headers(present), json={
+            'session_id': session.id, 'latitude': 40.0, 'longitude': -74.0
+        })
+        [(event, update)] = events(stream)
+        assert event == 'attendance'
+        assert [entry['student_id'] for entry in update['student_attendance']] == [present.id]
+        assert update['summary']['total_students'] == 2
+
+        # Batch uploads are picked up by the sync
+        client.post('/api/checkin/batch', headers=auth_headers(instructor), json={'checkins': [
+            {'session_id': session.id, 'student_id': remote.id, 'latitude': 40.0, 'longitude': -74.0}
+        ]})
+        broker.sync()
+        [(event, update)] = events(stream)
+        assert [entry['student_id'] for entry in update['student_attendance']] == [remote.id]
+        assert update['summary']['absent_count'] == 0
+        assert broker.stats()['streams'] == streams + 1
+    finally:
+        response.close()
+    assert broker.stats()['streams'] == streams
+
+def test_stream_ends_when_session_is_closed(app, client, broker):
+    instructor = make_user('instructor')
+    course = make_course(instructor, [make_user()], enrolled_at=datetime(2020, 1, 1))
+    session = make_session(course, session_date=session_now().date() - timedelta(days=1),
+                           start_time=time(9, 0), end_time=time(10, 0))
+
+    response, stream = open_stream(client, instructor, session)
+    try:
+        assert events(stream)[0][0] == 'snapshot'
+        session_closer.run_once()
+        broker.sync()
+        assert [event for event, _ in events(stream)][-1] == 'closed'
+    finally:
+        response.close()
+
+    # A closed session gets its final roster and no live updates
+    response, stream = open_stream(client, instructor, session)
+    try:
+        assert [event for event, _ in events(stream) + events(stream)] == ['snapshot', 'closed']
+        assert next(stream, None) is None
+    finally:
+        response.close()
+
+def test_streams_beyond_the_limit_are_refused(app, client, broker, monkeypatch):
+    instructor = make_user('instructor')
+    session = make_session(make_course(instructor))
+    monkeypatch.setattr(broker, 'max_subscribers', 0)
+
+    response = client.get(f'/api/session/{session.id}/attendance/stream', headers=auth_headers(instructor))
+    assert response.status_code == 503
+
+def test_other_instructors_cannot_stream(app, client, broker):
+    session = make_session(make_course(make_user('instructor')))
+    response = client.get(f'/api/session/{session.id}/attendance/stream', headers=auth_headers(make_user('instructor')))
+    assert response.status_code == 403
@@ -0,0 +1,74 @@
+import json
+from datetime import date, datetime, time, timedelta
+
+from conftest import make_course, make_user
+from src.models.user import ClassSession, CourseSchedule, check_in_window, db
+from src.services.schedules import insert_sessions, sync_future_sessions
+
+def test_session_moved_earlier_today_gets_new_check_in_window(app):
+    instructor = make_user('instructor')
+    course = make_course(instructor)
+    day = date(2030, 1, 7)
+    schedule = CourseSchedule(course_id=course.id, weekdays=1 << day.weekday(), start_time=time(20, 30),
+                              end_time=time(21, 30), location_name='Room 1', latitude=40.0, longitude=-74.0,
+                              term_start=day, term_end=day)
+    db.session.add(schedule)
+    db.session.flush()
+    insert_sessions(schedule, instructor.id, [day])
+    db.session.commit()
+
+    # At 19:30 the session has not started yet, but its new start time has already passed
+    schedule.start_time = time(19, 0)
+    sync_future_sessions(schedule, instructor.id, datetime.combine(day, time(19, 30)), {'start_time'})
+    db.session.commit()
+
+    session = ClassSession.query.filter_by(schedule_id=schedule.id).one()
+    assert session.start_time == time(19, 0)
+    assert (session.opens_at, session.late_at, session.closes_at) == check_in_window(day, time(19, 0), time(21, 30))
+
+def test_start_moved_later_keeps_session_that_already_started(app):
+    instructor = make_user('instructor')
+    course = make_course(instructor)
+    day = date(2030, 1, 7)
+    schedule = CourseSchedule(course_id=course.id, weekdays=1 << day.weekday(), start_time=time(9, 0),
+                              end_time=time(11, 0), location_name='Room 1', latitude=40.0, longitude=-74.0,
+                              term_start=day, term_end=day)
+    db.session.add(schedule)
+    db.session.flush()
+    insert_sessions(schedule, instructor.id, [day])
+    db.session.commit()
+
+    # At 9:30 the session is under way, so moving the start to 10:00 must not add a second one
+    schedule.start_time = time(10, 0)
+    result = sync_future_sessions(schedule, instructor.id, datetime.combine(day, time(9, 30)), {'start_time'})
+    db.session.commit()
+
+    assert result['created'] == 0
+    assert [session.start_time for session in ClassSession.query.filter_by(schedule_id=schedule.id)] == [time(9, 0)]
+
+def test_reactivated_session_gets_window_of_current_times(app):
+    instructor = make_user('instructor')
+    course = make_course(instructor)
+    day = date(2030, 1, 7)
+    schedule = CourseSchedule(course_id=course.id, weekdays=1 << day.weekday(), start_time=time(9, 0),
+                              end_time=time(10, 0), location_name='Room 1', latitude=40.0, longitude=-74.0,
+                              term_start=day, term_end=day)
+    db.session.add(schedule)
+    db.session.flush()
+    insert_sessions(schedule, instructor.id, [day])
+    db.session.commit()
+    now = datetime.combine(day - timedelta(days=7), time(12, 0))
+
+    # Drop the date, move the times while the session is inactive, then bring the date back
+    schedule.excluded_dates = json.dumps([day.isoformat()])
+    sync_future_sessions(schedule, instructor.id, now, {'excluded_dates'})
+    schedule.start_time, schedule.end_time = time(11, 0), time(12, 0)
+    sync_future_sessions(schedule, instructor.id, now, {'start_time', 'end_time'})
+    schedule.excluded_dates = '[]'
+    result = sync_future_sessions(schedule, instructor.id, now, {'excluded_dates'})
+    db.session.commit()
+
+    assert result['updated'] == 1
+    session = ClassSession.query.filter_by(schedule_id=schedule.id).one()
+    assert (session.is_active, session.start_time) == (True, time(11, 0))
+    assert (session.opens_at, session.late_at, session.closes_at) == check_in_window(day, time(11, 0), time(12, 0))
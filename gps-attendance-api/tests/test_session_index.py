@@ -0,0 +1,44 @@
+from sqlalchemy import event
+
+from conftest import make_course, make_session, make_user
+from src.models.user import ClassSession, db
+from src.services.session_index import SessionIndex
+
+def test_search_box_shrinks_when_widest_session_leaves(app):
+    course = make_course(make_user('instructor'))
+    wide = make_session(course, radius=3000)
+    make_session(course, radius=80)
+    index = SessionIndex()
+    index.reload()
+    assert index.stats()['max_radius'] == 3000
+
+    # Other tests' sessions today have the default radius of 100
+    index.discard(wide.id)
+    assert index.stats()['max_radius'] <= 100
+
+def test_upsert_during_reload_survives_the_swap(app):
+    course = make_course(make_user('instructor'))
+    session = make_session(course, latitude=40.0, longitude=-74.0)
+    index = SessionIndex()
+    index.reload()
+
+    # The session moves while a reload is reading rows; its query returns the old location
+    moved = ClassSession(id=session.id, course_id=course.id, instructor_id=course.instructor_id,
+                         session_date=session.session_date, start_time=session.start_time,
+                         end_time=session.end_time, location_name='Room 2', latitude=41.0, longitude=-75.0,
+                         attendance_radius=100, is_active=True)
+
+    moves = [moved]
+
+    def move_once(conn, cursor, statement, *args):
+        if 'FROM class_session' in statement and moves:
+            index.upsert(moves.pop())
+
+    event.listen(db.engine, 'before_cursor_execute', move_once)
+    try:
+        index.reload()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', move_once)
+
+    assert [entry.id for entry, _ in index.nearby(41.0, -75.0)] == [session.id]
+    assert session.id not in [entry.id for entry, _ in index.nearby(40.0, -74.0)]
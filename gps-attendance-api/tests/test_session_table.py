@@ -0,0 +1,73 @@
+import mmap
+import time as clock
+
+import pytest
+
+from conftest import auth_headers, make_course, make_session, make_user
+from src.models.user import session_now
+from src.services.session_table import SEQUENCE, SEQUENCE_OFFSET, ActiveSession, SessionTable
+
+@pytest.fixture
+def tables(app, monkeypatch, tmp_path):
+    """A writer and a reader sharing one table file, like two workers on a host"""
+    monkeypatch.setitem(app.config, 'SESSION_TABLE_PATH', str(tmp_path / 'sessions.tbl'))
+    # Only the syncs a test asks for, after the first one
+    monkeypatch.setitem(app.config, 'SESSION_TABLE_SYNC_SECONDS', 3600)
+    writer = SessionTable()
+    writer.init_app(app)
+    deadline = clock.monotonic() + 10
+    while not writer.stats()['refreshes'] and clock.monotonic() < deadline:
+        clock.sleep(0.01)
+    reader = SessionTable()
+    reader.init_app(app)
+    yield writer, reader
+    writer.shutdown()
+    reader.shutdown()
+
+def create_session(client, instructor, course):
+    response = client.post(f'/api/courses/{course.id}/sessions', headers=auth_headers(instructor), json={
+        'session_date': session_now().date().isoformat(), 'start_time': '00:00', 'end_time': '23:59',
+        'location_name': 'Room 1', 'latitude': 40.0, 'longitude': -74.0
+    })
+    return response.get_json()['session']['id']
+
+def test_reader_finds_sessions_written_by_another_process(app, client, tables):
+    writer, reader = tables
+    instructor = make_user('instructor')
+    session_id = create_session(client, instructor, make_course(instructor))
+    writer.sync()
+    assert writer.stats()['writer'] and not reader.stats()['writer']
+
+    session = reader.get(session_id)
+    assert isinstance(session, ActiveSession) and session.id == session_id
+    assert reader.stats()['lookups'] == 1 and reader.stats()['misses'] == 0
+
+def test_table_recovers_from_writer_that_died_mid_write(app, client, tables):
+    writer, reader = tables
+    instructor = make_user('instructor')
+    session_id = create_session(client, instructor, make_course(instructor))
+    writer.sync()
+
+    # A writer killed between its two sequence stores leaves the sequence odd
+    with open(app.config['SESSION_TABLE_PATH'], 'r+b') as table_file, mmap.mmap(table_file.fileno(), 0) as mapping:
+        SEQUENCE.pack_into(mapping, SEQUENCE_OFFSET, SEQUENCE.unpack_from(mapping, SEQUENCE_OFFSET)[0] + 1)
+
+    # Readers fall back to the database rather than trusting a half-written table
+    assert reader.get(session_id).id == session_id
+    assert reader.stats()['fallbacks'] == 1
+
+    # The next writer pass leaves an even sequence behind and readers use the table again
+    writer.sync()
+    assert isinstance(reader.get(session_id), ActiveSession)
+    assert reader.stats()['lookups'] == 1
+
+def test_check_in_to_session_created_after_last_rebuild(app, client):
+    student = make_user()
+    course = make_course(make_user('instructor'), [student])
+    # Created through the ORM without a cache version bump, so the writer has no reason to rebuild
+    session = make_session(course)
+
+    response = client.post('/api/checkin', headers=auth_headers(student), json={
+        'session_id': session.id, 'latitude': 40.0, 'longitude': -74.0
+    })
+    assert response.status_code == 200, response.get_json()
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from werkzeug.security import generate_password_hash
+
+from conftest import auth_headers, make_user
+from src.models.user import RevokedToken, db
+from src.services.token_revocation import TokenRevocationList, token_revocations
+
+def test_password_change_revokes_tokens_issued_in_the_same_second(app, client):
+    user = make_user()
+    user.password_hash = generate_password_hash('old-secret', method='pbkdf2:sha256:1000')
+    db.session.commit()
+    old_headers = auth_headers(user)
+
+    response = client.post('/api/auth/change-password', headers=old_headers, json={
+        'current_password': 'old-secret', 'new_password': 'new-secret'
+    })
+    assert response.status_code == 200, response.get_json()
+    new_headers = {'Authorization': f"Bearer {response.get_json()['token']}"}
+
+    # The old token was almost certainly issued within the same second as the change
+    assert client.get('/api/auth/profile', headers=old_headers).status_code == 401
+    assert client.get('/api/auth/profile', headers=new_headers).status_code == 200
+
+def test_revocation_committed_out_of_id_order_reaches_other_workers(app):
+    user = make_user()
+    other_worker = TokenRevocationList(sync_interval=0)
+    assert not other_worker.is_revoked({'user_id': user.id, 'jti': 'first', 'iat': 0})
+    last_id = db.session.query(func.max(RevokedToken.id)).scalar() or 0
+    expires_at = datetime.utcnow() + timedelta(hours=1)
+
+    # Two workers take ids last_id + 1 and last_id + 2, and the higher one commits first
+    db.session.add(RevokedToken(id=last_id + 2, jti='second', user_id=user.id, expires_at=expires_at))
+    db.session.commit()
+    assert other_worker.is_revoked({'user_id': user.id, 'jti': 'second', 'iat': 0})
+
+    db.session.add(RevokedToken(id=last_id + 1, jti='first', user_id=user.id, expires_at=expires_at))
+    db.session.commit()
+    assert other_worker.is_revoked({'user_id': user.id, 'jti': 'first', 'iat': 0})
+
+def test_expired_revocations_are_purged_outside_requests(app, client):
+    user = make_user()
+    headers = auth_headers(user)
+    db.session.add(RevokedToken(jti='expired', user_id=user.id, expires_at=datetime.utcnow() - timedelta(seconds=1)))
+    db.session.commit()
+
+    # A filter rebuild on the request path leaves the table alone
+    checks = TokenRevocationList(sync_interval=0)
+    assert not checks.is_revoked({'user_id': user.id, 'jti': 'expired', 'iat': 0})
+    assert client.get('/api/auth/profile', headers=headers).status_code == 200
+    assert RevokedToken.query.filter_by(jti='expired').count() == 1
+
+    assert token_revocations.purge() >= 1
+    assert RevokedToken.query.filter_by(jti='expired').count() == 0